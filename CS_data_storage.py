@@ -1,12 +1,70 @@
 import random
+import time
+from collections import OrderedDict
 
 import vehicle
+from profiling import *
 
 CHARGE_LEVEL = {
     2: {6.2},
     3: {50, 150}
 }
 
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        """
+        Least recently used cache whose entries can also expire.
+
+        Parameters:
+            maxsize (int): Entries kept, the least recently used one is evicted beyond it.
+            ttl (float, optional): How long an entry is valid, in the units of clock. None never
+                                   expires, 0 only within the same clock reading.
+            clock (function): Current time, wall clock seconds by default.
+        """
+        self._entries = OrderedDict()
+        # key -> (expiry, value)
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Returns the value of key, default if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is None or entry[0] >= self._clock()):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Stores value under key, evicting the least recently used entry when full."""
+        expiry = None if self._ttl is None else self._clock() + self._ttl
+        self._entries[key] = (expiry, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops every entry, the counters are kept."""
+        self._entries.clear()
+
+    def stats(self):
+        """Returns the counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._entries), "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
 class ChargingStationManager:
     def __init__(self, node, queue_time, expect_ev_rate, level):
         """
@@ -25,6 +83,7 @@ class ChargingStationManager:
         self._efficiency = random.choice(list(CHARGE_LEVEL[level]))
         self._occupy = random.choice([True, False])
         self._average_charge_time = 60/expect_ev_rate
+        self._scheduler = None
 
     @property
     def node(self):
@@ -34,6 +93,8 @@ class ChargingStationManager:
     @property
     def queue_time(self):
         """Current queue time at the charging station in minutes."""
+        if self._scheduler is not None:
+            return self._scheduler.queue_time(self)
         return self._queue_time
 
     @property
@@ -46,6 +107,16 @@ class ChargingStationManager:
         """Charging station level."""
         return self._level
 
+    @property
+    def efficiency(self):
+        """Charging rate of the station in kW."""
+        return self._efficiency
+
+    @property
+    def average_charge_time(self):
+        """Minutes an arriving EV charges for on average."""
+        return self._average_charge_time
+
     @property
     def occupy(self):
         return self._occupy
@@ -57,6 +128,7 @@ class ChargingStationManager:
             f"expect_ev_rate={self._expect_ev_rate} vehicles/hour, level={self._level}"
         )
     
+    @profiled()
     def charge_time_check(self, car, target):
         """
         Calculates the charging time required to reach the target SOC, considering slower charging speed above 80%.
@@ -65,27 +137,42 @@ class ChargingStationManager:
             car (EVehicle): The electric vehicle object that needs charging.
             target (float): The target SOC percentage (0-100).
 
+        Returns:
+            float: The total charging time required in minutes.
+        """
+        return self.charge_time(car.SOC, car.capacity, target)
+
+    def charge_time(self, SOC, capacity, target):
+        """
+        Same as charge_time_check for a battery given by its SOC and capacity, so routing can
+        price charging stops for states the vehicle is not in yet.
+
+        Parameters:
+            SOC (float): State of Charge before charging in percentage (0-100).
+            capacity (float): Battery capacity in kWh.
+            target (float): The target SOC percentage (0-100).
+
         Returns:
             float: The total charging time required in minutes.
         """
         # Prevent false charging
-        if target <= car.SOC:
+        if target <= SOC:
             return 0
         
         # Energy needed to reach 80% SOC (if target > 80%)
         if target > 80:
-            energy_to_80 = car.capacity * (80 - car.SOC) / 100
+            energy_to_80 = capacity * (80 - SOC) / 100
             time_to_80 = energy_to_80 / self._efficiency * 60
 
             # Energy needed to charge from 80% to target will be charged slower
-            energy_above_80 = car.capacity * (target - 80) / 100
+            energy_above_80 = capacity * (target - 80) / 100
             reduced_efficiency = self._efficiency * 0.5  # Assume 50% slower charging speed above 80%
             time_above_80 = energy_above_80 / reduced_efficiency * 60
 
             return time_to_80 + time_above_80
         else:
             # Energy needed to reach target SOC if target <= 80%
-            energy_needed = car.capacity * (target - car.SOC) / 100
+            energy_needed = capacity * (target - SOC) / 100
             return energy_needed / self._efficiency * 60
 
     
@@ -93,6 +180,13 @@ class ChargingStationManager:
         car.charge(target)
         return
     
+    def attach(self, scheduler):
+        """
+        Hands the queue over to an events.Scheduler, which then answers queue_time and replaces update.
+        """
+        self._scheduler = scheduler
+
+    @profiled()
     def update(self, time):
         self._queue_time -= time
         if self._queue_time < 0:
@@ -0,0 +1,155 @@
+import pandas as pd
+
+METRICS = ["total_time", "total_length", "charge_stops", "charge_time", "queue_time", "final_SOC", "failed"]
+# Per-trip metrics collected by trip_metrics, the columns BatchSimulation.run returns as well
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def trip_metrics(r, ev):
+    """
+    Reduces a finished trip to its metrics.
+
+    Parameters:
+        r (result): The trip's histories, as returned by run_trip.
+        ev (EVehicle): The vehicle that drove the trip.
+
+    Returns:
+        dict: The METRICS of the trip plus its model, season, threshold and distance_adjust.
+              queue_time is the wait counted in total_time, which only simulated queues (EVENTS) add.
+              failed is set when a reroute found no station or, as in BatchSimulation, the
+              battery ran below 0%.
+    """
+    last = r.ev_history[-1] if r.ev_history else {}
+    # Running totals, so a streaming_result that only keeps its latest entries counts every charge
+    charges = r.charges
+    return {
+        "model": r.model,
+        "season": r.season,
+        "threshold": r.threshold,
+        "distance_adjust": r.distance_adjust,
+        "total_time": last.get("total_time", 0),
+        "total_length": last.get("total_length", 0),
+        "charge_stops": charges["charge_stops"],
+        "charge_time": charges["charge_time"],
+        "queue_time": charges["queue_time"],
+        "final_SOC": ev.SOC,
+        "failed": bool(r.failed or ev.SOC < 0),
+    }
+
+
+def trip_table(rows):
+    """
+    Builds the column table of many trips.
+
+    Parameters:
+        rows (list or dict): trip_metrics dicts, or column name -> array as BatchSimulation.run returns.
+
+    Returns:
+        DataFrame: One row per trip.
+    """
+    table = pd.DataFrame(rows)
+    if "failed" in table:
+        table["failed"] = table["failed"].astype(bool)
+    return table
+
+
+def summarize(table, by="model", metrics=None, percentiles=PERCENTILES):
+    """
+    Distribution of every metric per group in one grouped pass.
+
+    Failed trips only count towards failure_rate, their times and lengths stop at the failure.
+
+    Parameters:
+        table (DataFrame): From trip_table.
+        by (str or list): Columns to group by.
+        metrics (list, optional): Metrics to describe, METRICS present in the table by default.
+        percentiles (list): Percentiles reported next to the mean and standard deviation.
+
+    Returns:
+        DataFrame: Rows are groups, columns are (metric, statistic) plus trips and failure_rate.
+    """
+    metrics = [m for m in (metrics or METRICS) if m in table and m != "failed"]
+    done = table[~table["failed"]] if "failed" in table else table
+    grouped = done.groupby(by)[metrics]
+
+    stats = {"mean": grouped.mean(), "std": grouped.std()}
+    quantiles = grouped.quantile([p / 100 for p in percentiles])
+    for p in percentiles:
+        stats[f"p{p}"] = quantiles.xs(p / 100, level=-1)
+    summary = pd.concat(stats, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+    summary["trips"] = table.groupby(by).size()
+    if "failed" in table:
+        summary["failure_rate"] = table.groupby(by)["failed"].mean()
+    return summary
+
+
+def model_deltas(table, pair_on, baseline=0, model="model", metrics=None):
+    """
+    Differences of every metric against a baseline model, trip by trip.
+
+    Trips are paired on the pair_on columns, e.g. the seed and settings of a sweep, so each row
+    compares the models on the same trip. Pairs where either trip failed are left out.
+
+    Parameters:
+        table (DataFrame): From trip_table, holding every model's trips.
+        pair_on (list): Columns identifying the same trip across models.
+        baseline: Model the others are compared to.
+        model (str): Column holding the model.
+        metrics (list, optional): Metrics to compare, METRICS present in the table by default.
+
+    Returns:
+        DataFrame: Per trip and model, metric minus the baseline's, with a model column.
+    """
+    metrics = [m for m in (metrics or METRICS) if m in table and m != "failed"]
+    wide = table.set_index(pair_on + [model])[metrics + ["failed"]].unstack(model)
+
+    ok = ~wide["failed"].astype(bool).any(axis=1)
+    values = wide[metrics][ok]
+    base = values.xs(baseline, axis=1, level=model)
+
+    deltas = []
+    for other in values.columns.get_level_values(model).unique():
+        if other == baseline:
+            continue
+        delta = values.xs(other, axis=1, level=model) - base
+        deltas.append(delta.assign(**{model: other}))
+    if not deltas:
+        return pd.DataFrame(columns=pair_on + [model] + metrics)
+    return pd.concat(deltas).reset_index()
+
+
+def delta_summary(deltas, model="model", percentiles=PERCENTILES):
+    """Mean and percentiles of model_deltas per model, plus how often each model was faster."""
+    metrics = [column for column in deltas.columns if column in METRICS]
+    grouped = deltas.groupby(model)[metrics]
+    quantiles = grouped.quantile([p / 100 for p in percentiles])
+    stats = {"mean": grouped.mean()}
+    for p in percentiles:
+        stats[f"p{p}"] = quantiles.xs(p / 100, level=-1)
+    summary = pd.concat(stats, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    if "total_time" in deltas:
+        summary["faster_share"] = (deltas["total_time"] < 0).groupby(deltas[model]).mean()
+    return summary
+
+
+def export(table, file_path):
+    """
+    Writes a table to .csv, or to .parquet when pyarrow is installed.
+
+    Parameters:
+        table (DataFrame): Any of the tables above.
+        file_path (str): Output path, the extension picks the format.
+    """
+    if file_path.endswith(".parquet"):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("Writing Parquet needs pyarrow, install it or export to .csv") from None
+        flat = table.copy()
+        if isinstance(flat.columns, pd.MultiIndex):
+            flat.columns = ["_".join(str(part) for part in column if part != "") for column in flat.columns]
+        flat.to_parquet(file_path)
+    else:
+        table.to_csv(file_path)
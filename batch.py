@@ -0,0 +1,216 @@
+import numpy as np
+
+from map_graph import *
+from navigation import *
+from vehicle import *
+
+
+class EdgeTable:
+    def __init__(self, nodes, roads):
+        """
+        Array view of a map for vectorized simulation, edges in the order of the road index.
+
+        Parameters:
+            nodes (Nodes): Nodes object containing all Node objects.
+            roads (Roads): The Edge objects returned by create_map.
+        """
+        self._node_ids = list(nodes.nodes)
+        self._node_index = {id: i for i, id in enumerate(self._node_ids)}
+        self._edge_index = {}
+        for i, edge in enumerate(roads):
+            self._edge_index.setdefault(road_key(edge.node1.id, edge.node2.id), i)
+
+        self._distance = np.array([edge.distance for edge in roads], dtype=float)
+        self._speed_limit = np.array([edge.speed_limit for edge in roads], dtype=float)
+        self._travel_time = np.array([edge.travel_time for edge in roads], dtype=float)
+        self._is_cs = np.array([node.type == 'CS' for node in nodes.nodes.values()], dtype=bool)
+        self._energy_model = roads.energy_model if isinstance(roads, Roads) else ENERGY_MODEL
+
+    @property
+    def distance(self):
+        """Edge distances in km."""
+        return self._distance
+
+    @property
+    def speed_limit(self):
+        """Edge speed limits in km/h."""
+        return self._speed_limit
+
+    @property
+    def travel_time(self):
+        """Edge travel times in minutes."""
+        return self._travel_time
+
+    @property
+    def is_cs(self):
+        """Whether each node, by node index, is a charging station."""
+        return self._is_cs
+
+    def node_index(self, id):
+        """Returns the array position of a node ID."""
+        return self._node_index[id]
+
+    def energy(self, season, impact=None):
+        """
+        Returns distance * impact index of every edge for the season, the per-edge consumption
+        before the vehicle efficiency is applied. The map's energy model is used unless impact is given.
+        """
+        return as_energy_model(impact or self._energy_model).energy(self._distance, self._speed_limit, season)
+
+    def route(self, path):
+        """
+        Converts a path of node IDs into the edges it drives and the nodes it reaches.
+
+        Returns:
+            edges (list): Edge position of every hop.
+            reached (list): Node position at the end of every hop.
+        """
+        edges = [self._edge_index[road_key(path[i], path[i + 1])] for i in range(len(path) - 1)]
+        reached = [self._node_index[id] for id in path[1:]]
+        return edges, reached
+
+
+class BatchSimulation:
+    def __init__(self, nodes, roads, stations, season, capacity, efficiency, threshold, end_trip_SOC, queue=True,
+                 energy_model=None):
+        """
+        Simulates many trips at once, advancing every vehicle one hop per step with NumPy arrays.
+
+        Vehicles follow their fastest route and, like main.py, charge at a station they reach when
+        the SOC is below the threshold and the rest of the route cannot be finished, up to the
+        optimal_SOC target (80% when that is above 100%).
+
+        Parameters:
+            nodes (Nodes): Nodes object containing all Node objects.
+            roads (Roads): The Edge objects returned by create_map.
+            stations (list): ChargingStationManager objects providing charge rates and queue times.
+            season (str): Season affecting energy consumption.
+            capacity (float): Battery capacity in kWh, shared by all vehicles.
+            efficiency (float): Energy efficiency in kWh per km, shared by all vehicles.
+            threshold (float): SOC in percentage below which vehicles look for charging.
+            end_trip_SOC (float): SOC in percentage that must remain at the destination.
+            queue (bool): Whether station queue times count towards the trip time.
+            energy_model (EnergyModel, optional): The vehicles' model, the map's by default.
+        """
+        self._nodes = nodes
+        self._table = EdgeTable(nodes, roads)
+        self._capacity = capacity
+        self._efficiency = efficiency
+        self._threshold = threshold
+        self._end_trip_SOC = end_trip_SOC
+
+        # SOC percentage spent on every edge
+        self._drain = self._table.energy(season, energy_model) * efficiency / capacity
+
+        self._charge_rate = np.zeros(len(self._table.is_cs))
+        self._queue_time = np.zeros(len(self._table.is_cs))
+        for station in stations:
+            i = self._table.node_index(station.node.id)
+            self._charge_rate[i] = station.efficiency
+            self._queue_time[i] = station.queue_time if queue else 0
+
+    @property
+    def table(self):
+        """The EdgeTable the simulation runs on."""
+        return self._table
+
+    def routes(self, starts, dests):
+        """
+        Builds padded route arrays for the trips, one shortest path tree per distinct start.
+
+        Returns:
+            edges (ndarray): (trips, hops) edge positions, -1 after the end of a route.
+            reached (ndarray): (trips, hops) node positions reached by every hop, 0 when padded.
+        """
+        trees = {}
+        routes = []
+        for start, dest in zip(starts, dests):
+            if start not in trees:
+                trees[start] = shortest_path_tree(self._nodes, self._nodes.get_node(start))
+            routes.append(self._table.route(trees[start].path(dest)))
+
+        hops = max((len(edges) for edges, _ in routes), default=0)
+        edge_array = np.full((len(routes), hops), -1, dtype=np.int64)
+        reached_array = np.zeros((len(routes), hops), dtype=np.int64)
+        for i, (edges, reached) in enumerate(routes):
+            edge_array[i, :len(edges)] = edges
+            reached_array[i, :len(reached)] = reached
+        return edge_array, reached_array
+
+    def charge_time(self, SOC, target, rate):
+        """Vectorized ChargingStationManager.charge_time, slower above 80% SOC."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            to_80 = self._capacity * (80 - SOC) / 100 / rate * 60
+            above_80 = self._capacity * (target - 80) / 100 / (rate * 0.5) * 60
+            below_80 = self._capacity * (target - SOC) / 100 / rate * 60
+            time = np.where(target > 80, to_80 + above_80, below_80)
+        return np.where(target > SOC, time, 0)
+
+    def run(self, starts, dests, SOC):
+        """
+        Drives every trip to its destination.
+
+        Parameters:
+            starts (array-like): Start node ID of every trip.
+            dests (array-like): Destination node ID of every trip.
+            SOC (float or array-like): Initial SOC in percentage of every trip.
+
+        Returns:
+            dict: Column name -> array with one entry per trip: total_time, total_length, final_SOC,
+                  charge_stops, charge_time, queue_time, failed and hops.
+        """
+        edges, reached = self.routes(list(starts), list(dests))
+        trips, hops = edges.shape
+        valid = edges >= 0
+
+        drain = np.where(valid, self._drain[edges], 0)
+        travel_time = np.where(valid, self._table.travel_time[edges], 0)
+        distance = np.where(valid, self._table.distance[edges], 0)
+        # SOC still needed after each hop to finish the route
+        remaining = np.cumsum(drain[:, ::-1], axis=1)[:, ::-1] - drain
+
+        SOC = np.broadcast_to(np.asarray(SOC, dtype=float), (trips,)).copy()
+        total_time = np.zeros(trips)
+        total_length = np.zeros(trips)
+        charge_stops = np.zeros(trips, dtype=np.int64)
+        charge_time = np.zeros(trips)
+        queue_time = np.zeros(trips)
+        failed = np.zeros(trips, dtype=bool)
+        # Prevent battery from instant shut off, same floor as check_reachable
+        reserve = max(self._end_trip_SOC, 5)
+
+        for h in range(hops):
+            active = valid[:, h] & ~failed
+            SOC -= np.where(active, drain[:, h], 0)
+            total_time += np.where(active, travel_time[:, h], 0)
+            total_length += np.where(active, distance[:, h], 0)
+            failed |= active & (SOC < 0)
+
+            at = reached[:, h]
+            charge = (active & ~failed & self._table.is_cs[at] & (self._charge_rate[at] > 0)
+                      & (SOC < self._threshold) & (SOC - remaining[:, h] < reserve))
+            if not charge.any():
+                continue
+
+            target = SOC + self._end_trip_SOC + remaining[:, h] + 5
+            target = np.where(target > 100, 80, target)
+            charge &= target > SOC
+            stop_time = np.where(charge, self.charge_time(SOC, target, self._charge_rate[at]), 0)
+            wait = np.where(charge, self._queue_time[at], 0)
+
+            total_time += stop_time + wait
+            charge_time += stop_time
+            queue_time += wait
+            charge_stops += charge
+            SOC = np.where(charge, target, SOC)
+
+        return {
+            "total_time": total_time,
+            "total_length": total_length,
+            "final_SOC": SOC,
+            "charge_stops": charge_stops,
+            "charge_time": charge_time,
+            "queue_time": queue_time,
+            "failed": failed,
+            "hops": valid.sum(axis=1),
+        }
@@ -0,0 +1,404 @@
+import os
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from map_graph import *
+from navigation import *
+from vehicle import *
+
+SPEED_LIMITS = [40, 70, 100]
+
+
+def grid_map(rows, cols, ADJUST=2, seed=0):
+    """
+    Builds a synthetic grid map for benchmarking, laid out like the CSV maps.
+
+    Parameters:
+        rows (int): Number of node rows.
+        cols (int): Number of node columns.
+        ADJUST (float): Distance multiplier, same as DISTANCE_ADJUST in main.py.
+        seed (int): Seed for road types and charging station placement.
+
+    Returns:
+        nodes (Nodes): A Nodes object containing all Node objects.
+        edges (Roads): The Edge objects, indexed by their end nodes.
+    """
+    rng = random.Random(seed)
+    nodes = Nodes()
+    edges = Roads()
+
+    for r in range(rows):
+        for c in range(cols):
+            id = r * cols + c + 1
+            node_type = 'CS' if rng.random() < 0.05 else 'intersection'
+            nodes.add_node(id, Node(id, c * 10 + rng.uniform(-2, 2), r * 10 + rng.uniform(-2, 2), node_type))
+
+    for r in range(rows):
+        for c in range(cols):
+            node1 = nodes.get_node(r * cols + c + 1)
+            neighbors = []
+            if c + 1 < cols:
+                neighbors.append(nodes.get_node(r * cols + c + 2))
+            if r + 1 < rows:
+                neighbors.append(nodes.get_node((r + 1) * cols + c + 1))
+            for node2 in neighbors:
+                edge = Edge(node1, node2, euclidean_distance(node1, node2) * ADJUST, rng.choice(SPEED_LIMITS))
+                edge.set_energy_costs(GEOTAB_data)
+                edges.add_edge(edge)
+
+    nodes.set_roads(edges)
+    nodes.set_distance_adjust(ADJUST)
+    return nodes, edges
+
+
+def write_csv(nodes, roads, nodes_file_path, edges_file_path):
+    """Writes a map in the nodes.csv / edges.csv format read by create_map."""
+    road_types = {100: 'highway', 70: 'local', 40: 'nbhd'}
+    with open(nodes_file_path, "w") as f:
+        f.write("id,longitude,latitude,type\n")
+        for node in nodes.nodes.values():
+            f.write(f"{node.id},{node.longitude},{node.latitude},{node.type}\n")
+    with open(edges_file_path, "w") as f:
+        f.write("node1,node2,road_type\n")
+        for edge in roads:
+            f.write(f"{edge.node1.id},{edge.node2.id},{road_types[edge.speed_limit]}\n")
+
+
+def timed(func, repeat):
+    """Returns the average wall time of func() in microseconds."""
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - begin) / repeat * 1e6
+
+
+def bench_select_road(sizes=(10, 50, 100, 300), lookups=2000):
+    """
+    Measures the cost of one select_road hop lookup as the number of edges grows.
+    The indexed lookup should stay flat while the linear scan grows with the edge count.
+    """
+    print("select_road hop lookup (us per call)")
+    print(f"{'edges':>10} {'indexed':>10} {'linear':>10}")
+    for size in sizes:
+        nodes, roads = grid_map(size, size)
+        plain = list(roads)
+        rng = random.Random(size)
+        pairs = [(e.node1.id, e.node2.id) for e in rng.sample(plain, min(lookups, len(plain)))]
+
+        indexed = timed(lambda: [select_road(a, b, roads) for a, b in pairs], 5) / len(pairs)
+        linear = timed(lambda: [select_road(a, b, plain) for a, b in pairs[:20]], 1) / 20
+        print(f"{len(roads):>10} {indexed:>10.3f} {linear:>10.1f}")
+
+
+def bench_fastest_path(sizes=(50, 100, 200), queries=20):
+    """
+    Compares the Dijkstra, A* and bidirectional modes of fastest_path on generated grids by
+    settled nodes and latency. All three must agree on the travel time of every route.
+    """
+    print("fastest_path search modes (settled nodes / ms per query)")
+    print(f"{'nodes':>10} {'method':>14} {'settled':>10} {'ms':>10}")
+    for size in sizes:
+        nodes, roads = grid_map(size, size)
+        rng = random.Random(size)
+        ids = list(nodes.nodes)
+        pairs = [(nodes.get_node(rng.choice(ids)), nodes.get_node(rng.choice(ids))) for _ in range(queries)]
+
+        reference = [travel_time(fastest_path(nodes, a, b), nodes) for a, b in pairs]
+        for method in ["dijkstra", "astar", "bidirectional"]:
+            settled = 0
+            begin = time.perf_counter()
+            for (a, b), expected in zip(pairs, reference):
+                stats = {}
+                path = fastest_path(nodes, a, b, method=method, stats=stats)
+                settled += stats["settled"]
+                assert abs(travel_time(path, nodes) - expected) < 1e-6, method
+            elapsed = (time.perf_counter() - begin) / queries * 1e3
+            print(f"{len(nodes.nodes):>10} {method:>14} {settled // queries:>10} {elapsed:>10.2f}")
+
+
+def bench_contraction(sizes=(30, 60), queries=200, file_path="bench.ch"):
+    """
+    Measures contraction hierarchy preprocessing, persistence and query latency against Dijkstra.
+    """
+    from contraction import ContractionHierarchy
+
+    print("contraction hierarchy (build s / ms per query)")
+    print(f"{'nodes':>10} {'build':>8} {'shortcuts':>10} {'ch':>8} {'dijkstra':>10}")
+    for size in sizes:
+        nodes, roads = grid_map(size, size)
+        begin = time.perf_counter()
+        ContractionHierarchy.build(nodes).save(file_path)
+        build = time.perf_counter() - begin
+        hierarchy = ContractionHierarchy.load(file_path)
+
+        rng = random.Random(size)
+        ids = list(nodes.nodes)
+        pairs = [(nodes.get_node(rng.choice(ids)), nodes.get_node(rng.choice(ids))) for _ in range(queries)]
+        for a, b in pairs:
+            expected = travel_time(fastest_path(nodes, a, b), nodes)
+            assert abs(travel_time(hierarchy.fastest_path(nodes, a, b), nodes) - expected) < 1e-6
+
+        ch = timed(lambda: [hierarchy.fastest_path(nodes, a, b) for a, b in pairs], 1) / queries / 1e3
+        dijkstra = timed(lambda: [fastest_path(nodes, a, b) for a, b in pairs], 1) / queries / 1e3
+        print(f"{len(ids):>10} {build:>8.2f} {hierarchy.shortcut_count:>10} {ch:>8.3f} {dijkstra:>10.3f}")
+    os.remove(file_path)
+
+
+def bench_batch(size=60, trips=(1000, 10000, 100000)):
+    """
+    Measures vectorized batch simulation throughput on a generated grid, routes included.
+    """
+    from batch import BatchSimulation
+    from CS_data_storage import ChargingStationManager
+
+    nodes, roads = grid_map(size, size)
+    rng = random.Random(size)
+    stations = [ChargingStationManager(node, rng.randint(0, 50), rng.randint(1, 8), node.id % 2 + 2)
+                for node in nodes.all_cs]
+    simulation = BatchSimulation(nodes, roads, stations, "winter", 57.0, 0.13, 50, 5)
+    ids = list(nodes.nodes)
+    origins = rng.sample(ids, 20)
+
+    print("batch simulation (trips per second)")
+    print(f"{'trips':>10} {'trips/s':>12} {'failed':>8} {'stops':>8}")
+    for count in trips:
+        starts = [rng.choice(origins) for _ in range(count)]
+        dests = [rng.choice(ids) for _ in range(count)]
+        begin = time.perf_counter()
+        results = simulation.run(starts, dests, 60.0)
+        elapsed = time.perf_counter() - begin
+        print(f"{count:>10} {count / elapsed:>12.0f} {results['failed'].sum():>8} {results['charge_stops'].sum():>8}")
+
+
+def bench_fleet(size=40, vehicles=(1000, 10000, 100000)):
+    """
+    Measures fleet simulation throughput in vehicle-hops per second on a generated grid, with the
+    whole fleet contending for the same stations. Routes are included.
+    """
+    from fleet import FleetSimulation
+    from CS_data_storage import ChargingStationManager
+
+    nodes, roads = grid_map(size, size)
+    rng = random.Random(size)
+    ids = list(nodes.nodes)
+    origins = rng.sample(ids, 20)
+
+    print("fleet simulation (vehicle-hops per second)")
+    print(f"{'vehicles':>10} {'hops/s':>12} {'failed':>8} {'stops':>8} {'avg wait':>10}")
+    for count in vehicles:
+        stations = [ChargingStationManager(node, rng.randint(0, 50), rng.randint(1, 8), node.id % 2 + 2)
+                    for node in nodes.all_cs]
+        simulation = FleetSimulation(nodes, roads, stations, "winter", 57.0, 0.13, 50, 5, rng=rng)
+        starts = [rng.choice(origins) for _ in range(count)]
+        dests = [rng.choice(ids) for _ in range(count)]
+        # Departures spread over a day
+        depart = [rng.uniform(0, 24 * 60) for _ in range(count)]
+        begin = time.perf_counter()
+        results = simulation.run(starts, dests, 60.0, depart)
+        elapsed = time.perf_counter() - begin
+        stops = results['charge_stops'].sum()
+        wait = results['queue_time'].sum() / stops if stops else 0
+        print(f"{count:>10} {results['hops'].sum() / elapsed:>12.0f} {results['failed'].sum():>8} {stops:>8} {wait:>10.1f}")
+
+
+def rush_hour_speeds(roads, slots=96, seed=0):
+    """
+    Builds synthetic time-of-day speeds: every edge slows down by its own share, up to 60%, around
+    the 8:00 and 17:30 rush hours. Congestion builds up earlier where it would clear faster than
+    TrafficProfiles accepts, so the profiles stay FIFO.
+
+    Returns:
+        ndarray: (edges, slots) speeds in km/h.
+    """
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(slots) * 1440 / slots
+    rush = np.exp(-((minutes - 480) / 60) ** 2) + np.exp(-((minutes - 1050) / 75) ** 2)
+    limits = np.array([edge.speed_limit for edge in roads], dtype=float)
+    congestion = rng.uniform(0, 0.6, len(limits))
+    speeds = limits[:, None] * (1 - congestion[:, None] * np.minimum(rush, 1)[None, :])
+
+    # Travel time may drop by less than a slot width per slot, going backwards twice covers the wrap
+    distance = np.array([edge.distance for edge in roads], dtype=float)[:, None]
+    times = distance / speeds * 60
+    width = 1440 / slots
+    for k in list(range(slots - 1, -1, -1)) * 2:
+        times[:, k] = np.minimum(times[:, k], times[:, (k + 1) % slots] + 0.9 * width)
+    return distance / times * 60
+
+
+def bench_time_dependent(size=100, queries=20, depart=480):
+    """
+    Compares the static search with time-dependent Dijkstra and A* on a grid with rush hour
+    profiles, and how much time the time-dependent route saves over the static one at depart.
+    """
+    nodes, roads = grid_map(size, size)
+    TrafficProfiles.save("bench_speeds.npy", rush_hour_speeds(roads))
+    profiles = TrafficProfiles.load("bench_speeds.npy", roads)
+    rng = random.Random(size)
+    ids = list(nodes.nodes)
+    pairs = [(nodes.get_node(rng.choice(ids)), nodes.get_node(rng.choice(ids))) for _ in range(queries)]
+
+    saved = []
+    for a, b in pairs:
+        dynamic, dynamic_time = time_dependent_path(nodes, a, b, depart, profiles)
+        _, astar_time = time_dependent_path(nodes, a, b, depart, profiles, method="astar")
+        assert abs(dynamic_time - astar_time) < 1e-6
+        static_time = travel_time(fastest_path(nodes, a, b), nodes, depart, profiles)
+        saved.append((static_time - dynamic_time) / static_time if static_time else 0)
+
+    static = timed(lambda: [fastest_path(nodes, a, b) for a, b in pairs], 1) / queries / 1e3
+    dynamic = timed(lambda: [time_dependent_path(nodes, a, b, depart, profiles) for a, b in pairs], 1) / queries / 1e3
+    astar = timed(lambda: [time_dependent_path(nodes, a, b, depart, profiles, method="astar")
+                           for a, b in pairs], 1) / queries / 1e3
+    print("time-dependent search (ms per query)")
+    print(f"{'nodes':>10} {'static':>8} {'td':>8} {'td A*':>8} {'saved':>8}")
+    print(f"{len(ids):>10} {static:>8.2f} {dynamic:>8.2f} {astar:>8.2f} {sum(saved) / len(saved):>8.1%}")
+    del profiles
+    os.remove("bench_speeds.npy")
+
+
+def bench_energy_model(size=300):
+    """
+    Compares precomputing the edge energy costs one edge at a time with one EnergyModel
+    evaluation per season over all edges.
+    """
+    _, roads = grid_map(size, size)
+    distance = np.array([edge.distance for edge in roads])
+    speed_limit = np.array([edge.speed_limit for edge in roads], dtype=float)
+
+    per_edge = timed(lambda: [edge.set_energy_costs(GEOTAB_data) for edge in roads], 1) / 1e3
+    vectorized = timed(lambda: [ENERGY_MODEL.energy(distance, speed_limit, season)
+                                for season in ENERGY_MODEL.seasons], 5) / 1e3
+    print("edge energy costs, all seasons (ms)")
+    print(f"{'edges':>10} {'per edge':>10} {'arrays':>10}")
+    print(f"{len(roads):>10} {per_edge:>10.1f} {vectorized:>10.2f}")
+
+
+def bench_soc_map(size=60, vehicles=(10, 100, 1000)):
+    """
+    Compares charge targets of vehicles headed to one destination from optimal_SOC, which follows
+    each vehicle's route, with one fastest_path_SOC_map search read for every vehicle.
+    """
+    nodes, roads = grid_map(size, size)
+    rng = random.Random(size)
+    ids = list(nodes.nodes)
+    dest = nodes.get_node(ids[len(ids) // 2])
+
+    print("charge targets to one destination (ms)")
+    print(f"{'vehicles':>10} {'per route':>10} {'SOC map':>10}")
+    for count in vehicles:
+        fleet = []
+        for _ in range(count):
+            ev = EVehicle(rng.choice(ids), dest.id, 57.0, 60.0, 0.13)
+            ev.redirect(ev.start_id, 0)
+            fleet.append(ev)
+        per_route = timed(lambda: [ev.optimal_SOC("winter", nodes, dest, roads, 5) for ev in fleet], 1) / 1e3
+
+        def from_map():
+            soc_map = fastest_path_SOC_map(nodes, dest, "winter", 0.13, 57.0, 5)
+            return [ev.optimal_SOC("winter", nodes, dest, roads, 5, soc_map=soc_map) for ev in fleet]
+        mapped = timed(from_map, 1) / 1e3
+        print(f"{count:>10} {per_route:>10.1f} {mapped:>10.1f}")
+
+
+def bench_csr(size=300, queries=5):
+    """
+    Compares start-up and search time of the CSV map against the memory-mapped CSR file.
+    """
+    nodes, roads = grid_map(size, size)
+    write_csv(nodes, roads, "bench_nodes.csv", "bench_edges.csv")
+    save_csr("bench.csr", nodes)
+
+    begin = time.perf_counter()
+    nodes, roads = create_map("bench_nodes.csv", "bench_edges.csv", 2, GEOTAB_data)
+    csv_load = time.perf_counter() - begin
+    begin = time.perf_counter()
+    graph = CSRGraph("bench.csr", GEOTAB_data)
+    csr_load = time.perf_counter() - begin
+
+    rng = random.Random(size)
+    ids = list(nodes.nodes)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(queries)]
+    objects = timed(lambda: [fastest_path(nodes, nodes.get_node(a), nodes.get_node(b)) for a, b in pairs], 1)
+    arrays = timed(lambda: [fastest_path(graph, a, b) for a, b in pairs], 1)
+
+    print("binary CSR graph")
+    print(f"{'nodes':>10} {'csv load s':>11} {'csr open s':>11} {'objects ms':>11} {'csr ms':>8}")
+    print(f"{len(ids):>10} {csv_load:>11.3f} {csr_load:>11.4f} {objects / queries / 1e3:>11.1f} {arrays / queries / 1e3:>8.1f}")
+    del graph
+    for path in ["bench_nodes.csv", "bench_edges.csv", "bench.csr"]:
+        os.remove(path)
+
+
+class PlainNode:
+    # Node as it was stored before __slots__, kept to measure the saving
+    def __init__(self, id, longitude, latitude, node_type):
+        self.id = id
+        self.longitude = longitude
+        self.latitude = latitude
+        self.type = node_type
+        self.edges = []
+
+
+class PlainEdge:
+    # Edge as it was stored before __slots__, kept to measure the saving
+    def __init__(self, node1, node2, distance, speed_limit):
+        self.node1 = node1
+        self.node2 = node2
+        self._distance = distance
+        self._speed_limit = speed_limit
+        self._travel_time = distance / speed_limit * 60
+        self._energy_costs = {}
+        node1.edges.append(self)
+        node2.edges.append(self)
+
+
+def object_bytes(node_class, edge_class, size):
+    """Returns the bytes allocated for a size x size grid of node and edge objects."""
+    tracemalloc.start()
+    grid = [node_class(i, float(i % size), float(i // size), 'intersection') for i in range(size * size)]
+    edges = []
+    for i in range(size * size):
+        if i % size + 1 < size:
+            edges.append(edge_class(grid[i], grid[i + 1], 10.0, 70))
+        if i + size < size * size:
+            edges.append(edge_class(grid[i], grid[i + size], 10.0, 70))
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return allocated, len(edges)
+
+
+def bench_memory(size=300):
+    """
+    Compares bytes per edge of the plain classes, the __slots__ Node/Edge and the CSR arrays.
+    Edge energy costs are left out so the three layouts store the same fields.
+    """
+    plain, edges = object_bytes(PlainNode, PlainEdge, size)
+    slotted, _ = object_bytes(Node, Edge, size)
+
+    nodes, roads = grid_map(size, size)
+    save_csr("bench.csr", nodes)
+    graph = CSRGraph("bench.csr")
+    arrays = sum(getattr(graph, name).nbytes for name, _, _ in CSR_ARRAYS)
+
+    print("map memory (bytes per edge, nodes included)")
+    print(f"{'edges':>10} {'plain':>8} {'slots':>8} {'csr':>8}")
+    print(f"{edges:>10} {plain / edges:>8.0f} {slotted / edges:>8.0f} {arrays / len(roads):>8.0f}")
+    del graph
+    os.remove("bench.csr")
+
+
+if __name__ == "__main__":
+    bench_select_road()
+    bench_fastest_path()
+    bench_contraction()
+    bench_batch()
+    bench_fleet()
+    bench_time_dependent()
+    bench_energy_model()
+    bench_soc_map()
+    bench_csr()
+    bench_memory()
@@ -0,0 +1,255 @@
+import heapq
+import pickle
+
+from map_graph import *
+
+WITNESS_SETTLE_LIMIT = 60
+# Maximum nodes a witness search settles before it gives up and keeps the shortcut
+
+
+class ContractionHierarchy:
+    def __init__(self, ids, rank, upward, middle):
+        """
+        Preprocessed road graph answering fastest path queries with two small upward searches.
+
+        Parameters:
+            ids (list): Node IDs, indexed by their internal position.
+            rank (list): Contraction order of every internal position, higher is more important.
+            upward (list): For every position, a list of (neighbor position, travel time) pairs
+                           leading to higher ranked nodes, shortcuts included.
+            middle (dict): (position, position) with the lower position first -> the node a
+                           shortcut bypasses, used to unpack shortcuts into road hops.
+        """
+        self._ids = ids
+        self._index = {id: i for i, id in enumerate(ids)}
+        self._rank = rank
+        self._upward = upward
+        self._middle = middle
+
+    @property
+    def ids(self):
+        """Node IDs covered by the hierarchy."""
+        return self._ids
+
+    @property
+    def shortcut_count(self):
+        """Number of shortcut edges added during preprocessing."""
+        return len(self._middle)
+
+    @classmethod
+    def build(cls, nodes):
+        """
+        Contracts every node of the map in order of importance, adding shortcuts that preserve
+        travel times between the remaining nodes.
+
+        Parameters:
+            nodes (Nodes): Nodes object containing all Node objects.
+
+        Returns:
+            ContractionHierarchy: The preprocessed hierarchy.
+        """
+        ids = list(nodes.nodes)
+        index = {id: i for i, id in enumerate(ids)}
+
+        # Undirected adjacency: position -> {neighbor position: travel time}, fastest parallel road kept
+        graph = [{} for _ in ids]
+        for node in nodes.nodes.values():
+            u = index[node.id]
+            for edge in node.edges:
+                v = index[edge.other_node(node).id]
+                if v != u and edge.travel_time < graph[u].get(v, float('inf')):
+                    graph[u][v] = edge.travel_time
+
+        middle = {}
+        contracted = [False] * len(ids)
+        deleted_neighbors = [0] * len(ids)
+        rank = [0] * len(ids)
+
+        priority_queue = [(cls._priority(graph, v, contracted, deleted_neighbors), v) for v in range(len(ids))]
+        heapq.heapify(priority_queue)
+
+        order = 0
+        while priority_queue:
+            _, v = heapq.heappop(priority_queue)
+            if contracted[v]:
+                continue
+
+            # Lazy update: contract only if the node is still the least important one
+            priority = cls._priority(graph, v, contracted, deleted_neighbors)
+            if priority_queue and priority > priority_queue[0][0]:
+                heapq.heappush(priority_queue, (priority, v))
+                continue
+
+            for u, w, time in cls._shortcuts(graph, v, contracted):
+                if time < graph[u].get(w, float('inf')):
+                    graph[u][w] = time
+                    graph[w][u] = time
+                    middle[(min(u, w), max(u, w))] = v
+
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for u in graph[v]:
+                deleted_neighbors[u] += 1
+
+        upward = [[(u, time) for u, time in graph[v].items() if rank[u] > rank[v]] for v in range(len(ids))]
+        return cls(ids, rank, upward, middle)
+
+    @staticmethod
+    def _shortcuts(graph, v, contracted):
+        """Returns the (u, w, time) shortcuts needed to keep travel times when v is contracted."""
+        neighbors = [(u, time) for u, time in graph[v].items() if not contracted[u]]
+        shortcuts = []
+        for i, (u, time_u) in enumerate(neighbors):
+            targets = {w: time_u + time_w for w, time_w in neighbors[i + 1:]}
+            if not targets:
+                continue
+            witness = ContractionHierarchy._witness_search(graph, u, v, contracted, max(targets.values()), targets)
+            for w, time in targets.items():
+                if witness.get(w, float('inf')) > time:
+                    shortcuts.append((u, w, time))
+        return shortcuts
+
+    @staticmethod
+    def _witness_search(graph, source, skip, contracted, limit, targets):
+        """Bounded Dijkstra from source over uncontracted nodes, avoiding skip."""
+        travel_times = {source: 0}
+        priority_queue = [(0, source)]
+        visited = set()
+        remaining = len(targets)
+
+        while priority_queue and len(visited) < WITNESS_SETTLE_LIMIT:
+            current_time, current = heapq.heappop(priority_queue)
+            if current in visited:
+                continue
+            visited.add(current)
+            if current_time > limit:
+                break
+            if current in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+
+            for neighbor, time in graph[current].items():
+                if neighbor == skip or contracted[neighbor] or neighbor in visited:
+                    continue
+                new_time = current_time + time
+                if new_time < travel_times.get(neighbor, float('inf')):
+                    travel_times[neighbor] = new_time
+                    heapq.heappush(priority_queue, (new_time, neighbor))
+
+        return travel_times
+
+    @staticmethod
+    def _priority(graph, v, contracted, deleted_neighbors):
+        """Edge difference of contracting v plus its contracted neighbors, lower contracts first."""
+        degree = sum(1 for u in graph[v] if not contracted[u])
+        shortcuts = len(ContractionHierarchy._shortcuts(graph, v, contracted))
+        return shortcuts - degree + deleted_neighbors[v]
+
+    def query(self, start_id, dest_id):
+        """
+        Finds the fastest route between two node IDs.
+
+        Parameters:
+            start_id (int): ID of the starting node.
+            dest_id (int): ID of the destination node.
+
+        Returns:
+            travel_time (float): Travel time in minutes, inf if the destination is unreachable.
+            path (list): Node IDs from start to destination, only the destination if unreachable.
+        """
+        source, target = self._index[start_id], self._index[dest_id]
+
+        # Index 0 searches up from the start, index 1 up from the destination
+        travel_times = ({source: 0}, {target: 0})
+        previous = ({source: None}, {target: None})
+        priority_queues = ([(0, source)], [(0, target)])
+        visited = (set(), set())
+        best_time = float('inf')
+        meeting = None
+
+        while priority_queues[0] or priority_queues[1]:
+            for side in (0, 1):
+                if not priority_queues[side]:
+                    continue
+                current_time, current = heapq.heappop(priority_queues[side])
+                if current in visited[side]:
+                    continue
+                # Upward searches cannot be stopped at the first meeting, only once the key exceeds the best
+                if current_time >= best_time:
+                    priority_queues[side].clear()
+                    continue
+                visited[side].add(current)
+
+                other_time = travel_times[1 - side].get(current)
+                if other_time is not None and current_time + other_time < best_time:
+                    best_time = current_time + other_time
+                    meeting = current
+
+                for neighbor, time in self._upward[current]:
+                    new_time = current_time + time
+                    if new_time < travel_times[side].get(neighbor, float('inf')):
+                        travel_times[side][neighbor] = new_time
+                        previous[side][neighbor] = current
+                        heapq.heappush(priority_queues[side], (new_time, neighbor))
+
+        if meeting is None:
+            return float('inf'), [dest_id]
+
+        # Chain of hierarchy edges start -> meeting -> destination
+        chain = []
+        current = meeting
+        while current is not None:
+            chain.append(current)
+            current = previous[0][current]
+        chain.reverse()
+        current = previous[1][meeting]
+        while current is not None:
+            chain.append(current)
+            current = previous[1][current]
+
+        path = [chain[0]]
+        for i in range(len(chain) - 1):
+            self._unpack(chain[i], chain[i + 1], path)
+        return best_time, [self._ids[i] for i in path]
+
+    def _unpack(self, u, w, path):
+        """Appends the road hops a hierarchy edge u -> w stands for, excluding u."""
+        stack = [(u, w)]
+        while stack:
+            a, b = stack.pop()
+            v = self._middle.get((min(a, b), max(a, b)))
+            if v is None:
+                path.append(b)
+            else:
+                # Expand a -> v first, so push v -> b underneath it
+                stack.append((v, b))
+                stack.append((a, v))
+
+    @profiled()
+    def fastest_path(self, nodes, start, dest):
+        """
+        Drop-in replacement for navigation.fastest_path answered from the hierarchy.
+
+        Parameters:
+            nodes (Nodes): Nodes object the hierarchy was built from.
+            start (Node): Starting node object.
+            dest (Node): Destination node object.
+
+        Returns:
+            path (list): List of node IDs in the fastest path from start to destination.
+        """
+        return self.query(start.id, dest.id)[1]
+
+    def save(self, file_path):
+        """Writes the preprocessed hierarchy to disk."""
+        with open(file_path, "wb") as f:
+            pickle.dump((self._ids, self._rank, self._upward, self._middle), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a hierarchy written by save."""
+        with open(file_path, "rb") as f:
+            ids, rank, upward, middle = pickle.load(f)
+        return cls(ids, rank, upward, middle)
@@ -0,0 +1,145 @@
+from collections import OrderedDict
+
+import numpy as np
+
+GEOTAB_data = {
+    "spring": {40: 98.2, 70: 84.8, 100: 68.4},
+    "summer": {40: 78.5, 70: 75.5, 100: 64.0},
+    "fall": {40: 78.5, 70: 75.5, 100: 64.0},
+    "winter": {40: 60.5, 70: 64.8, 100: 52.8}
+}
+# Data retrived from GEOTAB's "Impact of temperature and speed on EV range" model
+# https://www.geotab.com/blog/ev-range-impact-of-speed-and-temperature/
+
+SEASON_TEMPERATURE = {"spring": 20, "summer": 30, "fall": 10, "winter": -5}
+# Representative outside temperature of every season in degrees Celsius
+
+INDEX_CACHE_SIZE = 1024
+# (season, speed) impact indices an EnergyModel remembers, least recently used first out
+
+
+def _cell(grid, x):
+    """Returns the grid cell holding every x and the position of x within it, x clamped to the grid."""
+    x = np.clip(x, grid[0], grid[-1])
+    i = np.clip(np.searchsorted(grid, x, side="right") - 1, 0, len(grid) - 2)
+    return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+
+class EnergyModel:
+    def __init__(self, speeds, temperatures, table, seasons=SEASON_TEMPERATURE):
+        """
+        Impact index of driving at any speed and outside temperature, bilinearly interpolated
+        from a table. Speeds and temperatures outside the table take the value at its edge.
+
+        At the table's points the index is returned exactly, so a model built from GEOTAB_data
+        consumes the same as looking the season and speed limit up in it.
+
+        Parameters:
+            speeds (array-like): Increasing speeds in km/h, at least two.
+            temperatures (array-like): Increasing temperatures in degrees Celsius, at least two.
+            table (array-like): (speeds, temperatures) impact indices.
+            seasons (dict): Season -> temperature, so seasons can be passed wherever a temperature is.
+        """
+        self._speeds = np.asarray(speeds, dtype=float)
+        self._temperatures = np.asarray(temperatures, dtype=float)
+        self._table = np.asarray(table, dtype=float)
+        self._seasons = dict(seasons)
+        if self._table.shape != (len(self._speeds), len(self._temperatures)):
+            raise ValueError(f"Table shape {self._table.shape} does not match "
+                             f"{len(self._speeds)} speeds and {len(self._temperatures)} temperatures")
+        if len(self._speeds) < 2 or len(self._temperatures) < 2:
+            raise ValueError("The table needs at least two speeds and two temperatures")
+        self._indices = OrderedDict()  # (season, speed) -> impact index, for the per-hop scalar lookups
+
+    @classmethod
+    def from_seasons(cls, impact, seasons=SEASON_TEMPERATURE):
+        """
+        Builds the model of a Season -> {speed limit: impact index} table such as GEOTAB_data.
+
+        Parameters:
+            impact (dict): Every season must give the same speeds.
+            seasons (dict): Season -> temperature placing the seasons on the temperature axis.
+        """
+        by_temperature = sorted(impact, key=lambda season: seasons[season])
+        speeds = sorted(impact[by_temperature[0]])
+        table = [[impact[season][speed] for season in by_temperature] for speed in speeds]
+        return cls(speeds, [seasons[season] for season in by_temperature], table,
+                   {season: seasons[season] for season in impact})
+
+    @property
+    def seasons(self):
+        """Season -> temperature the model knows."""
+        return self._seasons
+
+    @property
+    def key(self):
+        """Hashable summary of the model, equal for models giving the same indices."""
+        return (tuple(self._speeds.tolist()), tuple(self._temperatures.tolist()),
+                tuple(self._table.ravel().tolist()), tuple(sorted(self._seasons.items())))
+
+    def temperature(self, season):
+        """Returns the temperature of a season, or season itself when it already is a temperature."""
+        return self._seasons[season] if isinstance(season, str) else season
+
+    def impact(self, speed, season):
+        """
+        Impact index of many speeds at once.
+
+        Parameters:
+            speed (float or ndarray): Speeds in km/h.
+            season (str, float or ndarray): Season, or temperatures in degrees Celsius broadcast
+                                            against speed.
+
+        Returns:
+            ndarray: The impact index of every speed.
+        """
+        i, u = _cell(self._speeds, np.asarray(speed, dtype=float))
+        j, v = _cell(self._temperatures, np.asarray(self.temperature(season), dtype=float))
+        table = self._table
+        low = table[i, j] * (1 - v) + table[i, j + 1] * v
+        high = table[i + 1, j] * (1 - v) + table[i + 1, j + 1] * v
+        return low * (1 - u) + high * u
+
+    def index(self, season, speed):
+        """
+        Returns the impact index of one season and speed as a float, remembered for the next call.
+        Temperatures are continuous, so only the INDEX_CACHE_SIZE most recently used are kept.
+        """
+        key = (season, speed)
+        index = self._indices.get(key)
+        if index is not None:
+            self._indices.move_to_end(key)
+            return index
+        index = self._indices[key] = float(self.impact(speed, season))
+        if len(self._indices) > INDEX_CACHE_SIZE:
+            self._indices.popitem(last=False)
+        return index
+
+    def min_index(self, season):
+        """Returns the lowest impact index of the season over all speeds."""
+        # The index is linear between the table's speeds, so its lowest value is at one of them
+        return float(self.impact(self._speeds, season).min())
+
+    def energy(self, distance, speed, season):
+        """Returns distance * impact index of many edges in one call, efficiency not applied."""
+        return np.asarray(distance, dtype=float) * self.impact(speed, season)
+
+
+_models = {}
+# id of a Season -> {speed limit: impact index} table -> (table, its EnergyModel), tables are not
+# expected to change once passed in, so converting one again reuses the model and its remembered lookups
+
+
+def as_energy_model(impact):
+    """Returns impact as an EnergyModel, building one when it is a Season -> {speed limit: impact index} table."""
+    if isinstance(impact, EnergyModel):
+        return impact
+    table, model = _models.get(id(impact), (None, None))
+    if table is not impact:
+        model = EnergyModel.from_seasons(impact)
+        _models[id(impact)] = (impact, model)
+    return model
+
+
+ENERGY_MODEL = as_energy_model(GEOTAB_data)
+# The GEOTAB model, used wherever no other model is given
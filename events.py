@@ -0,0 +1,254 @@
+import bisect
+import heapq
+import itertools
+import random
+
+
+class EventQueue:
+    def __init__(self):
+        """
+        Heap of timed events, popped in time order and, at equal times, in the order they were scheduled.
+        """
+        self._heap = []
+        self._counter = itertools.count()
+        self._now = 0.0
+
+    @property
+    def now(self):
+        """Time of the last event popped in minutes."""
+        return self._now
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, time, kind, data=None):
+        """
+        Adds an event.
+
+        Parameters:
+            time (float): When the event happens in minutes, not before now.
+            kind (str): Event type, selects the handler.
+            data (optional): Anything the handler needs.
+        """
+        heapq.heappush(self._heap, (max(time, self._now), next(self._counter), kind, data))
+
+    def peek_time(self):
+        """Returns the time of the next event, inf if there is none."""
+        return self._heap[0][0] if self._heap else float('inf')
+
+    def pop(self):
+        """Removes the next event and moves the clock to it, returns (time, kind, data)."""
+        time, _, kind, data = heapq.heappop(self._heap)
+        self._now = time
+        return time, kind, data
+
+    def advance(self, time):
+        """Moves the clock forward to time without an event."""
+        self._now = max(self._now, time)
+
+
+class StationQueue:
+    def __init__(self, station, busy_until=0.0, rng=None):
+        """
+        Queue state of one charging station, kept as its bookings in order of arrival.
+
+        The charger serves vehicles in the order they arrive, whenever they were booked. A
+        booking made ahead of time for a later arrival therefore moves back when another vehicle
+        is booked to arrive before it, and its wait is final once the clock reaches its arrival.
+        Bookings that have left by the time the station is looked at are dropped.
+
+        Other EVs arrive as a Poisson process at the station's expected rate and charge for its
+        average charge time, the same load ChargingStationManager.update draws per hop. Their
+        arrivals are only drawn when the station is looked at, up to the time it is looked at.
+
+        Parameters:
+            station (ChargingStationManager): The station the state belongs to.
+            busy_until (float): Time in minutes the queue present at time 0 clears.
+            rng (random.Random, optional): Generator for the other EVs, None for no other EVs.
+        """
+        self.station = station
+        self.arrivals = 0
+        self._free = busy_until  # Time the charger is free from, bookings left so far included
+        self._arrivals = []  # Arrival times of the bookings, sorted
+        self._bookings = []  # [arrival, duration, wait, leave, log record or None] in arrival order
+        self._rng = rng
+        self._next_arrival = self._gap() if rng is not None else float('inf')
+
+    def _gap(self):
+        return self._rng.expovariate(self.station.expect_ev_rate / 60)
+
+    @property
+    def busy_until(self):
+        """Time in minutes the charger is booked until, bookings ahead of time included."""
+        return self._bookings[-1][3] if self._bookings else self._free
+
+    def catch_up(self, now):
+        """Books the other EVs arriving up to now and drops the bookings that left by then."""
+        while self._next_arrival <= now:
+            self.book(self._next_arrival, self.station.average_charge_time)
+            self._next_arrival += self._gap()
+
+        # Nothing can be booked before now any more, so these waits cannot change
+        left = 0
+        while left < len(self._bookings) and self._bookings[left][3] <= now:
+            left += 1
+        if left:
+            self._free = self._bookings[left - 1][3]
+            del self._bookings[:left]
+            del self._arrivals[:left]
+
+    def queue_time(self, now):
+        """Returns the wait a vehicle arriving at now faces in minutes, from the bookings arriving before it."""
+        i = bisect.bisect_right(self._arrivals, now)
+        return max((self._bookings[i - 1][3] if i else self._free) - now, 0)
+
+    def reserve(self, now, duration, record=None):
+        """
+        Books the charger for a vehicle arriving at now, behind every booking arriving no later.
+
+        Parameters:
+            now (float): Arrival time in minutes.
+            duration (float): Charge time in minutes.
+            record (dict, optional): Log record whose "wait" and "leave" follow the booking.
+
+        Returns:
+            list: The booking, [arrival, duration, wait, leave, record], updated when it moves back.
+        """
+        i = bisect.bisect_right(self._arrivals, now)
+        wait = self.queue_time(now)
+        booking = [now, duration, wait, now + wait + duration, record]
+        self._arrivals.insert(i, now)
+        self._bookings.insert(i, booking)
+        self.arrivals += 1
+
+        # Later arrivals queue behind it, until one already started after it leaves
+        leave = booking[3]
+        for j in range(i + 1, len(self._bookings)):
+            later = self._bookings[j]
+            wait = max(leave - later[0], 0)
+            if wait == later[2]:
+                break
+            later[2], later[3] = wait, later[0] + wait + later[1]
+            if later[4] is not None:
+                later[4]["wait"], later[4]["leave"] = later[2], later[3]
+            leave = later[3]
+        return booking
+
+    def book(self, now, duration):
+        """
+        Books the charger for a vehicle arriving at now.
+
+        Returns:
+            wait (float): Minutes the vehicle queues before charging, final unless another
+                          vehicle is booked to arrive before it.
+            leave (float): Time the vehicle leaves the station.
+        """
+        booking = self.reserve(now, duration)
+        return booking[2], booking[3]
+
+
+class Scheduler:
+    def __init__(self, stations, rng=random, background=True):
+        """
+        Discrete-event simulation of charging station queues.
+
+        Stations are only touched when an event concerns them: a simulated vehicle books one, or
+        its queue time is read. The other EVs arriving at a station in between are drawn then (see
+        StationQueue), so advancing the clock costs nothing for the stations nobody looks at.
+        Simulated vehicles book the same StationQueue as the other EVs, so any number of them
+        contend for a station.
+
+        Parameters:
+            stations (list): ChargingStationManager objects, their queue_time is the initial queue.
+            rng (random.Random): Generator for the arrivals, the module-level one by default.
+            background (bool): Whether other EVs arrive at the stations, False leaves only the
+                               simulated vehicles and the initial queues.
+        """
+        self._events = EventQueue()
+        self._queues = {}
+        self._log = []
+        for station in stations:
+            self._queues[station.node.id] = StationQueue(station, station.queue_time, rng if background else None)
+            station.attach(self)
+
+    @property
+    def now(self):
+        """Simulation time in minutes."""
+        return self._events.now
+
+    @property
+    def log(self):
+        """Charging stops of simulated vehicles, in the order they were handled."""
+        return self._log
+
+    def station_queue(self, station_id):
+        """Returns the StationQueue of a station, with the other EVs arrived up to now."""
+        queue = self._queues[station_id]
+        queue.catch_up(self._events.now)
+        return queue
+
+    def queue_time(self, station):
+        """Returns the current wait at a station in minutes."""
+        return self.station_queue(station.node.id).queue_time(self._events.now)
+
+    def _handle(self, time, kind, data):
+        if kind == "vehicle":
+            vehicle_id, station_id, charge_time = data
+            self.reserve(station_id, time, charge_time, vehicle_id)
+        else:
+            raise ValueError(f"Unknown event kind: {kind}")
+
+    def advance(self, time):
+        """Handles every event up to time and moves the clock there."""
+        while self._events.peek_time() <= time:
+            self._handle(*self._events.pop())
+        self._events.advance(time)
+
+    def schedule_vehicle(self, time, vehicle_id, station_id, charge_time):
+        """
+        Schedules a simulated vehicle to arrive at a station and charge, its wait is in log once
+        the clock passes time.
+        """
+        self._events.schedule(time, "vehicle", (vehicle_id, station_id, charge_time))
+
+    def book(self, station_id, time, charge_time, vehicle_id=0):
+        """
+        Books a station now for a vehicle arriving at a later time, so vehicles deciding after it
+        see the booking in the station's queue.
+
+        Returns:
+            list: The StationQueue booking, its wait is final once the clock reaches the arrival, see wait.
+        """
+        time = max(time, self._events.now)
+        record = {"vehicle": vehicle_id, "station_id": station_id, "arrival": time,
+                  "wait": 0.0, "charge time": charge_time, "leave": time}
+        booking = self.station_queue(station_id).reserve(time, charge_time, record)
+        record["wait"], record["leave"] = booking[2], booking[3]
+        self._log.append(record)
+        return booking
+
+    def reserve(self, station_id, time, charge_time, vehicle_id=0):
+        """
+        Books a station now for a vehicle arriving at a later time, see book.
+
+        Returns:
+            float: Minutes the vehicle will wait before it starts charging, more if a vehicle
+                   arriving before it is booked later.
+        """
+        return self.book(station_id, time, charge_time, vehicle_id)[2]
+
+    def wait(self, station_id, booking):
+        """Returns the wait of a booking in minutes, final once the clock has reached its arrival."""
+        self.station_queue(station_id)
+        return booking[2]
+
+    def charge(self, station, charge_time, vehicle_id=0):
+        """
+        Books a station for a vehicle arriving now.
+
+        Returns:
+            float: Minutes the vehicle waits before it starts charging.
+        """
+        self.schedule_vehicle(self._events.now, vehicle_id, station.node.id, charge_time)
+        self.advance(self._events.now)
+        return self._log[-1]["wait"]
@@ -0,0 +1,223 @@
+import heapq
+import random
+
+import numpy as np
+
+from batch import *
+from events import *
+
+MAX_CANDIDATES = 4
+# Stations ahead on the route a vehicle compares when it has to charge
+
+
+class FleetSimulation(BatchSimulation):
+    def __init__(self, nodes, roads, stations, season, capacity, efficiency, threshold, end_trip_SOC,
+                 background=True, rng=random, candidates=MAX_CANDIDATES):
+        """
+        Simulates a fleet of vehicles sharing the same charging stations.
+
+        Vehicles follow their fastest route like BatchSimulation. Between charging stops a vehicle's
+        hops are worked out with array operations, and only its charging decisions and station
+        arrivals are events, handled in time order across the whole fleet. When a vehicle has to
+        charge it compares the next stations on its route it can still reach by the wait their
+        queues will have when it gets there plus the charge time, and reserves the best one. Later
+        decisions see that reservation in the station's queue, and stations serve vehicles in the
+        order they arrive, so the wait a vehicle spends is only known once it gets there.
+
+        With candidates=1, a single vehicle, no background EVs and no initial queues, a vehicle
+        charges where BatchSimulation(queue=False) does. More candidates let it pick a later station
+        with a shorter charge time instead.
+
+        Parameters:
+            nodes (Nodes): Nodes object containing all Node objects.
+            roads (Roads): The Edge objects returned by create_map.
+            stations (list): ChargingStationManager objects, their queues are shared by the fleet.
+            season (str): Season affecting energy consumption.
+            capacity (float): Battery capacity in kWh, shared by all vehicles.
+            efficiency (float): Energy efficiency in kWh per km, shared by all vehicles.
+            threshold (float): SOC in percentage below which vehicles look for charging.
+            end_trip_SOC (float): SOC in percentage that must remain at the destination.
+            background (bool): Whether EVs outside the fleet also arrive at the stations.
+            rng (random.Random): Generator for the background arrivals.
+            candidates (int): Stations ahead on the route compared at every charging decision.
+        """
+        super().__init__(nodes, roads, stations, season, capacity, efficiency, threshold, end_trip_SOC)
+        self._candidates = candidates
+        self._stations = {self._table.node_index(station.node.id): station for station in stations}
+        self._scheduler = Scheduler(stations, rng, background)
+        # Prevent battery from instant shut off, same floor as check_reachable
+        self._reserve = max(end_trip_SOC, 5)
+
+    @property
+    def scheduler(self):
+        """The events.Scheduler holding the station queues."""
+        return self._scheduler
+
+    def _target(self, SOC, remaining):
+        target = SOC + self._end_trip_SOC + remaining + 5
+        return 80 if target > 100 else target
+
+    def _next_decision(self, v, start, SOC):
+        """
+        Finds where vehicle v next has to charge, driving from hop start with SOC.
+
+        Returns:
+            hop (int): The hop after which it has to charge, or fails, -1 if it finishes the route.
+            failed (bool): Whether the battery runs out at hop.
+        """
+        end = self._hops[v]
+        if start >= end:
+            return -1, False
+        SOC = SOC - (self._used[v, start:end] - (self._used[v, start - 1] if start else 0))
+        failed = SOC < 0
+        need = (self._at_cs[v, start:end] & (SOC < self._threshold)
+                & (SOC - self._remaining[v, start:end] < self._reserve))
+        first_failed = failed.argmax() if failed.any() else end
+        first_need = need.argmax() if need.any() else end
+        if first_failed <= first_need and first_failed < end:
+            return start + first_failed, True
+        if first_need < end:
+            return start + first_need, False
+        return -1, False
+
+    def _SOC_at(self, v, hop):
+        """SOC of vehicle v after driving hop, given the SOC it last charged to."""
+        last = self._last[v]
+        return self._SOC[v] - (self._used[v, hop] - (self._used[v, last - 1] if last else 0))
+
+    def _decide(self, time, v, hop):
+        """
+        Picks and reserves the charging stop of vehicle v, which reached hop at time.
+
+        Returns:
+            h (int): The hop after which it stops, or drives on if charging cannot raise its SOC.
+            arrival (float): Time it reaches the station.
+            booking (tuple): (station ID, StationQueue booking, charge time), None if it drives on.
+        """
+        end = self._hops[v]
+        best = None
+        candidates = 0
+        for h in range(hop, end):
+            SOC = self._SOC_at(v, h)
+            if h > hop and SOC < self._reserve:
+                break
+            if not self._at_cs[v, h]:
+                continue
+            station = self._stations[self._reached[v, h]]
+            target = self._target(SOC, self._remaining[v, h])
+            charge_time = station.charge_time(SOC, self._capacity, target)
+            arrival = time + self._time[v, h] - self._time[v, hop]
+            queue = self._scheduler.station_queue(station.node.id)
+            cost = queue.queue_time(arrival) + charge_time
+            if best is None or cost < best[0]:
+                best = (cost, h, SOC, target, charge_time, arrival, station)
+            candidates += 1
+            if candidates == self._candidates:
+                break
+
+        _, h, SOC, target, charge_time, arrival, station = best
+        self._last[v] = h + 1
+        if target <= SOC:
+            # Charging cannot raise the SOC, drive on with it
+            self._SOC[v] = SOC
+            return h, arrival, None
+        booking = self._scheduler.book(station.node.id, arrival, charge_time, v)
+        self._charge_time[v] += charge_time
+        self._charge_stops[v] += 1
+        self._SOC[v] = target
+        return h, arrival, (station.node.id, booking, charge_time)
+
+    def _charge(self, v, booking):
+        """Adds the final wait and the charge time of vehicle v's booking to its delay."""
+        station_id, booking, charge_time = booking
+        wait = self._scheduler.wait(station_id, booking)
+        self._delay[v] += wait + charge_time
+        self._queue_time[v] += wait
+
+    def run(self, starts, dests, SOC, depart=0):
+        """
+        Drives every vehicle to its destination.
+
+        Parameters:
+            starts (array-like): Start node ID of every vehicle.
+            dests (array-like): Destination node ID of every vehicle.
+            SOC (float or array-like): Initial SOC in percentage of every vehicle.
+            depart (float or array-like): Departure time of every vehicle in minutes.
+
+        Returns:
+            dict: Column name -> array with one entry per vehicle, the BatchSimulation.run columns.
+        """
+        edges, reached = self.routes(list(starts), list(dests))
+        trips = len(edges)
+        if not edges.shape[1]:
+            # Every route is a single node, keep one padded hop so the arrays can be indexed
+            edges, reached = np.full((trips, 1), -1, dtype=np.int64), np.zeros((trips, 1), dtype=np.int64)
+        valid = edges >= 0
+
+        # Per-vehicle route profiles, cumulative along the route
+        self._reached = reached
+        self._hops = valid.sum(axis=1)
+        self._used = np.cumsum(np.where(valid, self._drain[edges], 0), axis=1)
+        self._time = np.cumsum(np.where(valid, self._table.travel_time[edges], 0), axis=1)
+        length = np.cumsum(np.where(valid, self._table.distance[edges], 0), axis=1)
+        self._remaining = self._used[:, -1:] - self._used
+        self._at_cs = valid & self._table.is_cs[reached] & (self._charge_rate[reached] > 0)
+
+        # Per-vehicle state
+        self._SOC = np.broadcast_to(np.asarray(SOC, dtype=float), (trips,)).copy()
+        self._last = np.zeros(trips, dtype=np.int64)
+        self._delay = np.zeros(trips)
+        self._charge_time = np.zeros(trips)
+        self._queue_time = np.zeros(trips)
+        self._charge_stops = np.zeros(trips, dtype=np.int64)
+        depart = np.broadcast_to(np.asarray(depart, dtype=float), (trips,))
+
+        # First decision of every vehicle at once, the same test as _next_decision
+        SOC_after = self._SOC[:, None] - self._used
+        fail = valid & (SOC_after < 0)
+        need = self._at_cs & (SOC_after < self._threshold) & (SOC_after - self._remaining < self._reserve)
+        width = edges.shape[1]
+        first_fail = np.where(fail.any(axis=1), fail.argmax(axis=1), width)
+        first_need = np.where(need.any(axis=1), need.argmax(axis=1), width)
+        failed = (first_fail < width) & (first_fail <= first_need)
+        driven = np.where(failed, first_fail + 1, self._hops)
+
+        # (time, vehicle, hop, booking): a charging decision at hop, or with a booking the arrival
+        # at the station after hop. A vehicle has one event at a time, so ties never reach booking.
+        events = [(depart[v] + self._time[v, hop], v, hop, None)
+                  for v, hop in zip(np.flatnonzero(~failed & (first_need < width)).tolist(),
+                                    first_need[~failed & (first_need < width)].tolist())]
+        heapq.heapify(events)
+
+        while events:
+            time, v, hop, booking = heapq.heappop(events)
+            self._scheduler.advance(time)
+            if booking is None:
+                h, arrival, booking = self._decide(time, v, hop)
+                if booking is not None:
+                    heapq.heappush(events, (arrival, v, h, booking))
+                    continue
+            else:
+                h = hop
+                self._charge(v, booking)
+            next_hop, fail = self._next_decision(v, h + 1, self._SOC[v])
+            if fail:
+                failed[v], driven[v] = True, next_hop + 1
+            elif next_hop >= 0:
+                heapq.heappush(events, (depart[v] + self._delay[v] + self._time[v, next_hop], v, next_hop, None))
+
+        rows = np.arange(trips)
+        last_hop = np.maximum(driven - 1, 0)
+        has_hops = driven > 0
+        since_charge = self._used[rows, last_hop] - np.where(self._last > 0, self._used[rows, self._last - 1], 0)
+        final_SOC = np.where(has_hops & (self._last <= last_hop), self._SOC - since_charge, self._SOC)
+        return {
+            "total_time": np.where(has_hops, self._time[rows, last_hop], 0) + self._delay,
+            "total_length": np.where(has_hops, length[rows, last_hop], 0),
+            "final_SOC": final_SOC,
+            "charge_stops": self._charge_stops,
+            "charge_time": self._charge_time,
+            "queue_time": self._queue_time,
+            "failed": failed,
+            "hops": driven,
+        }
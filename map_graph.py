@@ -1,15 +1,26 @@
+import heapq
 import math
+import os
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
 
+from energy_model import *
+from profiling import *
+
 class Node:
+    __slots__ = ("id", "longitude", "latitude", "type", "edges", "_collection")
+
     def __init__(self, id, longitude, latitude, node_type):
         self.id = id
         self.longitude = longitude
         self.latitude = latitude
         self.type = node_type  # Type of node (CS, start, dest, intersection)
         self.edges = []  # List of edges connected to this node
+        self._collection = None  # Nodes object indexing this node by type
     
     def add_edge(self, edge):
         """Adds an edge to the node."""
@@ -17,7 +28,10 @@ class Node:
     
     def set_node(self, type):
         """Sets a node's type"""
+        previous = self.type
         self.type = type
+        if self._collection is not None:
+            self._collection.retype(self, previous)
 
     def __repr__(self):
         return f"Node({self.id}, lat={self.latitude}, long={self.longitude}, type={self.type})"
@@ -31,6 +45,12 @@ class Nodes:
     def __init__(self):
         """Initialize the Nodes object with a dictionary of Node objects."""
         self._nodes = {}  # Dictionary to store nodes by their ID
+        self._roads = None  # Road index shared with the map, set by create_map
+        self._distance_adjust = None  # Coordinate to kilometer multiplier, set by create_map
+        self._trip_types = {}  # Node ID -> type the node had before set_start_dest changed it
+        self._order = {}  # Node ID -> insertion position, keeps type lookups in file order
+        self._types = {}  # Node type -> {node ID: Node}, each kept in insertion order
+        self._grids = {}  # Node type (None for all nodes) -> SpatialGrid, built on first query
 
     def add_node(self, id, node):
         """
@@ -40,7 +60,41 @@ class Nodes:
             id (int): The ID of the node.
             node (Node): The Node object to add.
         """
+        replaced = self._nodes.get(id)
+        if replaced is not None:
+            self._types[replaced.type].pop(id, None)
+            replaced._collection = None
+
         self._nodes[id] = node
+        self._order.setdefault(id, len(self._order))
+        self._index(node)
+        node._collection = self
+        self._grids = {}
+
+    def retype(self, node, previous):
+        """Moves a node between type indexes, called by Node.set_node."""
+        self._types.get(previous, {}).pop(node.id, None)
+        self._index(node)
+        self._grids.pop(previous, None)
+        self._grids.pop(node.type, None)
+
+    def _index(self, node):
+        """
+        Adds a node to its type index, keeping the index in insertion order.
+
+        New nodes land at the end, so the index is only re-sorted when a node
+        added earlier is moved into the type (set_start_dest and its restore).
+        """
+        matches = self._types.setdefault(node.type, {})
+        matches.pop(node.id, None)
+        in_order = not matches or self._order[next(reversed(matches))] < self._order[node.id]
+        matches[node.id] = node
+        if not in_order:
+            self._types[node.type] = dict(sorted(matches.items(), key=lambda item: self._order[item[0]]))
+
+    def of_type(self, node_type):
+        """Returns the nodes of a type in the order they were added, in O(k) for k matches."""
+        return list(self._types.get(node_type, {}).values())
 
     # For testing
     @property
@@ -52,33 +106,89 @@ class Nodes:
     @property
     def start(self):
         """Returns the start node."""
-        for node in self._nodes.values():
-            if node.type == 'start':
-                return node
-        return None
+        return self._first_of_type('start')
 
     @property
     def dest(self):
         """Returns the destination node."""
-        for node in self._nodes.values():
-            if node.type == 'dest':
-                return node
-        return None
+        return self._first_of_type('dest')
+
+    def _first_of_type(self, node_type):
+        """Returns the earliest added node of a type, or None."""
+        matches = self._types.get(node_type)
+        if not matches:
+            return None
+        return next(iter(matches.values()))
 
     @property
     def all_cs(self):
         """Returns a list of all charging station nodes."""
-        return [node for node in self._nodes.values() if node.type == 'CS']
+        return self.of_type('CS')
+
+    def within(self, longitude, latitude, radius, node_type=None):
+        """
+        Finds the nodes within a straight-line radius of a point using a grid index, so only the
+        cells overlapping the radius are visited.
+
+        Parameters:
+            longitude (float): Longitude of the point.
+            latitude (float): Latitude of the point.
+            radius (float): Radius in kilometers, converted with the map's distance adjustment.
+            node_type (str, optional): Only return nodes of this type, e.g. 'CS'.
+
+        Returns:
+            list: Matching nodes in the order they were added.
+        """
+        if node_type not in self._grids:
+            members = self._nodes.values() if node_type is None else self._types.get(node_type, {}).values()
+            self._grids[node_type] = SpatialGrid(members)
+
+        ADJUST = self._distance_adjust or 1
+        found = self._grids[node_type].query(longitude, latitude, radius / ADJUST)
+        return sorted(found, key=lambda node: self._order[node.id])
     
     def get_node(self, id):
         """Returns the node with corresponding id."""
         return self._nodes.get(id)
     
+    def set_roads(self, roads):
+        """Attaches the road index so hops can be resolved from the node collection."""
+        self._roads = roads
+
+    @property
+    def roads(self):
+        """Returns the attached road index."""
+        return self._roads
+
+    @property
+    def distance_adjust(self):
+        """Returns the multiplier converting coordinate distances to kilometers."""
+        return self._distance_adjust
+
+    def set_distance_adjust(self, ADJUST):
+        """Records the multiplier the edge distances were built with."""
+        self._distance_adjust = ADJUST
+
+    def get_road(self, node1_id, node2_id):
+        """Returns the edge connecting the two node ids, or None if they are not adjacent."""
+        if self._roads is None:
+            node = self._nodes.get(node1_id)
+            return next((edge for edge in node.edges if edge.other_node(node).id == node2_id), None)
+        return self._roads.get(node1_id, node2_id)
+
     def set_start_dest(self, start, dest):
         """Set the start and destination"""
+        for id in (start, dest):
+            self._trip_types.setdefault(id, self._nodes.get(id).type)
         self._nodes.get(start).set_node("start")
         self._nodes.get(dest).set_node("dest")
         return
+
+    def reset_start_dest(self):
+        """Restores the node types set_start_dest changed, so the map can be reused for another trip."""
+        for id, node_type in self._trip_types.items():
+            self._nodes.get(id).set_node(node_type)
+        self._trip_types = {}
     
     def is_CS(self, id):
         """Checks if the node is a charging station"""
@@ -87,12 +197,72 @@ class Nodes:
             return True
         return False
 
+class SpatialGrid:
+    def __init__(self, nodes, cell_size=None):
+        """
+        Uniform grid bucketing nodes by coordinates for radius queries.
+
+        Parameters:
+            nodes (iterable): Node objects to index.
+            cell_size (float, optional): Cell width in coordinate units. By default the bounding
+                                         box is split into about one cell per node.
+        """
+        nodes = list(nodes)
+        if cell_size is None:
+            if nodes:
+                width = max(node.longitude for node in nodes) - min(node.longitude for node in nodes)
+                height = max(node.latitude for node in nodes) - min(node.latitude for node in nodes)
+                cell_size = max(width, height) / math.sqrt(len(nodes))
+            cell_size = cell_size or 1.0
+
+        self._cell_size = cell_size
+        self._cells = {}  # (column, row) -> list of nodes
+        for node in nodes:
+            self._cells.setdefault(self._cell(node.longitude, node.latitude), []).append(node)
+
+    def _cell(self, longitude, latitude):
+        return (math.floor(longitude / self._cell_size), math.floor(latitude / self._cell_size))
+
+    def query(self, longitude, latitude, radius):
+        """Returns the nodes within radius, in coordinate units, of the point."""
+        min_column, min_row = self._cell(longitude - radius, latitude - radius)
+        max_column, max_row = self._cell(longitude + radius, latitude + radius)
+
+        # Visit whichever is smaller, the cells the radius covers or the occupied cells
+        if (max_column - min_column + 1) * (max_row - min_row + 1) > len(self._cells):
+            candidates = [nodes for (column, row), nodes in self._cells.items()
+                          if min_column <= column <= max_column and min_row <= row <= max_row]
+        else:
+            candidates = [self._cells[(column, row)]
+                          for column in range(min_column, max_column + 1)
+                          for row in range(min_row, max_row + 1)
+                          if (column, row) in self._cells]
+
+        found = []
+        for nodes in candidates:
+            for node in nodes:
+                if math.hypot(node.longitude - longitude, node.latitude - latitude) <= radius:
+                    found.append(node)
+        return found
+
+
+NO_ENERGY_COSTS = {}
+# Shared by edges whose energy costs were not precomputed, set_energy_costs replaces it per edge
+
+
 class Edge:
+    __slots__ = ("node1", "node2", "_distance", "_speed_limit", "_travel_time", "_energy_costs", "_energy_model",
+                 "_position")
+
     def __init__(self, node1, node2, distance, speed_limit):
         self.node1 = node1  # First node this edge connects
         self.node2 = node2  # Second node this edge connects
         self._distance = distance  # Calculated distance between the nodes in kilometers
         self._speed_limit = speed_limit  # Speed limit in km/h
+        self._travel_time = distance / speed_limit * 60  # Travel time in minutes
+        self._energy_costs = NO_ENERGY_COSTS  # Season -> distance * impact index, efficiency not applied
+        self._energy_model = ENERGY_MODEL  # Model the costs come from, also for seasons not precomputed
+        self._position = -1  # Index in the Roads the edge was added to
         
         # Automatically add this edge to both nodes
         self.node1.add_edge(self)
@@ -115,6 +285,144 @@ class Edge:
         """Returns the speed limit for this edge."""
         return self._speed_limit
 
+    @property
+    def travel_time(self):
+        """Returns the time needed to drive this edge at the speed limit in minutes."""
+        return self._travel_time
+
+    @property
+    def position(self):
+        """Returns the index of the edge in its Roads, e.g. into Roads.edge_energy, -1 if not added."""
+        return self._position
+
+    def set_energy_costs(self, impact):
+        """
+        Precomputes the per-season energy cost of the edge.
+
+        Parameters:
+            impact (dict or EnergyModel): Season -> {speed limit: impact index}, e.g. GEOTAB_data,
+                                          or the EnergyModel to evaluate the speed limit with.
+        """
+        model = as_energy_model(impact)
+        self._energy_model = model
+        self._energy_costs = {season: self._distance * model.index(season, self._speed_limit)
+                              for season in model.seasons}
+
+    @property
+    def energy_model(self):
+        """Returns the EnergyModel the energy costs of the edge come from."""
+        return self._energy_model
+
+    def energy_cost(self, season):
+        """Returns distance * impact index for the season, multiply by the vehicle efficiency for consumption."""
+        cost = self._energy_costs.get(season)
+        if cost is None:
+            # Not precomputed, e.g. a temperature rather than a season
+            return self._distance * self._energy_model.index(season, self._speed_limit)
+        return cost
+
+
+def road_key(node1_id, node2_id):
+    """Returns the unordered key identifying the road between two nodes."""
+    return (node1_id, node2_id) if node1_id <= node2_id else (node2_id, node1_id)
+
+
+EDGE_ENERGY_CACHE_SIZE = 16
+# (season, efficiency) consumption arrays a Roads object keeps, least recently used first out
+
+
+class Roads:
+    def __init__(self):
+        """Initialize the Roads object, a list of edges indexed by their end nodes."""
+        self._edges = []  # Edges in insertion order
+        self._index = {}  # Unordered node id pair -> Edge
+        self._max_speed_limit = 0  # Fastest speed limit on the map in km/h
+        self._energy_model = ENERGY_MODEL  # Model the map's energy costs come from
+        self._energy = OrderedDict()  # (season, efficiency, model) -> consumption of every edge, see edge_energy
+
+    def add_edge(self, edge):
+        """
+        Add an edge to the collection.
+
+        Parameters:
+            edge (Edge): The Edge object to add. When two edges join the same nodes the first one
+            stays in the index, which is the one a linear scan would find.
+        """
+        edge._position = len(self._edges)
+        self._edges.append(edge)
+        self._energy.clear()
+        self._index.setdefault(road_key(edge.node1.id, edge.node2.id), edge)
+        self._max_speed_limit = max(self._max_speed_limit, edge.speed_limit)
+
+    @property
+    def max_speed_limit(self):
+        """Returns the fastest speed limit among the edges in km/h."""
+        return self._max_speed_limit
+
+    def get(self, node1_id, node2_id):
+        """Returns the edge connecting the two node ids, or None if no such edge exists."""
+        return self._index.get(road_key(node1_id, node2_id))
+
+    @property
+    def energy_model(self):
+        """Returns the EnergyModel the edges' energy costs come from, GEOTAB's unless create_map got another."""
+        return self._energy_model
+
+    def set_energy_model(self, model):
+        """Records the EnergyModel the edges' energy costs were computed with."""
+        self._energy_model = model
+        self._energy.clear()
+
+    def edge_energy(self, season, efficiency, model=None):
+        """
+        Consumption of driving every edge, indexed by Edge.position.
+
+        Vehicles of the same efficiency and model share the list, it is computed in one array
+        operation the first time a (season, efficiency, model) asks for it. The
+        EDGE_ENERGY_CACHE_SIZE most recently used lists are kept.
+
+        Parameters:
+            season (str): Season affecting energy consumption.
+            efficiency (float): Energy efficiency of the vehicle in kWh per km.
+            model (EnergyModel, optional): The vehicle's model, the map's energy_model by default.
+
+        Returns:
+            list: Consumption in kWh of every edge, distance * impact index * efficiency.
+        """
+        model = model or self._energy_model
+        energy = self._cached((season, efficiency, model))
+        if energy is None:
+            # The season's costs before efficiency are kept too, for the next efficiency class
+            costs = self._cached((season, None, model))
+            if costs is None:
+                distance = np.array([edge.distance for edge in self._edges], dtype=float)
+                speed_limit = np.array([edge.speed_limit for edge in self._edges], dtype=float)
+                costs = self._store((season, None, model), model.energy(distance, speed_limit, season))
+            energy = self._store((season, efficiency, model), (costs * efficiency).tolist())
+        return energy
+
+    def _cached(self, key):
+        value = self._energy.get(key)
+        if value is not None:
+            self._energy.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        self._energy[key] = value
+        if len(self._energy) > EDGE_ENERGY_CACHE_SIZE:
+            self._energy.popitem(last=False)
+        return value
+
+    def __iter__(self):
+        return iter(self._edges)
+
+    def __len__(self):
+        return len(self._edges)
+
+    def __getitem__(self, i):
+        return self._edges[i]
+
+@profiled()
 def select_road(node1_id, node2_id, edges):
     """
     Selects an edge from the edges list that connects the given node IDs.
@@ -122,16 +430,28 @@ def select_road(node1_id, node2_id, edges):
     Parameters:
         node1_id (int): The ID of the first node.
         node2_id (int): The ID of the second node.
-        edges (list): List of Edge objects.
+        edges (Roads or list): Road index from create_map, or a plain list of Edge objects.
     
     Returns:
         Edge: The edge connecting node1_id and node2_id, or None if no such edge exists.
     """
+    if isinstance(edges, (Roads, CSRGraph)):
+        return edges.get(node1_id, node2_id)
+
     for edge in edges:
         if (edge.node1.id == node1_id and edge.node2.id == node2_id) or (edge.node1.id == node2_id and edge.node2.id == node1_id):
             return edge
     return None
 
+def hop_cost(edge, season, model):
+    """
+    Returns distance * impact index of an edge under model, the edge's precomputed energy cost
+    when the map was built with that model.
+    """
+    if edge.energy_model is model:
+        return edge.energy_cost(season)
+    return edge.distance * model.index(season, edge.speed_limit)
+
 def euclidean_distance(node1, node2):
     """Calculates the Euclidean distance between two nodes based on latitude and longitude."""
     lon1, lat1 = node1.longitude, node1.latitude
@@ -139,42 +459,47 @@ def euclidean_distance(node1, node2):
     return math.sqrt((lon2 - lon1) ** 2 + (lat2 - lat1) ** 2) # Approx conversion to kilometers
 
 
-def create_map(nodes_file_path, edges_file_path, ADJUST):
+def create_map(nodes_file_path, edges_file_path, ADJUST, impact=None):
     """
     Creates a map by reading nodes and edges from CSV files.
     
     Parameters:
         nodes_file_path (str): Path to the nodes.csv file.
         edges_file_path (str): Path to the edges.csv file.
+        ADJUST (float): Distance multiplier converting coordinates to kilometers.
+        impact (dict or EnergyModel, optional): Season -> {speed limit: impact index}, or an EnergyModel,
+                                                used to precompute edge energy costs.
     
     Returns:
         nodes (Nodes): A Nodes object containing all Node objects.
-        edges (list): A list of Edge objects.
+        edges (Roads): The Edge objects, indexed by their end nodes.
     """
-    # Read nodes from nodes.csv
+    # Read nodes from nodes.csv, walking whole columns rather than building a Series per row
     nodes_df = pd.read_csv(nodes_file_path)
     nodes = Nodes()  # Create an instance of the Nodes class
 
-    for _, row in nodes_df.iterrows():
+    for id, longitude, latitude, node_type in zip(nodes_df['id'].tolist(), nodes_df['longitude'].tolist(),
+                                                  nodes_df['latitude'].tolist(), nodes_df['type'].tolist()):
         # Add each node to the Nodes object
-        node = Node(row['id'], row['longitude'], row['latitude'], row['type'])
-        nodes.add_node(row['id'], node)
+        node = Node(id, longitude, latitude, node_type)
+        nodes.add_node(id, node)
 
     # Read edges from edges.csv
     edges_df = pd.read_csv(edges_file_path)
-    edges = []
+    edges = Roads()
 
-    for _, row in edges_df.iterrows():
+    for node1_id, node2_id, road_type in zip(edges_df['node1'].tolist(), edges_df['node2'].tolist(),
+                                             edges_df['road_type'].tolist()):
         # Find nodes by their IDs using the Nodes class
-        node1 = nodes.nodes[row['node1']]
-        node2 = nodes.nodes[row['node2']]
+        node1 = nodes.nodes[node1_id]
+        node2 = nodes.nodes[node2_id]
         
         # Set speed limit based on road type
-        if row['road_type'] == 'highway':
+        if road_type == 'highway':
             speed_limit = 100
-        elif row['road_type'] == 'local':
+        elif road_type == 'local':
             speed_limit = 70
-        elif row['road_type'] == 'nbhd':
+        elif road_type == 'nbhd':
             speed_limit = 40
 
         # Calculate distance between nodes
@@ -182,11 +507,457 @@ def create_map(nodes_file_path, edges_file_path, ADJUST):
         
         # Create Edge object
         edge = Edge(node1, node2, distance, speed_limit)
-        edges.append(edge)
+        edges.add_edge(edge)
+
+    if impact is not None:
+        # Every season's costs for all edges in one evaluation of the model
+        model = as_energy_model(impact)
+        distance = np.array([edge.distance for edge in edges], dtype=float)
+        speed_limit = np.array([edge.speed_limit for edge in edges], dtype=float)
+        costs = {season: model.energy(distance, speed_limit, season).tolist() for season in model.seasons}
+        for i, edge in enumerate(edges):
+            edge._energy_costs = {season: costs[season][i] for season in costs}
+            edge._energy_model = model
+        edges.set_energy_model(model)
+
+    nodes.set_roads(edges)
+    nodes.set_distance_adjust(ADJUST)
+    return nodes, edges
+
+
+_map_cache = {}
+# (file paths, modification times, ADJUST, impact) -> (nodes, edges) built by create_map
+
+
+def load_map(nodes_file_path, edges_file_path, ADJUST, impact=None):
+    """
+    Returns the map for the files, building it with create_map only the first time.
+
+    The cached map is keyed by the file paths, their modification times, ADJUST and the impact
+    table, so editing a file rebuilds it. Trip state set by set_start_dest is reset before the
+    map is handed out again.
+
+    Parameters:
+        nodes_file_path (str): Path to the nodes.csv file.
+        edges_file_path (str): Path to the edges.csv file.
+        ADJUST (float): Distance multiplier converting coordinates to kilometers.
+        impact (dict or EnergyModel, optional): Season -> {speed limit: impact index}, or an EnergyModel,
+                                                used to precompute edge energy costs.
 
+    Returns:
+        nodes (Nodes): A Nodes object containing all Node objects.
+        edges (Roads): The Edge objects, indexed by their end nodes.
+    """
+    files = tuple((os.path.abspath(path), os.path.getmtime(path)) for path in (nodes_file_path, edges_file_path))
+    impact_key = None
+    if impact is not None:
+        impact_key = as_energy_model(impact).key
+    key = (files, ADJUST, impact_key)
+
+    if key not in _map_cache:
+        _map_cache[key] = create_map(nodes_file_path, edges_file_path, ADJUST, impact)
+
+    nodes, edges = _map_cache[key]
+    nodes.reset_start_dest()
     return nodes, edges
 
 
+CSR_MAGIC = b"EVCSR001"
+# First bytes of a binary graph file written by save_csr
+
+NODE_TYPES = ["intersection", "CS", "start", "dest"]
+# Node type codes stored in binary graph files
+
+CSR_ARRAYS = [
+    ("node_ids", np.int64, "nodes"),
+    ("longitude", np.float64, "nodes"),
+    ("latitude", np.float64, "nodes"),
+    ("node_type", np.int8, "nodes"),
+    ("offsets", np.int64, "offsets"),
+    ("neighbors", np.int64, "adjacency"),
+    ("distance", np.float64, "adjacency"),
+    ("speed_limit", np.int32, "adjacency"),
+]
+# Arrays of a binary graph file in storage order, with the count that sizes them
+
+
+def _csr_layout(node_count, adjacency_count):
+    """Returns (name, dtype, byte offset, length) of every array in a binary graph file."""
+    counts = {"nodes": node_count, "offsets": node_count + 1, "adjacency": adjacency_count}
+    layout = []
+    position = len(CSR_MAGIC) + 16  # Magic followed by the two counts
+    for name, dtype, count in CSR_ARRAYS:
+        layout.append((name, dtype, position, counts[count]))
+        position += counts[count] * np.dtype(dtype).itemsize
+        position += -position % 8  # Keep every array 8-byte aligned
+    return layout
+
+
+def save_csr(file_path, nodes):
+    """
+    Writes the map as a compressed sparse row graph into a single binary file that CSRGraph
+    memory-maps. Nodes are stored sorted by ID and every road appears once in the adjacency of
+    each of its end nodes.
+
+    Parameters:
+        file_path (str): Path of the binary graph file to write.
+        nodes (Nodes): Nodes object containing all Node objects, with their current types.
+    """
+    ordered = sorted(nodes.nodes.values(), key=lambda node: node.id)
+    position = {node.id: i for i, node in enumerate(ordered)}
+
+    offsets = [0]
+    neighbors, distance, speed_limit = [], [], []
+    for node in ordered:
+        for edge in node.edges:
+            neighbors.append(position[edge.other_node(node).id])
+            distance.append(edge.distance)
+            speed_limit.append(edge.speed_limit)
+        offsets.append(len(neighbors))
+
+    values = {
+        "node_ids": [node.id for node in ordered],
+        "longitude": [node.longitude for node in ordered],
+        "latitude": [node.latitude for node in ordered],
+        "node_type": [NODE_TYPES.index(node.type) for node in ordered],
+        "offsets": offsets,
+        "neighbors": neighbors,
+        "distance": distance,
+        "speed_limit": speed_limit,
+    }
+
+    with open(file_path, "wb") as f:
+        f.write(CSR_MAGIC)
+        f.write(np.array([len(ordered), len(neighbors)], dtype=np.int64).tobytes())
+        for name, dtype, offset, _ in _csr_layout(len(ordered), len(neighbors)):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.asarray(values[name], dtype=dtype).tobytes())
+
+
+class CSRNode:
+    __slots__ = ("_graph", "_index")
+
+    def __init__(self, graph, index):
+        """Lightweight view of a node stored in a CSRGraph, with the Node API the simulation uses."""
+        self._graph = graph
+        self._index = index
+
+    def __eq__(self, other):
+        return isinstance(other, CSRNode) and other._graph is self._graph and other._index == self._index
+
+    def __hash__(self):
+        return hash(self._index)
+
+    def __repr__(self):
+        return f"Node({self.id}, lat={self.latitude}, long={self.longitude}, type={self.type})"
+
+    @property
+    def index(self):
+        """Position of the node in the graph arrays."""
+        return self._index
+
+    @property
+    def id(self):
+        return self._graph.node_ids[self._index].item()
+
+    @property
+    def longitude(self):
+        return self._graph.longitude[self._index].item()
+
+    @property
+    def latitude(self):
+        return self._graph.latitude[self._index].item()
+
+    @property
+    def type(self):
+        return NODE_TYPES[self._graph.node_type[self._index]]
+
+    @property
+    def edges(self):
+        """Views of the edges connected to this node."""
+        begin, end = self._graph.offsets[self._index:self._index + 2].tolist()
+        return [CSREdge(self._graph, self._index, k) for k in range(begin, end)]
+
+    def connections(self):
+        """Returns a list of nodes connected to this node by edges."""
+        return [e.other_node(self) for e in self.edges]
+
+
+class CSREdge:
+    __slots__ = ("_graph", "_node1", "_slot")
+
+    def __init__(self, graph, node1, slot):
+        """
+        Lightweight view of a road stored in a CSRGraph, with the Edge API the simulation uses.
+
+        Parameters:
+            graph (CSRGraph): The graph holding the road.
+            node1 (int): Position of the node whose adjacency lists the road.
+            slot (int): Position of the road in the adjacency arrays.
+        """
+        self._graph = graph
+        self._node1 = node1
+        self._slot = slot
+
+    def __repr__(self):
+        return f"Edge(Node1={self.node1.id}, Node2={self.node2.id}, distance={self.distance:.1f}m, speed_limit={self.speed_limit}km/h)"
+
+    @property
+    def node1(self):
+        return CSRNode(self._graph, self._node1)
+
+    @property
+    def node2(self):
+        return CSRNode(self._graph, self._graph.neighbors[self._slot].item())
+
+    def other_node(self, current_node):
+        """Returns the other node connected by this edge."""
+        return self.node2 if current_node == self.node1 else self.node1
+
+    @property
+    def distance(self):
+        """Returns the distance between the two nodes."""
+        return self._graph.distance[self._slot].item()
+
+    @property
+    def speed_limit(self):
+        """Returns the speed limit for this edge."""
+        return self._graph.speed_limit[self._slot].item()
+
+    @property
+    def travel_time(self):
+        """Returns the time needed to drive this edge at the speed limit in minutes."""
+        return self.distance / self.speed_limit * 60
+
+    @property
+    def energy_model(self):
+        """Returns the EnergyModel of the graph, GEOTAB's if it was opened without one."""
+        return self._graph.impact or ENERGY_MODEL
+
+    def energy_cost(self, season):
+        """Returns distance * impact index for the season, multiply by the vehicle efficiency for consumption."""
+        return self.distance * self.energy_model.index(season, self.speed_limit)
+
+
+class CSRGraph:
+    def __init__(self, file_path, impact=None):
+        """
+        Memory-maps a binary graph file written by save_csr. Nothing is parsed, so opening is
+        near-instant and processes mapping the same file share its pages.
+
+        A CSRGraph stands in for both the Nodes object and the road list: select_road,
+        fastest_path, path_length, travel_time and the EVehicle reachability and charge target
+        checks accept it. Nodes and edges are handed out as CSRNode / CSREdge views over the arrays.
+
+        Parameters:
+            file_path (str): Path of the binary graph file.
+            impact (dict or EnergyModel, optional): Season -> {speed limit: impact index}, or an
+                                                    EnergyModel, for edge energy costs.
+        """
+        with open(file_path, "rb") as f:
+            if f.read(len(CSR_MAGIC)) != CSR_MAGIC:
+                raise ValueError(f"{file_path} is not a binary graph file")
+            node_count, adjacency_count = np.frombuffer(f.read(16), dtype=np.int64).tolist()
+
+        self._impact = as_energy_model(impact) if impact is not None else None
+        self._arrays = {}
+        for name, dtype, offset, length in _csr_layout(node_count, adjacency_count):
+            if length:
+                self._arrays[name] = np.memmap(file_path, dtype=dtype, mode="r", offset=offset, shape=(length,))
+            else:
+                self._arrays[name] = np.zeros(0, dtype=dtype)
+
+    def __getattr__(self, name):
+        # Expose the stored arrays (node_ids, offsets, neighbors, distance, ...) as attributes
+        arrays = self.__dict__.get("_arrays", {})
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return len(self._arrays["node_ids"])
+
+    @property
+    def impact(self):
+        """EnergyModel used for edge energy costs, None if none was given."""
+        return self._impact
+
+    def get_node(self, id):
+        """Returns a view of the node with corresponding id, or None."""
+        i = self._find(id)
+        return CSRNode(self, i) if i >= 0 else None
+
+    @property
+    def all_cs(self):
+        """Returns views of all charging station nodes."""
+        code = NODE_TYPES.index("CS")
+        return [CSRNode(self, i) for i in np.flatnonzero(self._arrays["node_type"] == code).tolist()]
+
+    def _find(self, id):
+        # Position of a node ID, -1 if the graph has no such node
+        node_ids = self._arrays["node_ids"]
+        i = int(np.searchsorted(node_ids, id))
+        return i if i < len(node_ids) and node_ids[i] == id else -1
+
+    def index(self, id):
+        """Returns the position of a node ID, raises KeyError if the graph has no such node."""
+        i = self._find(id)
+        if i < 0:
+            raise KeyError(id)
+        return i
+
+    def is_CS(self, id):
+        """Checks if the node is a charging station"""
+        i = self._find(id)
+        return i >= 0 and NODE_TYPES[self._arrays["node_type"][i]] == "CS"
+
+    def get_road(self, node1_id, node2_id):
+        """Returns a view of the road connecting the two node ids, or None if they are not adjacent."""
+        u, v = self._find(node1_id), self._find(node2_id)
+        if u < 0 or v < 0:
+            return None
+        begin, end = self._arrays["offsets"][u:u + 2].tolist()
+        hits = np.flatnonzero(self._arrays["neighbors"][begin:end] == v)
+        if not len(hits):
+            return None
+        return CSREdge(self, u, begin + int(hits[0]))
+
+    get = get_road
+
+    def fastest_path(self, start_id, dest_id, stats=None):
+        """
+        Dijkstra over the CSR arrays by travel time, same result format as navigation.fastest_path.
+
+        Parameters:
+            start_id (int): ID of the starting node, KeyError if the graph has no such node.
+            dest_id (int): ID of the destination node, KeyError if the graph has no such node.
+            stats (dict, optional): Filled with the number of settled nodes under "settled".
+
+        Returns:
+            path (list): List of node IDs in the fastest path from start to destination.
+        """
+        # Memoryviews slice the mapped pages into Python values far cheaper than NumPy calls per node
+        offsets = memoryview(self._arrays["offsets"])
+        neighbors = memoryview(self._arrays["neighbors"])
+        distance = memoryview(self._arrays["distance"])
+        speed_limit = memoryview(self._arrays["speed_limit"])
+        source, target = self.index(start_id), self.index(dest_id)
+
+        travel_times = {source: 0}
+        previous = {source: None}
+        priority_queue = [(0, source)]
+        visited = set()
+
+        while priority_queue:
+            current_time, current = heapq.heappop(priority_queue)
+            if current in visited:
+                continue
+            visited.add(current)
+            if current == target:
+                break
+
+            begin, end = offsets[current], offsets[current + 1]
+            for neighbor, length, speed in zip(neighbors[begin:end], distance[begin:end], speed_limit[begin:end]):
+                if neighbor in visited:
+                    continue
+                new_time = current_time + length / speed * 60
+                if new_time < travel_times.get(neighbor, float('inf')):
+                    travel_times[neighbor] = new_time
+                    previous[neighbor] = current
+                    heapq.heappush(priority_queue, (new_time, neighbor))
+
+        if stats is not None:
+            stats["settled"] = len(visited)
+
+        node_ids = self._arrays["node_ids"]
+        path = []
+        current = target
+        while current is not None:
+            path.append(node_ids[current].item())
+            current = previous.get(current)
+        path.reverse()
+        return path
+
+
+class TrafficProfiles:
+    def __init__(self, roads, speeds, period=1440):
+        """
+        Time-of-day speeds of every edge, for time-dependent routing.
+
+        The day is split into equal slots and speeds[i, k] is the speed on the edge at
+        Edge.position i at the start of slot k. The travel time for any departure time is
+        interpolated linearly between the travel times at the two slot boundaries around it,
+        wrapping around at the end of the period. Speeds are read where they are, a memory-mapped
+        file is not copied.
+
+        Interpolation keeps the profiles FIFO, no vehicle entering an edge later leaves it
+        earlier, only while an edge's travel time drops by less than one slot width from a slot
+        boundary to the next. Profiles breaking that are rejected.
+
+        Parameters:
+            roads (Roads): The edges the profiles belong to, rows in Edge.position order.
+            speeds (ndarray): (edges, slots) speeds in km/h, e.g. memory-mapped by load.
+            period (float): Length of the profile in minutes, a day by default.
+
+        Raises:
+            ValueError: If the rows do not match the roads, a speed is not positive or the profiles are not FIFO.
+        """
+        if len(speeds) != len(roads):
+            raise ValueError(f"Profiles hold {len(speeds)} edges, the map has {len(roads)}")
+        if speeds.size and not np.min(speeds) > 0:
+            raise ValueError("Profile speeds must be positive")
+        self._slots = speeds.shape[1]
+        self._width = period / self._slots
+        self._period = period
+        self._max_speed = float(np.max(speeds))
+        self._check_fifo(roads, speeds)
+        self._speeds = memoryview(np.ascontiguousarray(speeds).reshape(-1))
+
+    def _check_fifo(self, roads, speeds, block=1 << 16):
+        """Raises ValueError if a travel time drops by a slot width or more between two slot boundaries."""
+        distance = np.array([edge.distance for edge in roads], dtype=float)
+        # In blocks of rows, so a memory-mapped file is never held in memory as a whole
+        for begin in range(0, len(distance), block):
+            times = distance[begin:begin + block, None] / speeds[begin:begin + block] * 60
+            drop = times - np.roll(times, -1, axis=1)
+            if drop.size and drop.max() >= self._width:
+                row, slot = np.unravel_index(drop.argmax(), drop.shape)
+                raise ValueError(f"Travel time of edge {begin + row} drops by {drop[row, slot]:.2f} min after "
+                                 f"slot {slot}, more than the {self._width:g} min slot width breaks FIFO")
+
+    @classmethod
+    def load(cls, file_path, roads, period=1440):
+        """Memory-maps profiles written by save."""
+        return cls(roads, np.load(file_path, mmap_mode='r'), period)
+
+    @staticmethod
+    def save(file_path, speeds):
+        """Writes (edges, slots) speeds in km/h to a .npy file, stored as float32, rows in Edge.position order."""
+        np.save(file_path, np.asarray(speeds, dtype=np.float32))
+
+    @property
+    def max_speed(self):
+        """Fastest speed anywhere in the profiles in km/h."""
+        return self._max_speed
+
+    def travel_time(self, edge, depart):
+        """
+        Returns the travel time of an edge in minutes when entering it at depart.
+
+        Parameters:
+            edge (Edge): An edge of the roads the profiles were built for.
+            depart (float): Time of day in minutes, any multiple of the period is the same time.
+        """
+        position = (depart % self._period) / self._width
+        # Rounding can put a departure just before the period's end on its end
+        slot = min(int(position), self._slots - 1)
+        row = edge.position * self._slots
+        before = edge.distance / self._speeds[row + slot] * 60
+        after = edge.distance / self._speeds[row + (slot + 1) % self._slots] * 60
+        return before + (position - slot) * (after - before)
+
+
+@profiled()
 def draw_map(draw, title, nodes, edges, fastest_path=None):
     """
     Draws the map graph using NetworkX and Matplotlib, with an optional highlight for the fastest path.
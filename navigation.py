@@ -1,31 +1,52 @@
 from map_graph import *
 import heapq
+import numpy as np
 
-def fastest_path(nodes, start, dest):
+@profiled()
+def fastest_path(nodes, start, dest, method="dijkstra", stats=None):
     """
-    Finds the fastest path from the start node to the destination node using Dijkstra's algorithm
-    based on travel time (distance / speed limit).
+    Finds the fastest path from the start node to the destination node based on travel time
+    (distance / speed limit).
+
+    Distances are kept in maps that only hold the nodes a search actually reaches, so short
+    queries do not touch the whole graph.
     
     Parameters:
-        nodes (Nodes): Nodes object containing all Node objects.
+        nodes (Nodes or CSRGraph): Nodes object containing all Node objects, or a memory-mapped
+                                   graph searched directly (start and dest may then be node IDs).
         start (Node): Starting node object.
         dest (Node): Destination node object.
+        method (str): "dijkstra" (default), "astar" to guide the search with a straight-line
+                      travel time bound, or "bidirectional" to search from both ends until they meet.
+        stats (dict, optional): Filled with the number of settled nodes under "settled".
     
     Returns:
         path (list): List of node IDs in the fastest path from start to destination.
     """
-    # Initialize travel times and predecessors
-    travel_times = {node.id: float('inf') for node in nodes.nodes.values()}
-    previous_nodes = {node.id: None for node in nodes.nodes.values()}
-    travel_times[start.id] = 0  # Travel time to the start node is zero
+    if isinstance(nodes, CSRGraph):
+        if method != "dijkstra":
+            raise ValueError(f"A CSRGraph is only searched with dijkstra, not {method}")
+        return nodes.fastest_path(getattr(start, "id", start), getattr(dest, "id", dest), stats)
+    elif method == "bidirectional":
+        return bidirectional_path(nodes, start, dest, stats)
+    elif method == "astar":
+        heuristic = travel_time_bound(nodes, dest)
+    elif method == "dijkstra":
+        heuristic = None
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    # Travel times and predecessors of the nodes reached so far
+    travel_times = {start.id: 0}  # Travel time to the start node is zero
+    previous_nodes = {start.id: None}
 
-    # Priority queue to store (travel_time, node_id)
-    priority_queue = [(0, start.id)]
+    # Priority queue to store (estimated total time, travel_time, node_id)
+    priority_queue = [(heuristic(start) if heuristic else 0, 0, start.id)]
     visited = set()  # Set of visited nodes
 
     # Process the priority queue
     while priority_queue:
-        current_time, current_node_id = heapq.heappop(priority_queue)
+        _, current_time, current_node_id = heapq.heappop(priority_queue)
 
         # Skip nodes that are already visited
         if current_node_id in visited:
@@ -43,26 +64,395 @@ def fastest_path(nodes, start, dest):
             if neighbor.id in visited:
                 continue
 
-            # Calculate travel time for this edge (in minutes)
-            edge_travel_time = (edge.distance / edge.speed_limit) * 60
-            new_time = current_time + edge_travel_time
+            # Travel time for this edge (in minutes), precomputed by the edge
+            new_time = current_time + edge.travel_time
 
             # If the new travel time is shorter, update times and predecessors
-            if new_time < travel_times[neighbor.id]:
+            if new_time < travel_times.get(neighbor.id, float('inf')):
                 travel_times[neighbor.id] = new_time
                 previous_nodes[neighbor.id] = current_node_id
-                heapq.heappush(priority_queue, (new_time, neighbor.id))
+                estimate = new_time + heuristic(neighbor) if heuristic else new_time
+                heapq.heappush(priority_queue, (estimate, new_time, neighbor.id))
+
+    if stats is not None:
+        stats["settled"] = len(visited)
 
     # Reconstruct the path from start to destination
     path = []
     current_id = dest.id
     while current_id is not None:
-        path.insert(0, current_id)
-        current_id = previous_nodes[current_id]
+        path.append(current_id)
+        current_id = previous_nodes.get(current_id)
+    path.reverse()
 
     return path
 
 
+def travel_time_bound(nodes, dest):
+    """
+    Builds the A* heuristic: the straight-line distance to dest driven at the fastest speed limit
+    on the map. Road lengths are straight lines scaled by the distance adjustment, so the bound
+    never overestimates the remaining travel time.
+
+    Parameters:
+        nodes (Nodes): Nodes object with its road index attached.
+        dest (Node): Destination node object.
+
+    Returns:
+        function: Node -> lower bound on the travel time to dest in minutes, or None when the map
+                  does not record its distance adjustment and speed limits.
+    """
+    roads = nodes.roads
+    if not nodes.distance_adjust or roads is None or not roads.max_speed_limit:
+        return None
+
+    scale = nodes.distance_adjust / roads.max_speed_limit * 60
+    return lambda node: euclidean_distance(node, dest) * scale
+
+
+def bidirectional_path(nodes, start, dest, stats=None):
+    """
+    Finds the fastest path by growing Dijkstra searches from the start and the destination
+    (roads are two-way) and stopping once no meeting point can beat the best one found.
+
+    Parameters:
+        nodes (Nodes): Nodes object containing all Node objects.
+        start (Node): Starting node object.
+        dest (Node): Destination node object.
+        stats (dict, optional): Filled with the number of settled nodes under "settled".
+
+    Returns:
+        path (list): List of node IDs in the fastest path from start to destination.
+    """
+    # Index 0 searches out from the start, index 1 back from the destination
+    travel_times = ({start.id: 0}, {dest.id: 0})
+    previous_nodes = ({start.id: None}, {dest.id: None})
+    priority_queues = ([(0, start.id)], [(0, dest.id)])
+    visited = (set(), set())
+
+    best_time = 0 if start.id == dest.id else float('inf')
+    meeting_id = start.id if start.id == dest.id else None
+
+    while priority_queues[0] and priority_queues[1]:
+        # Stop once the two frontiers together cannot improve on the best meeting point
+        if priority_queues[0][0][0] + priority_queues[1][0][0] >= best_time:
+            break
+
+        side = 0 if priority_queues[0][0][0] <= priority_queues[1][0][0] else 1
+        current_time, current_node_id = heapq.heappop(priority_queues[side])
+        if current_node_id in visited[side]:
+            continue
+        visited[side].add(current_node_id)
+
+        current_node = nodes.nodes[current_node_id]
+        for edge in current_node.edges:
+            neighbor = edge.other_node(current_node)
+            if neighbor.id in visited[side]:
+                continue
+
+            new_time = current_time + edge.travel_time
+            if new_time < travel_times[side].get(neighbor.id, float('inf')):
+                travel_times[side][neighbor.id] = new_time
+                previous_nodes[side][neighbor.id] = current_node_id
+                heapq.heappush(priority_queues[side], (new_time, neighbor.id))
+
+                # Check whether the other search already reached this neighbor
+                other_time = travel_times[1 - side].get(neighbor.id)
+                if other_time is not None and new_time + other_time < best_time:
+                    best_time = new_time + other_time
+                    meeting_id = neighbor.id
+
+    if stats is not None:
+        stats["settled"] = len(visited[0]) + len(visited[1])
+
+    # Like Dijkstra, an unreachable destination yields a path holding only the destination
+    if meeting_id is None:
+        return [dest.id]
+
+    path = []
+    current_id = meeting_id
+    while current_id is not None:
+        path.append(current_id)
+        current_id = previous_nodes[0].get(current_id)
+    path.reverse()
+
+    current_id = previous_nodes[1].get(meeting_id)
+    while current_id is not None:
+        path.append(current_id)
+        current_id = previous_nodes[1].get(current_id)
+
+    return path
+
+
+class PathTree:
+    def __init__(self, source_id, travel_times, previous_nodes, reverse=False):
+        """
+        Shortest path tree produced by a single Dijkstra search.
+
+        Parameters:
+            source_id (int): ID of the node the search started from.
+            travel_times (dict): Node ID -> travel time from the source in minutes, reached nodes only.
+            previous_nodes (dict): Node ID -> predecessor ID towards the source.
+            reverse (bool): If True the tree was grown from a destination, so paths are returned
+                            towards the source instead of away from it.
+        """
+        self._source_id = source_id
+        self._travel_times = travel_times
+        self._previous_nodes = previous_nodes
+        self._reverse = reverse
+
+    @property
+    def source_id(self):
+        """ID of the node the search started from."""
+        return self._source_id
+
+    @property
+    def reverse(self):
+        """Whether paths lead to the source rather than away from it."""
+        return self._reverse
+
+    def time(self, node_id):
+        """Returns the travel time between the source and node_id in minutes, inf if unreachable."""
+        return self._travel_times.get(node_id, float('inf'))
+
+    def previous(self, node_id):
+        """Returns the node before node_id on its path from the source, None at the source or if unreachable."""
+        return self._previous_nodes.get(node_id)
+
+    def path(self, node_id):
+        """
+        Returns the path between the source and node_id in O(path length).
+
+        Like fastest_path, an unreachable node yields a path holding only that node.
+
+        Returns:
+            path (list): Node IDs from the source to node_id, or from node_id to the source for a reverse tree.
+        """
+        path = []
+        current_id = node_id
+        while current_id is not None:
+            path.append(current_id)
+            current_id = self._previous_nodes.get(current_id)
+
+        if not self._reverse:
+            path.reverse()
+        return path
+
+
+@profiled()
+def shortest_path_tree(nodes, source, reverse=False):
+    """
+    Runs one full Dijkstra search from the source and keeps the whole tree, so travel times and
+    paths to every node can be answered without searching again.
+
+    Roads are two-way, so a reverse tree is the same search grown from a destination; its paths
+    are returned leading into the destination.
+
+    Parameters:
+        nodes (Nodes): Nodes object containing all Node objects.
+        source (Node): Node the tree is rooted at, the origin or (with reverse) the destination.
+        reverse (bool): Return paths towards the source instead of away from it.
+
+    Returns:
+        PathTree: The shortest path tree rooted at source.
+    """
+    travel_times = {source.id: 0}
+    previous_nodes = {source.id: None}
+
+    priority_queue = [(0, source.id)]
+    visited = set()
+
+    while priority_queue:
+        current_time, current_node_id = heapq.heappop(priority_queue)
+
+        if current_node_id in visited:
+            continue
+        visited.add(current_node_id)
+
+        current_node = nodes.nodes[current_node_id]
+        for edge in current_node.edges:
+            neighbor = edge.other_node(current_node)
+            if neighbor.id in visited:
+                continue
+
+            new_time = current_time + edge.travel_time
+            if new_time < travel_times.get(neighbor.id, float('inf')):
+                travel_times[neighbor.id] = new_time
+                previous_nodes[neighbor.id] = current_node_id
+                heapq.heappush(priority_queue, (new_time, neighbor.id))
+
+    return PathTree(source.id, travel_times, previous_nodes, reverse)
+
+
+class SOCMap:
+    def __init__(self, node_ids, need, dest_id, season, efficiency, capacity, t, energy_model=ENERGY_MODEL):
+        """
+        SOC every node needs to reach a destination, so any vehicle of the same efficiency,
+        capacity and energy model reads its charge target in O(1) wherever it is.
+
+        Parameters:
+            node_ids (ndarray): IDs of the nodes, in the order of need.
+            need (ndarray): SOC in percentage needed at every node to arrive with t left, inf if the
+                            destination cannot be reached.
+            dest_id (int): ID of the destination.
+            season (str): Season the consumption was computed for.
+            efficiency (float): Energy efficiency of the vehicles in kWh per km.
+            capacity (float): Battery capacity of the vehicles in kWh.
+            t (float): SOC in percentage that must remain at the destination.
+            energy_model (EnergyModel): Model the consumption was computed with.
+        """
+        self._node_ids = node_ids
+        self._need = need
+        self._values = need.tolist()
+        self._position = {id: i for i, id in enumerate(node_ids.tolist())}
+        self._key = (dest_id, season, efficiency, capacity, t, energy_model)
+
+    @property
+    def node_ids(self):
+        """IDs of the nodes, in the order of need."""
+        return self._node_ids
+
+    @property
+    def need(self):
+        """SOC in percentage needed at every node, reserve included."""
+        return self._need
+
+    @property
+    def key(self):
+        """(dest_id, season, efficiency, capacity, t, energy_model) the map answers for."""
+        return self._key
+
+    @property
+    def dest_id(self):
+        """ID of the destination."""
+        return self._key[0]
+
+    def __contains__(self, node_id):
+        i = self._position.get(node_id)
+        return i is not None and self._values[i] < float('inf')
+
+    def __getitem__(self, node_id):
+        """Returns the SOC in percentage node_id needs to reach the destination."""
+        return self._values[self._position[node_id]]
+
+
+def fastest_path_SOC_map(nodes, dest, season, efficiency, capacity, t, tree=None, energy_model=None):
+    """
+    One backward search from the destination giving the SOC every node needs to reach it along
+    its fastest path.
+
+    The SOC is not the least any route needs: consumption follows each node's fastest path to
+    the destination, the route a vehicle charging there drives on, as EVehicle.optimal_SOC does
+    for a single node.
+
+    Parameters:
+        nodes (Nodes): Nodes object with edge energy costs precomputed by create_map.
+        dest (Node): Destination node object.
+        season (str): Season affecting energy consumption.
+        efficiency (float): Energy efficiency of the vehicles in kWh per km.
+        capacity (float): Battery capacity of the vehicles in kWh.
+        t (float): SOC in percentage that must remain at the destination.
+        tree (PathTree, optional): Reverse tree of dest, e.g. StationMatrix.tree, searched here if not given.
+        energy_model (EnergyModel, optional): The vehicles' model, the map's by default.
+
+    Returns:
+        SOCMap: The SOC needed at every node.
+    """
+    if tree is None:
+        tree = shortest_path_tree(nodes, dest, reverse=True)
+    node_ids = np.array(sorted(nodes.nodes), dtype=np.int64)
+    position = {id: i for i, id in enumerate(node_ids.tolist())}
+    need = np.full(len(node_ids), np.inf)
+
+    roads = nodes.roads
+    if isinstance(roads, Roads):
+        energy_model = energy_model or roads.energy_model
+        energy = roads.edge_energy(season, efficiency, energy_model)
+        hop_energy = lambda node1_id, node2_id: energy[roads.get(node1_id, node2_id).position]
+    else:
+        energy_model = energy_model or ENERGY_MODEL
+        hop_energy = lambda node1_id, node2_id: hop_cost(select_road(node1_id, node2_id, roads), season,
+                                                         energy_model) * efficiency
+
+    # Nodes in order of travel time, so a node's next hop is always filled in first
+    reached = [id for id in position if tree.time(id) < np.inf]
+    for id in sorted(reached, key=tree.time):
+        next_id = tree.previous(id)
+        if next_id is None:
+            need[position[id]] = t
+        else:
+            need[position[id]] = need[position[next_id]] + hop_energy(id, next_id) / capacity
+
+    return SOCMap(node_ids, need, dest.id, season, efficiency, capacity, t, energy_model)
+
+
+def time_dependent_path(nodes, start, dest, depart, profiles, method="dijkstra", stats=None):
+    """
+    Finds the fastest path when leaving at depart, with travel times from time-of-day profiles.
+
+    Labels are arrival times and every edge is priced at the time the search enters it. The
+    interpolated profiles let no vehicle overtake another on the same edge, so the first time a
+    node is settled is its earliest arrival, as in the static search.
+
+    Parameters:
+        nodes (Nodes): Nodes object containing all Node objects.
+        start (Node): Starting node object.
+        dest (Node): Destination node object.
+        depart (float): Departure time of day in minutes.
+        profiles (TrafficProfiles): Speed profiles of the map's edges.
+        method (str): "dijkstra" (default) or "astar", bounded by the fastest profile speed.
+        stats (dict, optional): Filled with the number of settled nodes under "settled".
+
+    Returns:
+        path (list): List of node IDs in the fastest path, [dest.id] if it cannot be reached.
+        time (float): Travel time in minutes, inf if dest cannot be reached.
+    """
+    if method == "astar":
+        scale = nodes.distance_adjust / profiles.max_speed * 60
+        heuristic = lambda node: euclidean_distance(node, dest) * scale
+    elif method == "dijkstra":
+        heuristic = None
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    arrivals = {start.id: depart}
+    previous_nodes = {start.id: None}
+    priority_queue = [(depart + heuristic(start) if heuristic else depart, depart, start.id)]
+    visited = set()
+
+    while priority_queue:
+        _, current_time, current_node_id = heapq.heappop(priority_queue)
+        if current_node_id in visited:
+            continue
+        visited.add(current_node_id)
+        if current_node_id == dest.id:
+            break
+
+        current_node = nodes.nodes[current_node_id]
+        for edge in current_node.edges:
+            neighbor = edge.other_node(current_node)
+            if neighbor.id in visited:
+                continue
+
+            new_time = current_time + profiles.travel_time(edge, current_time)
+            if new_time < arrivals.get(neighbor.id, float('inf')):
+                arrivals[neighbor.id] = new_time
+                previous_nodes[neighbor.id] = current_node_id
+                estimate = new_time + heuristic(neighbor) if heuristic else new_time
+                heapq.heappush(priority_queue, (estimate, new_time, neighbor.id))
+
+    if stats is not None:
+        stats["settled"] = len(visited)
+
+    path = []
+    current_id = dest.id
+    while current_id is not None:
+        path.append(current_id)
+        current_id = previous_nodes.get(current_id)
+    path.reverse()
+
+    return path, arrivals.get(dest.id, float('inf')) - depart
+
 
 def path_length(path, nodes):
     """
@@ -81,24 +471,22 @@ def path_length(path, nodes):
     total_length = 0.0
     
     for i in range(len(path) - 1):
-        # Get the current and next node in the path
-        current_node = nodes.get_node(path[i])
-        next_node = nodes.get_node(path[i + 1])
-        
         # Find the edge connecting the current and next node
-        edge = next((edge for edge in current_node.edges if edge.other_node(current_node) == next_node), None)
+        edge = nodes.get_road(path[i], path[i + 1])
         
         if edge:
             total_length += edge.distance  # Add edge distance to total length
     return total_length
 
-def travel_time(path, nodes):
+def travel_time(path, nodes, depart=0, profiles=None):
     """
     Calculates the total travel time for a path based on an array of node IDs and Node objects.
     
     Parameters:
         path (list): List of node IDs representing the path.
         nodes (Nodes): Nodes object containing all Node objects.
+        depart (float): Departure time of day in minutes, used with profiles.
+        profiles (TrafficProfiles, optional): Time-of-day speeds, the speed limits are used without them.
     
     Returns:
         float: Total travel time in minutes.
@@ -109,16 +497,111 @@ def travel_time(path, nodes):
     total_time = 0.0
     
     for i in range(len(path) - 1):
-        # Get the current and next node in the path
-        current_node = nodes.nodes[path[i]]
-        next_node = nodes.nodes[path[i + 1]]
-        
         # Find the edge connecting the current and next node
-        edge = next((edge for edge in current_node.edges if edge.other_node(current_node) == next_node), None)
+        edge = nodes.get_road(path[i], path[i + 1])
         
-        if edge:
-            # Calculate time for this edge: time = (distance / speed_limit) * 60
-            edge_time = (edge.distance / edge.speed_limit) * 60
-            total_time += edge_time
+        if edge and profiles is not None:
+            total_time += profiles.travel_time(edge, depart + total_time)
+        elif edge:
+            # Time for this edge: time = (distance / speed_limit) * 60
+            total_time += edge.travel_time
     
-    return total_time
\ No newline at end of file
+    return total_time
+
+
+CHARGE_TARGETS = (80, 100)
+# SOC percentages the energy-aware search may charge to at a station
+
+
+def energy_aware_path(nodes, start, dest, ev, season, stations, reserve, charge_targets=CHARGE_TARGETS, queue=True):
+    """
+    Finds the fastest route that keeps the battery above the reserve, stopping to charge at
+    charging stations where needed, in a single search.
+
+    Every label carries (travel time, SOC). Driving an edge spends its seasonal energy cost,
+    a station can raise the SOC to any of the charge targets for its queue and charge time,
+    and a label is dropped when another label at the same node arrived no later with at least
+    as much charge.
+
+    Parameters:
+        nodes (Nodes): Nodes object with edge energy costs precomputed by create_map.
+        start (Node): Starting node object.
+        dest (Node): Destination node object.
+        ev (EVehicle): Vehicle providing the current SOC, capacity and efficiency.
+        season (str): Season affecting energy consumption.
+        stations (list): ChargingStationManager objects that can be used for charging.
+        reserve (float): SOC in percentage that must remain on arrival, at least 5%.
+        charge_targets (tuple): SOC percentages a charging stop may charge to.
+        queue (bool): Whether station queue times count towards the travel time.
+
+    Returns:
+        path (list): Node IDs from start to destination, empty if no feasible route exists.
+        stops (list): (station node ID, target SOC) for every charging stop on the route.
+        total_time (float): Driving, queueing and charging time in minutes, inf if infeasible.
+    """
+    # Prevent battery from instant shut off
+    reserve = max(reserve, 5)
+    if ev.SOC < reserve:
+        return [], [], float('inf')
+
+    managers = {station.node.id: station for station in stations}
+    if isinstance(nodes.roads, Roads):
+        energy = nodes.roads.edge_energy(season, ev.efficiency, ev.energy_model)
+        hop_energy = lambda edge: energy[edge.position]
+    else:
+        hop_energy = lambda edge: hop_cost(edge, season, ev.energy_model) * ev.efficiency
+
+    # Label i is (node ID, SOC, parent label, charge target or None if it was reached by driving)
+    labels = [(start.id, ev.SOC, None, None)]
+    priority_queue = [(0, -ev.SOC, 0)]
+    best_SOC = {}  # Node ID -> highest SOC among the labels settled there
+
+    while priority_queue:
+        current_time, _, label_id = heapq.heappop(priority_queue)
+        node_id, SOC, _, charged = labels[label_id]
+
+        # Labels are settled in time order, so any earlier one with more charge dominates this one
+        if SOC <= best_SOC.get(node_id, -float('inf')):
+            continue
+        best_SOC[node_id] = SOC
+
+        if node_id == dest.id:
+            return _label_route(labels, label_id) + (current_time,)
+
+        # Charge at a station unless this label was just charged here
+        station = managers.get(node_id)
+        if station is not None and charged is None:
+            wait = station.queue_time if queue else 0
+            for target in charge_targets:
+                if target > SOC:
+                    new_time = current_time + wait + station.charge_time(SOC, ev.capacity, target)
+                    labels.append((node_id, target, label_id, target))
+                    heapq.heappush(priority_queue, (new_time, -target, len(labels) - 1))
+
+        current_node = nodes.nodes[node_id]
+        for edge in current_node.edges:
+            neighbor = edge.other_node(current_node)
+            new_SOC = SOC - hop_energy(edge) / ev.capacity
+            if new_SOC < reserve or new_SOC <= best_SOC.get(neighbor.id, -float('inf')):
+                continue
+
+            labels.append((neighbor.id, new_SOC, label_id, None))
+            heapq.heappush(priority_queue, (current_time + edge.travel_time, -new_SOC, len(labels) - 1))
+
+    return [], [], float('inf')
+
+
+def _label_route(labels, label_id):
+    """Walks the parents of a label back to the start, returning (path, stops)."""
+    path = []
+    stops = []
+    while label_id is not None:
+        node_id, _, parent, charged = labels[label_id]
+        if charged is not None:
+            stops.append((node_id, charged))
+        elif not path or path[-1] != node_id:
+            path.append(node_id)
+        label_id = parent
+    path.reverse()
+    stops.reverse()
+    return path, stops
@@ -0,0 +1,101 @@
+import cProfile
+import contextlib
+import functools
+import os
+import time
+
+PROFILE = os.environ.get("EV_PROFILE", "0") not in ("", "0")
+# Set EV_PROFILE=1 before starting Python to time the instrumented functions, off by default
+
+PROFILE_DUMP = os.environ.get("EV_PROFILE_DUMP", "")
+# Directory a cProfile .pstats file is written to for every trip, empty for none
+
+_timers = {}  # Name -> [calls, seconds spent inside, callees included]
+_counters = {}  # Name -> count
+
+
+def profiled(name=None):
+    """
+    Decorator timing every call of a function under name, its qualified name by default.
+
+    Without PROFILE the function is returned as it is, so instrumented code costs nothing when
+    profiling is off. Times include the instrumented functions called inside.
+    """
+    def decorate(func):
+        if not PROFILE:
+            return func
+        entry = _timers.setdefault(name or func.__qualname__, [0, 0.0])
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            begin = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry[0] += 1
+                entry[1] += perf_counter() - begin
+        return wrapper
+    return decorate
+
+
+if PROFILE:
+    def profile_count(name, n=1):
+        """Adds n to the counter name."""
+        _counters[name] = _counters.get(name, 0) + n
+else:
+    def profile_count(name, n=1):
+        """Adds n to the counter name, nothing without PROFILE."""
+
+
+def reset_profile():
+    """Zeroes every timer and counter, e.g. between runs."""
+    for entry in _timers.values():
+        entry[0], entry[1] = 0, 0.0
+    _counters.clear()
+
+
+def profile_report():
+    """
+    Returns the timers, slowest first, and the counters as printable text.
+
+    Returns:
+        str: The report, empty without PROFILE.
+    """
+    if not PROFILE:
+        return ""
+    width = max(map(len, list(_timers) + list(_counters) + ["name"]))
+    lines = ["instrumented calls (inclusive)",
+             f"{'name':<{width}} {'calls':>10} {'total ms':>10} {'mean us':>10}"]
+    for name, (calls, seconds) in sorted(_timers.items(), key=lambda item: -item[1][1]):
+        if calls:
+            lines.append(f"{name:<{width}} {calls:>10} {seconds * 1e3:>10.1f} {seconds / calls * 1e6:>10.2f}")
+    if _counters:
+        lines.append("counters")
+        for name, count in sorted(_counters.items()):
+            lines.append(f"{name:<{width}} {count:>10}")
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def trip_profile(trip, directory=None):
+    """
+    Runs the block under cProfile and writes its stats to trip_<trip>.pstats, read them with pstats.
+
+    Parameters:
+        trip (int): Trip number naming the file.
+        directory (str, optional): Where the file goes, PROFILE_DUMP by default. Nothing is
+                                   profiled when neither is set.
+    """
+    directory = directory or PROFILE_DUMP
+    if not directory:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f"trip_{trip}.pstats"))
@@ -1,3 +1,9 @@
+import json
+import math
+import random
+from collections import deque
+
+
 class result:
     def __init__(self):
         self._initial_path = []
@@ -6,11 +12,13 @@ class result:
         self._target_percentage = 0
         self._threshold = 0
         self._model = 0
+        self._failed = False
 
         self._travel_history = []
         self._trmax_history = []
         self._station_history = []
         self._ev_history = []
+        self._charges = {"charge_stops": 0, "charge_time": 0, "queue_time": 0}
     
     # Getters and Setters for attributes
     @property
@@ -73,6 +81,16 @@ class result:
         """Sets the model."""
         self._model = model
 
+    @property
+    def failed(self):
+        """Gets whether the trip failed to find a charging station."""
+        return self._failed
+
+    @failed.setter
+    def failed(self, failed):
+        """Sets whether the trip failed to find a charging station."""
+        self._failed = failed
+
     @property
     def travel_history(self):
         """Gets the travel history."""
@@ -99,6 +117,21 @@ class result:
     def add_station_history(self, station_data):
         """Adds a station history entry."""
         self._station_history.append(station_data)
+        self._count_charge(station_data)
+
+    @property
+    def charges(self):
+        """
+        Totals of the charging events added so far: charge_stops, charge_time and queue_time in
+        minutes, where queue_time is the wait actually added to the trip time.
+        """
+        return self._charges
+
+    def _count_charge(self, station_data):
+        if "charge time" in station_data:
+            self._charges["charge_stops"] += 1
+            self._charges["charge_time"] += station_data["charge time"]
+            self._charges["queue_time"] += station_data.get("wait time", 0)
 
     @property
     def ev_history(self):
@@ -150,3 +183,159 @@ class result:
 
         formatted = "\n".join([f"  - {item}" for item in history])
         return formatted
+
+
+def _finite(value):
+    """Replaces non-finite floats, which strict JSON has no literal for, with None, inside lists and dicts too."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+class ResultSink:
+    def __init__(self, file_path, chunk_size=1000, sample=1.0, seed=0, always=("station",)):
+        """
+        Writes history records to an NDJSON file as they are added, one JSON object per line.
+
+        Records are buffered and written chunk_size at a time. Infinite values, such as the TRmax of
+        an unavailable station, are written as null. Counters of every record kind and
+        sums, minimums and maximums of their numeric fields are kept in memory for all records,
+        including the ones sampling leaves out of the file.
+
+        Parameters:
+            file_path (str): The NDJSON file, overwritten.
+            chunk_size (int): Records buffered before they are written.
+            sample (float): Fraction of records written, per record.
+            seed (int): Seed of the sampling, separate from the simulation's random generator.
+            always (tuple): Record kinds written whatever the sample fraction.
+        """
+        self._file = open(file_path, "w")
+        self._chunk_size = chunk_size
+        self._sample = sample
+        self._rng = random.Random(seed)
+        self._always = set(always)
+        self._buffer = []
+        self._counts = {}
+        self._written = {}
+        self._fields = {}
+        # (kind, field) -> [sum, min, max]
+
+    @property
+    def counts(self):
+        """Kind -> number of records added."""
+        return self._counts
+
+    @property
+    def written(self):
+        """Kind -> number of records written to the file."""
+        return self._written
+
+    def add(self, kind, trip, record):
+        """
+        Adds one history record.
+
+        Parameters:
+            kind (str): History it belongs to: travel, trmax, station or ev.
+            trip (int): Trip the record belongs to.
+            record (dict): The history entry.
+        """
+        self._counts[kind] = self._counts.get(kind, 0) + 1
+        for field, value in record.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                stats = self._fields.get((kind, field))
+                if stats is None:
+                    self._fields[(kind, field)] = [value, value, value]
+                else:
+                    stats[0] += value
+                    stats[1] = min(stats[1], value)
+                    stats[2] = max(stats[2], value)
+
+        if kind not in self._always and self._sample < 1 and self._rng.random() >= self._sample:
+            return
+        self._written[kind] = self._written.get(kind, 0) + 1
+        self._buffer.append(json.dumps(_finite({"trip": trip, "kind": kind, **record}), allow_nan=False,
+                                       default=lambda value: _finite(float(value))))
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records."""
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        """Writes what is left and closes the file."""
+        self.flush()
+        self._file.close()
+
+    def aggregates(self):
+        """
+        Returns the in-memory counters.
+
+        Returns:
+            dict: Kind -> {"count", "written", field -> {"sum", "min", "max", "mean"}}.
+        """
+        summary = {kind: {"count": count, "written": self._written.get(kind, 0)}
+                   for kind, count in self._counts.items()}
+        for (kind, field), (total, low, high) in self._fields.items():
+            summary[kind][field] = {"sum": total, "min": low, "max": high, "mean": total / self._counts[kind]}
+        return summary
+
+
+class streaming_result(result):
+    def __init__(self, sink, trip=0, keep=1):
+        """
+        A result that hands every history entry to a ResultSink and keeps only the last few in memory.
+
+        Parameters:
+            sink (ResultSink): Where the histories are written.
+            trip (int): Trip number recorded with every entry.
+            keep (int): Entries of each history kept in memory, e.g. for ev_history[-1].
+        """
+        super().__init__()
+        self._sink = sink
+        self._trip = trip
+        self._recorded = {}
+        self._travel_history = deque(maxlen=keep)
+        self._trmax_history = deque(maxlen=keep)
+        self._station_history = deque(maxlen=keep)
+        self._ev_history = deque(maxlen=keep)
+
+    def add_travel_history(self, travel_data):
+        """Adds a travel history entry."""
+        self._sink.add("travel", self._trip, travel_data)
+        self._recorded["travel"] = self._recorded.get("travel", 0) + 1
+        self._travel_history.append(travel_data)
+
+    def add_trmax_history(self, trmax_data):
+        """Adds a TRmax history entry."""
+        self._sink.add("trmax", self._trip, trmax_data)
+        self._recorded["trmax"] = self._recorded.get("trmax", 0) + 1
+        self._trmax_history.append(trmax_data)
+
+    def add_station_history(self, station_data):
+        """Adds a station history entry."""
+        self._sink.add("station", self._trip, station_data)
+        self._recorded["station"] = self._recorded.get("station", 0) + 1
+        self._station_history.append(station_data)
+        self._count_charge(station_data)
+
+    def add_ev_history(self, ev_data):
+        """Adds an EV history entry."""
+        self._sink.add("ev", self._trip, ev_data)
+        self._recorded["ev"] = self._recorded.get("ev", 0) + 1
+        self._ev_history.append(ev_data)
+
+    def _format_history(self, history, title):
+        """Formats the entries kept in memory, noting how many more were streamed."""
+        formatted = super()._format_history(history, title)
+        streamed = self._recorded.get(title.lower(), 0)
+        if streamed > len(history):
+            formatted += f"\n  ({len(history)} most recent shown, {streamed} recorded in total)"
+        return formatted
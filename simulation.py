@@ -0,0 +1,379 @@
+import random
+
+from map_graph import *
+from navigation import *
+from vehicle import *
+from CS_data_storage import *
+from TRmax import *
+from result import *
+from events import *
+from station_service import *
+from profiling import *
+
+
+def run_trip(nodes, roads, ev, SEASON, THRESHOLD, END_TRIP_SOC, MODEL, DISTANCE_ADJUST, DRAW=0, route=fastest_path,
+             matrix=None, EVENTS=0, SERVICE=0, sink=None, trip=0, soc_map=None):
+    """
+    Drives one EV from its start to its destination, rerouting to charging stations when needed.
+
+    Charging stations are drawn from the module-level random generator, so seed it for repeatable trips.
+
+    Parameters:
+        nodes (Nodes): Nodes object containing all Node objects.
+        roads (Roads): The Edge objects returned by create_map.
+        ev (EVehicle): The vehicle to drive, its start and destination set the trip.
+        SEASON (str): Season affecting energy consumption.
+        THRESHOLD (float): SOC in percentage below which the vehicle looks for charging.
+        END_TRIP_SOC (float): SOC in percentage that must remain at the destination, at least 5%.
+        MODEL (int): 0 original paper, 1 proposed method, 2 energy-aware search, planned once and
+                     searched again only when the vehicle can no longer drive the plan.
+        DISTANCE_ADJUST (float): Distance multiplier the map was built with, recorded in the result.
+        DRAW (int): 0 does not show the map, 1 shows the map.
+        route (function): Fastest path function, navigation.fastest_path or a ContractionHierarchy's.
+        matrix (StationMatrix, optional): Precomputed travel times to the destination, replacing the
+                                          search back from the destination at every reroute.
+        EVENTS (int): 0 updates every station queue on every hop, 1 simulates the queues with an
+                      events.Scheduler and makes the vehicle wait for the queue when it charges.
+        SERVICE (int): 0 reads station queues and occupancy from the ChargingStationManager objects,
+                       1 queries them concurrently through a station_service stand-in server.
+        sink (ResultSink, optional): Streams the histories to a file, keeping only the latest entries in memory.
+        trip (int): Trip number recorded with the streamed histories.
+        soc_map (SOCMap, optional): SOC every node needs to reach the destination, read for the
+                                    charge targets instead of summing the route to the destination.
+
+    Returns:
+        r (result): Histories and settings of the trip.
+    """
+    nodes.set_start_dest(ev.start_id, ev.dest_id)
+
+    # Connect to charging station data storage base
+    CS = []
+    CS_nodes = nodes.all_cs
+    for station in CS_nodes:
+        level = station.id % 2 + 2
+        CS.append(ChargingStationManager(station, random.randint(0, level*20+10), random.randint(1, 4*level), level))
+    scheduler = Scheduler(CS) if EVENTS else None
+    # Station state changes with the simulated time, so answers are only reused within one instant
+    service = StationService.local(CS, ttl=0, clock=lambda: total_time) if SERVICE else None
+
+    # Show the initial map without vehicle
+    draw_map(DRAW, f"Map loaded, ready to drive", nodes, roads)
+
+    # Store path to destination in a reversed stack
+    path_rstack = route(nodes, nodes.start, nodes.dest)
+    ev.plan_route(SEASON, path_rstack, roads)
+    draw_map(DRAW, f"Start driving, expected travel distance: {path_length(path_rstack, nodes):.2f}km", nodes, roads, path_rstack)
+
+    # Start driving
+    past_path = []
+    total_time = 0
+    total_length = 0
+
+
+    r = streaming_result(sink, trip) if sink else result()
+    r.initial_path = path_rstack.copy()
+    r.distance_adjust = DISTANCE_ADJUST
+    r.season = SEASON
+    r.threshold = THRESHOLD
+    r.model = MODEL
+
+    # MODEL 2 follows an energy-aware plan, station ID -> target SOC of the stops still ahead
+    plan = None
+    while path_rstack[0] != ev.dest_id:
+        # print(path_rstack)
+        cur_node = path_rstack[0]
+        stop_time = []
+        if MODEL == 2 and not r.failed:
+            # Make the planned stop here, then search again only if the plan can no longer be driven
+            stop_time += charge_planned(cur_node, plan, CS, ev, r, scheduler)
+            if (plan is not None and not plan_feasible(ev, SEASON, path_rstack, plan, roads, END_TRIP_SOC)
+                    or plan is None and ev.SOC < THRESHOLD
+                    and not ev.check_reachable(SEASON, path_rstack, roads, END_TRIP_SOC)):
+                profile_count("reroutes")
+                path, stops, trmax = energy_aware_path(nodes, nodes.get_node(cur_node), nodes.dest, ev,
+                                                       SEASON, CS, END_TRIP_SOC)
+                r.add_trmax_history({"At intersection": cur_node, "stops": stops, "trmax": trmax})
+                if not path:
+                    r.failed = True
+                    r.summarize()
+                    print("trip falied")
+                else:
+                    path_rstack = path
+                    ev.plan_route(SEASON, path_rstack, roads)
+                    plan = dict(stops)
+                    for station_id, _ in stops:
+                        stop_CS = next(station for station in CS if station.node.id == station_id)
+                        r.add_station_history({"station_id": station_id, "queue_time": stop_CS.queue_time})
+                    draw_map(DRAW, f"Path with charging stops", nodes, roads, path_rstack)
+                    stop_time += charge_planned(cur_node, plan, CS, ev, r, scheduler)
+        next_node = path_rstack[1]
+        # Set the direction that the vehicle is going to
+        road = select_road(cur_node, next_node, roads)
+        draw_map(DRAW, f"At intersection {cur_node}, driving towards {next_node}", nodes, roads, path_rstack)
+        # print(road.distance)
+        path_rstack.pop(0)
+        ev.redirect(next_node, road.distance)
+
+        # Drives to the next intersection
+        speed = road.speed_limit
+        distance = road.distance - 10
+        ev.drive(distance, SEASON, speed)
+
+        road_travel_time = road.distance / speed * 60
+        for time in stop_time:
+            road_travel_time += time
+
+        # Update travel history
+        r.add_travel_history({
+            "current_node": cur_node,
+            "next_node": next_node,
+            "distance": distance,
+            "speed": speed,
+            "SOC": ev.SOC
+        })
+
+        # Checks battery status
+        # Checks if the battery is below threshold or if the vehicle will not reach destination
+        reachable = ev.check_reachable(SEASON, path_rstack, roads, END_TRIP_SOC)
+        profile_count("hops")
+        if MODEL != 2 and ev.SOC < THRESHOLD and not reachable:
+            # Find the nearest charging station if the car is no where near one
+            if not nodes.is_CS(cur_node):
+                profile_count("reroutes")
+                title = ""
+                if ev.SOC < THRESHOLD:
+                    title += f"Vehicle battery below thereshold ({ev.SOC:.2f}%),\n"
+                
+                if not reachable:
+                    title += f"Vehicle couldn't finish trip with SOC at {END_TRIP_SOC}%,\n"
+                
+                draw_map(DRAW, title + f"10km before reaching intersection {next_node}", 
+                        nodes, roads, [cur_node, next_node])
+                
+                # One search out from the vehicle and one back from the destination
+                # answer the travel times and paths for every station
+                from_ev = shortest_path_tree(nodes, nodes.get_node(ev.cur_id))
+                if matrix is not None and ev.dest_id in matrix and matrix.season == SEASON:
+                    to_dest = matrix.tree(ev.dest_id)
+                else:
+                    to_dest = shortest_path_tree(nodes, nodes.dest, reverse=True)
+                optimal = None
+
+                # Stations beyond the vehicle's best-case range cannot pass check_reachable
+                position = nodes.get_node(ev.cur_id)
+                in_range = {node.id for node in nodes.within(position.longitude, position.latitude,
+                                                             ev.max_range(SEASON, 5), 'CS')}
+
+                # TRmax is at least the drive to the station and on to the destination (plus the
+                # queue for MODEL 1), so stations are evaluated from the lowest bound and skipped
+                # once their bound cannot beat the best TRmax, ties going to the earlier station
+                # Live queue and occupancy of every station in one concurrent query
+                live = service.states([station.node.id for station in CS]) if service else {}
+                queue_times = [live[station.node.id]["queue_time"] if station.node.id in live
+                               else station.queue_time for station in CS]
+                occupied = [live[station.node.id]["occupy"] if station.node.id in live
+                            else station._occupy for station in CS]
+
+                bounds = [from_ev.time(station.node.id) + (queue_times[i] if MODEL == 1 else 0)
+                          + to_dest.time(station.node.id) for i, station in enumerate(CS)]
+                best_trmax, id, best_path = math.inf, len(CS), []
+                records = {}
+
+                for i in sorted(range(len(CS)), key=lambda i: bounds[i]):
+                    cur_CS = CS[i]
+                    if (bounds[i], i) > (best_trmax, id):
+                        # Not evaluated, recorded as unavailable with the bound that ruled it out
+                        records[i] = {"At intersection": cur_node, "station_id": cur_CS.node.id,
+                                      "trmax": math.inf, "trmax lower bound": bounds[i]}
+                        continue
+
+                    # Stations not indexed as CS right now (the trip's start or destination) skip the range check
+                    reachable = cur_CS.node.id in in_range or not nodes.is_CS(cur_CS.node.id)
+                    if MODEL == 0:
+                        available = occupied[i] and reachable
+                    elif MODEL == 1:
+                        available = reachable
+                    if available:
+                        available = ev.check_reachable(SEASON, from_ev.path(cur_CS.node.id), roads, 0)
+
+                    path = []
+                    trmax = math.inf
+                    # infinite if TRmax is not available
+                    if available:
+                        # The charge target only depends on the vehicle's position
+                        if optimal is None:
+                            optimal = ev.optimal_SOC(SEASON, nodes, nodes.dest, roads, END_TRIP_SOC,
+                                                     to_dest.path(ev.cur_id), soc_map=soc_map)
+                        target = optimal
+                        # print("optimal:", target)
+                        if target > 100:
+                            target = 80
+
+                        charge_time = cur_CS.charge_time_check(ev, target)
+                        path1 = from_ev.path(cur_CS.node.id)
+                        time1 = from_ev.time(cur_CS.node.id)
+
+                        path2 = to_dest.path(cur_CS.node.id)
+                        time2 = to_dest.time(cur_CS.node.id)
+
+                        if MODEL == 0:
+                            trmax = TRmax(time1,
+                                    0,
+                                    charge_time,
+                                    time2)
+                        elif MODEL == 1:
+                            trmax = TRmax(time1,
+                                    queue_times[i],
+                                    charge_time,
+                                    time2)
+                        path = [path1, path2]
+
+                    records[i] = {"At intersection": cur_node, "station_id": cur_CS.node.id, "trmax": trmax}
+                    if (trmax, i) < (best_trmax, id):
+                        best_trmax, id, best_path = trmax, i, path
+
+                for i in range(len(CS)):
+                    r.add_trmax_history(records[i])
+
+                if not best_path:
+                    r.failed = True
+                    r.summarize()
+                    print("trip falied")
+                    continue
+                path_rstack = best_path[0] + best_path[1][1:]
+                ev.plan_route(SEASON, path_rstack, roads)
+
+                r.add_trmax_history({"min station_id": CS[id].node.id, "min trmax": best_trmax})
+            
+                r.add_station_history({"station_id": CS[id].node.id, "queue_time": queue_times[id]})
+
+                draw_map(DRAW, f"Path to charging station", nodes, roads, best_path[0])
+
+            # Charge the car if its at a charging station
+            else:
+                cur_CS = next((station for station in CS if station.node.id == cur_node), None)
+        
+                if cur_CS:
+                    target = ev.optimal_SOC(SEASON, nodes, nodes.dest, roads, END_TRIP_SOC, route=route,
+                                            soc_map=soc_map)
+                    # print("charge to", target)
+
+                    title = f"Reached charging station, charging.\nCar charged to {target}%"
+
+                    if target > 100:
+                        target = 80
+                        title += "Choosing optimal battery at 80% SOC"
+
+                    charge_time, wait = charge_at(cur_CS, ev, target, r, scheduler)
+                    road_travel_time += charge_time
+                    if scheduler:
+                        road_travel_time += wait
+
+                    draw_map(DRAW, title, 
+                            nodes, roads, past_path + [cur_node])
+                    
+                else:
+                    print("charging station location error")
+                    exit(1)
+
+        # Drive the leftover 10 km to the next intersection
+        ev.drive(10, SEASON, speed)
+        past_path.append(cur_node)
+        # print(past_path, path_rstack)
+        # print(road.distance)
+
+        total_time += road_travel_time
+        if scheduler:
+            scheduler.advance(total_time)
+        else:
+            for station in CS:
+                station.update(road_travel_time)
+        total_length += road.distance
+
+            # Record EV state
+        r.add_ev_history({
+            "cur_node": cur_node,
+            "SOC": ev.SOC,
+            "distance_to_next": road.distance,
+            "total_time": total_time,
+            "total_length": total_length
+        })
+
+    if service:
+        service.close()
+
+    draw_map(DRAW, f"Total travel time: {total_time:.2f} minutes and {total_length:.2f}km long",
+            nodes, roads, past_path+path_rstack)
+
+    return r
+
+
+def charge_at(station, ev, target, r, scheduler=None):
+    """
+    Charges the vehicle to target at a station and records the charging event.
+
+    Parameters:
+        station (ChargingStationManager): The station the vehicle is at.
+        ev (EVehicle): The vehicle to charge.
+        target (float): SOC in percentage to charge to.
+        r (result): Histories of the trip.
+        scheduler (Scheduler, optional): Simulated station queues the vehicle waits in.
+
+    Returns:
+        charge_time (float): Minutes spent charging.
+        wait (float): Minutes spent in the station's queue, 0 without a scheduler.
+    """
+    pre_SOC = ev.SOC
+    charge_time = station.charge_time_check(ev, target)
+    station.charge_car(ev, target)
+    profile_count("charges")
+
+    # Update charging event in histories
+    event = {
+        "station_id": station.node.id,
+        "charge time": charge_time,
+        "SOC_before": pre_SOC,
+        "SOC_after": ev.SOC
+    }
+    wait = 0
+    if scheduler:
+        # Queue behind the EVs already booked at the station
+        event["wait time"] = wait = scheduler.charge(station, charge_time)
+    r.add_station_history(event)
+    return charge_time, wait
+
+
+def charge_planned(node_id, plan, CS, ev, r, scheduler=None):
+    """
+    Makes the planned charging stop at node_id, if the plan has one there, and removes it from the plan.
+
+    Returns:
+        list: Minutes charging and queueing, empty if the vehicle did not charge.
+    """
+    if not plan or node_id not in plan:
+        return []
+    target = plan.pop(node_id)
+    if target <= ev.SOC:
+        return []
+    station = next(station for station in CS if station.node.id == node_id)
+    charge_time, wait = charge_at(station, ev, target, r, scheduler)
+    return [charge_time, wait] if scheduler else [charge_time]
+
+
+def plan_feasible(ev, season, path, plan, roads, t):
+    """
+    Whether the vehicle still reaches the next planned stop, or the destination after the last
+    one, with t SOC left.
+
+    Parameters:
+        ev (EVehicle): The vehicle at the head of path.
+        season (str): Season affecting energy consumption.
+        path (list): Node IDs of the planned route from the vehicle's node.
+        plan (dict): Station ID -> target SOC of the stops still ahead.
+        roads (Roads): The Edge objects returned by create_map.
+        t (float): SOC in percentage that must remain.
+    """
+    for i in range(1, len(path)):
+        if path[i] in plan:
+            return ev.check_reachable(season, path[:i + 1], roads, t)
+    return ev.check_reachable(season, path, roads, t)
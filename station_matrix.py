@@ -0,0 +1,255 @@
+import hashlib
+import os
+
+import numpy as np
+
+from map_graph import *
+from navigation import *
+
+
+def file_hash(file_path):
+    """Returns the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_hash(model):
+    """Returns the SHA-1 hex digest of an EnergyModel's key, equal for models giving the same indices."""
+    return hashlib.sha1(repr(as_energy_model(model).key).encode()).hexdigest()
+
+
+class StationMatrix:
+    def __init__(self, node_ids, targets, time, energy, previous, season, ADJUST, edges_hash, nodes_hash="",
+                 energy_hash=""):
+        """
+        Travel times, energy and paths from every node to a set of targets, the charging stations
+        and trip destinations, precomputed with one reverse shortest path tree per target.
+
+        Rows of the arrays are targets and columns are nodes, so time[t, n] is the travel time from
+        node_ids[n] to targets[t].
+
+        Parameters:
+            node_ids (ndarray): IDs of all nodes, sorted.
+            targets (ndarray): IDs of the target nodes.
+            time (ndarray): (targets, nodes) travel times in minutes, inf if unreachable.
+            energy (ndarray): (targets, nodes) distance * impact index along the path, the
+                              consumption before the vehicle efficiency is applied.
+            previous (ndarray): (targets, nodes) next node ID on the way to the target, -1 at the
+                                target and at unreachable nodes.
+            season (str): Season the energy was computed for.
+            ADJUST (float): Distance multiplier the map was built with.
+            edges_hash (str): SHA-1 of the edges file the matrix was built from.
+            nodes_hash (str): SHA-1 of the nodes file the matrix was built from.
+            energy_hash (str): model_hash of the EnergyModel the energy was computed with.
+        """
+        self._node_ids = node_ids
+        self._targets = targets
+        self._time = time
+        self._energy = energy
+        self._previous = previous
+        self._season = season
+        self._ADJUST = ADJUST
+        self._edges_hash = edges_hash
+        self._nodes_hash = nodes_hash
+        self._energy_hash = energy_hash
+        self._target_index = {int(id): i for i, id in enumerate(targets)}
+        self._trees = {}
+
+    @classmethod
+    def build(cls, nodes, season, edges_hash, targets=None, nodes_hash=""):
+        """
+        Runs a reverse shortest path tree from every target.
+
+        Parameters:
+            nodes (Nodes): Nodes object built with energy costs (create_map with an impact table).
+            season (str): Season affecting energy consumption.
+            edges_hash (str): SHA-1 of the edges file, recorded for invalidation.
+            targets (iterable, optional): Target node IDs, the charging stations by default.
+            nodes_hash (str): SHA-1 of the nodes file, recorded for invalidation.
+
+        Returns:
+            StationMatrix: The precomputed matrix.
+        """
+        if targets is None:
+            targets = [node.id for node in nodes.all_cs]
+        targets = np.array(sorted(set(targets)), dtype=np.int64)
+        node_ids = np.array(sorted(nodes.nodes), dtype=np.int64)
+        position = {int(id): i for i, id in enumerate(node_ids)}
+
+        time = np.full((len(targets), len(node_ids)), np.inf)
+        energy = np.full((len(targets), len(node_ids)), np.inf)
+        previous = np.full((len(targets), len(node_ids)), -1, dtype=np.int64)
+
+        for t, target in enumerate(targets.tolist()):
+            tree = shortest_path_tree(nodes, nodes.get_node(target), reverse=True)
+            # Nodes in order of travel time, so a node's next hop is always filled in first
+            reached = [id for id in position if tree.time(id) < np.inf]
+            for id in sorted(reached, key=tree.time):
+                n = position[id]
+                time[t, n] = tree.time(id)
+                next_id = tree.previous(id)
+                if next_id is None:
+                    energy[t, n] = 0
+                    continue
+                previous[t, n] = next_id
+                road = select_road(id, next_id, nodes.roads)
+                energy[t, n] = energy[t, position[next_id]] + road.energy_cost(season)
+
+        energy_model = nodes.roads.energy_model if isinstance(nodes.roads, Roads) else ENERGY_MODEL
+        return cls(node_ids, targets, time, energy, previous, season, nodes.distance_adjust, edges_hash,
+                   nodes_hash, model_hash(energy_model))
+
+    def save(self, file_path):
+        """Writes the matrix to an .npz file."""
+        np.savez(file_path, node_ids=self._node_ids, targets=self._targets, time=self._time,
+                 energy=self._energy, previous=self._previous, season=np.array(self._season),
+                 ADJUST=np.array(self._ADJUST), edges_hash=np.array(self._edges_hash),
+                 nodes_hash=np.array(self._nodes_hash), energy_hash=np.array(self._energy_hash))
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a matrix written by save."""
+        with np.load(file_path) as data:
+            # Files saved before the nodes and model were hashed load with empty hashes, never valid
+            hashes = [str(data[name]) if name in data else "" for name in ("nodes_hash", "energy_hash")]
+            return cls(data["node_ids"], data["targets"], data["time"], data["energy"], data["previous"],
+                       str(data["season"]), float(data["ADJUST"]), str(data["edges_hash"]), *hashes)
+
+    @property
+    def targets(self):
+        """IDs of the target nodes."""
+        return self._targets
+
+    @property
+    def season(self):
+        """Season the energy was computed for."""
+        return self._season
+
+    @property
+    def ADJUST(self):
+        """Distance multiplier the map was built with."""
+        return self._ADJUST
+
+    @property
+    def edges_hash(self):
+        """SHA-1 of the edges file the matrix was built from."""
+        return self._edges_hash
+
+    @property
+    def nodes_hash(self):
+        """SHA-1 of the nodes file the matrix was built from."""
+        return self._nodes_hash
+
+    @property
+    def energy_hash(self):
+        """model_hash of the EnergyModel the energy was computed with."""
+        return self._energy_hash
+
+    def __contains__(self, target_id):
+        return target_id in self._target_index
+
+    def _position(self, id):
+        n = np.searchsorted(self._node_ids, id)
+        if n == len(self._node_ids) or self._node_ids[n] != id:
+            raise KeyError(id)
+        return n
+
+    def time(self, from_id, target_id):
+        """Returns the travel time from from_id to target_id in minutes, inf if unreachable."""
+        return float(self._time[self._target_index[target_id], self._position(from_id)])
+
+    def energy(self, from_id, target_id):
+        """Returns distance * impact index from from_id to target_id, inf if unreachable."""
+        return float(self._energy[self._target_index[target_id], self._position(from_id)])
+
+    def times(self, from_ids, target_ids):
+        """Returns the (from, target) travel time matrix, e.g. station to station."""
+        rows = [self._target_index[id] for id in target_ids]
+        columns = [self._position(id) for id in from_ids]
+        return self._time[np.ix_(rows, columns)].T
+
+    def energies(self, from_ids, target_ids):
+        """Returns the (from, target) distance * impact index matrix."""
+        rows = [self._target_index[id] for id in target_ids]
+        columns = [self._position(id) for id in from_ids]
+        return self._energy[np.ix_(rows, columns)].T
+
+    def soc_map(self, target_id, efficiency, capacity, t, energy_model=ENERGY_MODEL):
+        """
+        Returns the SOCMap of a target from its energy row in one array operation, the same map
+        fastest_path_SOC_map searches for.
+
+        Parameters:
+            target_id (int): ID of the destination, one of the targets.
+            efficiency (float): Energy efficiency of the vehicles in kWh per km.
+            capacity (float): Battery capacity of the vehicles in kWh.
+            t (float): SOC in percentage that must remain at the destination.
+            energy_model (EnergyModel): The vehicles' model, it must be the one the matrix was built with.
+
+        Raises:
+            ValueError: If the matrix's energy comes from another model.
+        """
+        if model_hash(energy_model) != self._energy_hash:
+            raise ValueError("The station matrix was built with another energy model")
+        need = t + self._energy[self._target_index[target_id]] * efficiency / capacity
+        return SOCMap(self._node_ids, need, target_id, self._season, efficiency, capacity, t, energy_model)
+
+    def tree(self, target_id):
+        """
+        Returns the reverse PathTree of a target, the same tree shortest_path_tree(..., reverse=True)
+        grows, without searching the graph.
+        """
+        if target_id not in self._trees:
+            t = self._target_index[target_id]
+            reached = np.isfinite(self._time[t])
+            ids = self._node_ids[reached].tolist()
+            travel_times = dict(zip(ids, self._time[t, reached].tolist()))
+            previous_nodes = {id: (next_id if next_id >= 0 else None)
+                              for id, next_id in zip(ids, self._previous[t, reached].tolist())}
+            self._trees[target_id] = PathTree(target_id, travel_times, previous_nodes, reverse=True)
+        return self._trees[target_id]
+
+
+def load_station_matrix(nodes, nodes_file_path, edges_file_path, season, targets=None, file_path=None):
+    """
+    Returns the station matrix of a map, building and saving it only when no valid file exists.
+
+    A saved matrix is rebuilt when the contents of the nodes or edges file, the map's energy
+    model, the season or ADJUST differ from what it was built with, or when it lacks one of the
+    targets.
+
+    Parameters:
+        nodes (Nodes): Nodes object from load_map with an impact table.
+        nodes_file_path (str): Path to the nodes.csv file the map was built from.
+        edges_file_path (str): Path to the edges.csv file the map was built from.
+        season (str): Season affecting energy consumption.
+        targets (iterable, optional): Target node IDs, the charging stations by default. Add trip
+                                      destinations to answer station-to-destination queries.
+        file_path (str, optional): Where the matrix is saved, next to the edges file by default.
+
+    Returns:
+        StationMatrix: The matrix for the map and season.
+    """
+    if targets is None:
+        targets = [node.id for node in nodes.all_cs]
+    targets = set(targets)
+    if file_path is None:
+        file_path = f"{os.path.splitext(edges_file_path)[0]}_{season}_{nodes.distance_adjust:g}.npz"
+
+    edges_hash = file_hash(edges_file_path)
+    nodes_hash = file_hash(nodes_file_path)
+    energy_hash = model_hash(nodes.roads.energy_model if isinstance(nodes.roads, Roads) else ENERGY_MODEL)
+    if os.path.exists(file_path):
+        matrix = StationMatrix.load(file_path)
+        if (matrix.edges_hash == edges_hash and matrix.nodes_hash == nodes_hash
+                and matrix.energy_hash == energy_hash and matrix.season == season
+                and matrix.ADJUST == nodes.distance_adjust and targets.issubset(matrix.targets.tolist())):
+            return matrix
+        targets |= {id for id in matrix.targets.tolist() if id in nodes.nodes}
+
+    matrix = StationMatrix.build(nodes, season, edges_hash, targets, nodes_hash)
+    matrix.save(file_path)
+    return matrix
@@ -0,0 +1,226 @@
+import abc
+import asyncio
+import json
+import threading
+import time
+
+from CS_data_storage import TTLCache
+
+
+class StationStateProvider(abc.ABC):
+    """
+    Source of live charging station state.
+
+    get_states returns station ID -> {"queue_time": minutes, "occupy": bool} for the IDs it knows,
+    stations it could not answer in time are left out so callers fall back to their own estimate.
+    """
+
+    @abc.abstractmethod
+    async def get_states(self, ids):
+        pass
+
+    async def close(self):
+        pass
+
+
+class LocalStationServer:
+    def __init__(self, stations, delay=0.0):
+        """
+        In-process stand-in for the availability backend, answering from ChargingStationManager objects.
+
+        Requests and responses are one JSON object per line: {"ids": [...]} is answered with
+        {"states": {id: {"queue_time": ..., "occupy": ...}}}.
+
+        Parameters:
+            stations (list): ChargingStationManager objects to serve.
+            delay (float): Seconds every request takes, to stand in for the network and backend.
+        """
+        self._stations = {station.node.id: station for station in stations}
+        self._delay = delay
+        self._server = None
+        self._handlers = set()
+        self.requests = 0
+
+    @property
+    def port(self):
+        """Port the server listens on, picked by the OS."""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host="127.0.0.1"):
+        self._server = await asyncio.start_server(self._serve, host, 0)
+
+    async def close(self):
+        self._server.close()
+        # Drop the connections still open, including requests still in their delay
+        for handler in self._handlers:
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while line := await reader.readline():
+                self.requests += 1
+                ids = json.loads(line)["ids"]
+                if self._delay:
+                    await asyncio.sleep(self._delay)
+                states = {id: {"queue_time": self._stations[id].queue_time, "occupy": self._stations[id].occupy}
+                          for id in ids if id in self._stations}
+                writer.write(json.dumps({"states": states}).encode() + b"\n")
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            # Closed by close() or by the client
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+
+class StationClient(StationStateProvider):
+    def __init__(self, host, port, pool_size=4, batch_size=16, timeout=0.5, ttl=5.0, clock=time.monotonic,
+                 cache_size=1024):
+        """
+        Queries a station availability server over a pool of persistent connections.
+
+        The IDs of one call are split into batches of batch_size sent concurrently, one per pooled
+        connection, so a reroute pays about one round trip instead of one per station. Answers are
+        cached for ttl, in the units of clock.
+
+        Parameters:
+            host (str): Server address.
+            port (int): Server port.
+            pool_size (int): Connections kept open.
+            batch_size (int): Station IDs per request.
+            timeout (float): Seconds to wait for one batch before leaving its stations out.
+            ttl (float): How long a station state is reused for, 0 only within the same clock reading.
+            clock (function): Current time for the cache, wall clock seconds by default.
+            cache_size (int): Station states kept, least recently used first out.
+        """
+        self._host = host
+        self._port = port
+        self._pool_size = pool_size
+        self._batch_size = batch_size
+        self._timeout = timeout
+        self._pool = None
+        self._opened = 0
+        self._cache = TTLCache(cache_size, ttl, clock)
+
+    async def _connection(self):
+        """
+        Returns a pooled connection, opening one while fewer than pool_size are open. None is a
+        free slot left by a dropped connection, it is opened again here.
+        """
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+        if self._pool.empty() and self._opened < self._pool_size:
+            self._opened += 1
+            connection = None
+        else:
+            connection = await self._pool.get()
+        if connection is None:
+            try:
+                connection = await asyncio.wait_for(asyncio.open_connection(self._host, self._port), self._timeout)
+            except (asyncio.TimeoutError, OSError):
+                # Hand the slot on, so a task waiting for a connection tries again
+                self._pool.put_nowait(None)
+                raise
+        return connection
+
+    async def _request(self, ids):
+        try:
+            reader, writer = await self._connection()
+        except (asyncio.TimeoutError, OSError):
+            return {}
+        try:
+            writer.write(json.dumps({"ids": ids}).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self._timeout)
+            if not line:
+                raise ConnectionError("Station server closed the connection")
+        except (asyncio.TimeoutError, OSError):
+            # The connection may still get the late answer, so it is not reused, its slot is
+            self._pool.put_nowait(None)
+            writer.close()
+            return {}
+        self._pool.put_nowait((reader, writer))
+        return {int(id): state for id, state in json.loads(line)["states"].items()}
+
+    async def get_states(self, ids):
+        states = {}
+        missing = []
+        for id in ids:
+            state = self._cache.get(id)
+            if state is not None:
+                states[id] = state
+            else:
+                missing.append(id)
+
+        batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+        for answer in await asyncio.gather(*(self._request(batch) for batch in batches)):
+            for id, state in answer.items():
+                self._cache.put(id, state)
+                states[id] = state
+        return states
+
+    @property
+    def cache(self):
+        """The TTLCache of station states, with its hit and miss counters."""
+        return self._cache
+
+    async def close(self):
+        while self._pool is not None and not self._pool.empty():
+            connection = self._pool.get_nowait()
+            if connection is not None:
+                connection[1].close()
+        self._opened = 0
+
+
+class StationService:
+    def __init__(self, provider, server=None):
+        """
+        Runs a StationStateProvider on its own event loop thread, so the synchronous simulation can
+        query every candidate station at once.
+
+        Parameters:
+            provider (StationStateProvider): Where station states come from.
+            server (LocalStationServer, optional): Stand-in server to shut down with the service.
+        """
+        self._provider = provider
+        self._server = server
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def local(cls, stations, delay=0.0, **client_options):
+        """
+        Starts a LocalStationServer for the stations and a StationClient connected to it.
+
+        Parameters:
+            stations (list): ChargingStationManager objects to serve.
+            delay (float): Seconds every server request takes.
+            client_options: Passed on to StationClient.
+        """
+        server = LocalStationServer(stations, delay)
+        service = cls(None, server)
+        service._run(server.start())
+        service._provider = StationClient("127.0.0.1", server.port, **client_options)
+        return service
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def states(self, ids):
+        """Returns station ID -> state for the stations the provider answered."""
+        return self._run(self._provider.get_states(list(ids)))
+
+    def close(self):
+        """Closes the provider, the server if any, and stops the event loop thread."""
+        self._run(self._provider.close())
+        if self._server is not None:
+            self._run(self._server.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
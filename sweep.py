@@ -0,0 +1,116 @@
+import contextlib
+import functools
+import io
+import itertools
+import multiprocessing
+import random
+
+from map_graph import *
+from vehicle import *
+from simulation import *
+from aggregate import *
+
+NODES_FILE = "nodes.csv"
+EDGES_FILE = "edges.csv"
+
+VEHICLE = {
+    "start_id": 1,
+    "dest_id": 18,
+    "capacity": 57.0,
+    "SOC": 60.0,
+    "efficiency": 0.13
+}
+# Vehicle every sweep trip drives, same as main.py
+
+
+def sweep_grid(SEASON, THRESHOLD, END_TRIP_SOC, MODEL, DISTANCE_ADJUST, seed):
+    """
+    Builds every combination of the experiment settings.
+
+    Parameters:
+        SEASON (list): Seasons to run.
+        THRESHOLD (list): Charging thresholds in SOC percentage.
+        END_TRIP_SOC (list): Required SOC percentages at the destination.
+        MODEL (list): Models, see main.py.
+        DISTANCE_ADJUST (list): Distance multipliers.
+        seed (list): Random seeds for the charging station draws.
+
+    Returns:
+        list: One configuration dict per combination, in a fixed order.
+    """
+    keys = ["SEASON", "THRESHOLD", "END_TRIP_SOC", "MODEL", "DISTANCE_ADJUST", "seed"]
+    values = [SEASON, THRESHOLD, END_TRIP_SOC, MODEL, DISTANCE_ADJUST, seed]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def load_graphs(adjusts, nodes_file=NODES_FILE, edges_file=EDGES_FILE):
+    """Parses the map once per distance multiplier into the load_map cache."""
+    for ADJUST in adjusts:
+        load_map(nodes_file, edges_file, ADJUST, GEOTAB_data)
+
+
+def run_config(config, nodes_file=NODES_FILE, edges_file=EDGES_FILE):
+    """
+    Runs one trip for a configuration on the shared graph.
+
+    The module-level random generator is reseeded from the configuration, so the outcome does
+    not depend on which worker runs it or what it ran before.
+
+    Returns:
+        dict: The configuration with the trip metrics added.
+    """
+    random.seed(config["seed"])
+    nodes, roads = load_map(nodes_file, edges_file, config["DISTANCE_ADJUST"], GEOTAB_data)
+
+    ev = EVehicle(**VEHICLE)
+    # Trips print their summary when they fail, keep worker output quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        r = run_trip(nodes, roads, ev, config["SEASON"], config["THRESHOLD"], config["END_TRIP_SOC"],
+                     config["MODEL"], config["DISTANCE_ADJUST"])
+
+    metrics = trip_metrics(r, ev)
+    return dict(config, **{metric: metrics[metric] for metric in METRICS})
+
+
+def run_sweep(configs, workers=None, nodes_file=NODES_FILE, edges_file=EDGES_FILE):
+    """
+    Runs the configurations across a process pool.
+
+    The maps are parsed in this process before the pool starts, so forked workers share them
+    instead of parsing the CSV files per task. Where fork is unavailable every worker parses
+    them once on start-up.
+
+    Parameters:
+        configs (list): Configuration dicts, e.g. from sweep_grid.
+        workers (int, optional): Number of worker processes, all cores by default.
+        nodes_file (str): Path to the nodes.csv file.
+        edges_file (str): Path to the edges.csv file.
+
+    Returns:
+        list: Metrics of every configuration, in the order of configs whatever the worker count.
+    """
+    adjusts = sorted({config["DISTANCE_ADJUST"] for config in configs})
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        load_graphs(adjusts, nodes_file, edges_file)
+        context = multiprocessing.get_context("fork")
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context("spawn")
+        initializer, initargs = load_graphs, (adjusts, nodes_file, edges_file)
+
+    workers = workers or context.cpu_count()
+    chunksize = max(1, len(configs) // (workers * 4))
+    with context.Pool(workers, initializer, initargs) as pool:
+        # map keeps the input order, so aggregation is deterministic
+        return pool.map(functools.partial(run_config, nodes_file=nodes_file, edges_file=edges_file),
+                        configs, chunksize)
+
+
+if __name__ == "__main__":
+    configs = sweep_grid(["spring", "summer", "fall", "winter"], [30, 50], [5], [0, 1], [2], range(10))
+    table = trip_table(run_sweep(configs))
+    print(summarize(table, by="MODEL"))
+    deltas = model_deltas(table, ["SEASON", "THRESHOLD", "END_TRIP_SOC", "DISTANCE_ADJUST", "seed"], model="MODEL")
+    print(delta_summary(deltas, model="MODEL"))
+    export(table, "sweep.csv")
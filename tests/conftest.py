@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the top of the repository, as main.py imports them
+sys.path.insert(0, REPO)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+
+@pytest.fixture
+def map_files():
+    """Paths of the repository's nodes.csv and edges.csv."""
+    return os.path.join(REPO, "nodes.csv"), os.path.join(REPO, "edges.csv")
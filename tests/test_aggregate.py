@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from aggregate import *
+from map_graph import *
+from result import *
+from simulation import *
+from vehicle import *
+
+
+def drive(map_files, seed, EVENTS=0, sink=None):
+    random.seed(seed)
+    nodes, roads = load_map(*map_files, 2, GEOTAB_data)
+    ev = EVehicle(1, 18, 57.0, 60.0, 0.13)
+    r = run_trip(nodes, roads, ev, "winter", 50, 5, 0, 2, EVENTS=EVENTS, sink=sink, trip=seed)
+    return r, trip_metrics(r, ev)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streamed_trip_has_the_same_metrics(map_files, tmp_path, seed, capsys):
+    kept, expected = drive(map_files, seed)
+    sink = ResultSink(str(tmp_path / "results.ndjson"))
+    _, streamed = drive(map_files, seed, sink=sink)
+    sink.close()
+    assert expected["charge_stops"] == len([e for e in kept.station_history if "charge time" in e])
+    assert streamed == expected
+
+
+def test_queue_time_is_the_wait_in_the_trip_time(map_files, capsys):
+    _, metrics = drive(map_files, 0)
+    # Without simulated queues the vehicle never waits, TRmax only uses the queue to pick stations
+    assert metrics["queue_time"] == 0
+    r, metrics = drive(map_files, 0, EVENTS=1)
+    assert metrics["queue_time"] == sum(e.get("wait time", 0) for e in r.station_history)
+
+
+def test_empty_battery_fails_the_trip_as_in_batch():
+    r = result()
+    assert not trip_metrics(r, EVehicle(1, 18, 57.0, 12.0, 0.13))["failed"]
+    assert trip_metrics(r, EVehicle(1, 18, 57.0, -0.5, 0.13))["failed"]
+    r.failed = True
+    assert trip_metrics(r, EVehicle(1, 18, 57.0, 12.0, 0.13))["failed"]
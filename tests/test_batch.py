@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from batch import BatchSimulation
+from benchmark import grid_map
+from CS_data_storage import ChargingStationManager
+from map_graph import *
+from navigation import *
+from vehicle import *
+
+
+@pytest.fixture(scope="module")
+def grid():
+    nodes, roads = grid_map(15, 15)
+    rng = random.Random(1)
+    stations = [ChargingStationManager(node, 0, rng.randint(1, 8), node.id % 2 + 2) for node in nodes.all_cs]
+    return nodes, roads, stations
+
+
+def walk(nodes, roads, stations, start, dest, SOC):
+    """
+    Drives one EVehicle hop by hop along its fastest route with run_trip's charging rule: at a
+    station, below the threshold and unable to finish, charge to optimal_SOC (80% above 100%).
+    """
+    by_node = {station.node.id: station for station in stations}
+    path = fastest_path(nodes, nodes.get_node(start), nodes.get_node(dest))
+    ev = EVehicle(start, dest, 57.0, SOC, 0.13)
+    ev.redirect(start, 0)
+    total_time = total_length = charge_time = 0.0
+    stops = 0
+    for i in range(len(path) - 1):
+        road = select_road(path[i], path[i+1], roads)
+        ev.redirect(path[i+1], road.distance)
+        ev.drive(road.distance, "winter", road.speed_limit)
+        total_time += road.travel_time
+        total_length += road.distance
+        if ev.SOC < 0:
+            return total_time, total_length, ev.SOC, stops, charge_time, True
+
+        rest = path[i+1:]
+        station = by_node.get(path[i+1])
+        if station and ev.SOC < 50 and not ev.check_reachable("winter", rest, roads, 5):
+            target = ev.optimal_SOC("winter", nodes, nodes.get_node(dest), roads, 5, rest)
+            target = 80 if target > 100 else target
+            if target > ev.SOC:
+                time = station.charge_time_check(ev, target)
+                total_time += time
+                charge_time += time
+                stops += 1
+                ev.charge(target)
+    return total_time, total_length, ev.SOC, stops, charge_time, False
+
+
+def test_batch_charges_like_a_vehicle_walking_the_route(grid):
+    nodes, roads, stations = grid
+    rng = random.Random(3)
+    ids = list(nodes.nodes)
+    trips = [(rng.choice(ids), rng.choice(ids)) for _ in range(60)]
+    results = BatchSimulation(nodes, roads, stations, "winter", 57.0, 0.13, 50, 5, queue=False).run(
+        *zip(*trips), 40.0)
+
+    assert results["charge_stops"].sum() > 0
+    columns = ("total_time", "total_length", "final_SOC", "charge_stops", "charge_time", "failed")
+    for i, (start, dest) in enumerate(trips):
+        expected = walk(nodes, roads, stations, start, dest, 40.0)
+        for column, value in zip(columns, expected):
+            assert results[column][i] == pytest.approx(value), (column, start, dest)
@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from benchmark import grid_map
+from contraction import ContractionHierarchy
+from map_graph import *
+from navigation import *
+
+
+def check_queries(nodes, pairs, hierarchy):
+    for start, dest in pairs:
+        path = fastest_path(nodes, nodes.get_node(start), nodes.get_node(dest))
+        time, shortcut_path = hierarchy.query(start, dest)
+        assert shortcut_path[0] == start and shortcut_path[-1] == dest
+        assert all(nodes.get_road(a, b) is not None for a, b in zip(shortcut_path, shortcut_path[1:]))
+        assert time == pytest.approx(travel_time(path, nodes))
+        assert travel_time(shortcut_path, nodes) == pytest.approx(time)
+
+
+def test_hierarchy_matches_dijkstra_on_a_grid():
+    nodes, _ = grid_map(12, 12)
+    rng = random.Random(4)
+    ids = list(nodes.nodes)
+    check_queries(nodes, [(rng.choice(ids), rng.choice(ids)) for _ in range(50)], ContractionHierarchy.build(nodes))
+
+
+def test_hierarchy_matches_dijkstra_on_the_map(map_files, tmp_path):
+    nodes, _ = create_map(*map_files, 2)
+    ContractionHierarchy.build(nodes).save(str(tmp_path / "map.ch"))
+    hierarchy = ContractionHierarchy.load(str(tmp_path / "map.ch"))
+    ids = list(nodes.nodes)
+    check_queries(nodes, [(a, b) for a in ids[::3] for b in ids[::4]], hierarchy)
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from benchmark import grid_map
+from map_graph import *
+from navigation import *
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    nodes, roads = grid_map(12, 12)
+    file_path = str(tmp_path_factory.mktemp("csr") / "grid.csr")
+    save_csr(file_path, nodes)
+    return nodes, CSRGraph(file_path, GEOTAB_data)
+
+
+def test_fastest_path_matches_dijkstra(graph):
+    nodes, csr = graph
+    rng = random.Random(0)
+    ids = list(nodes.nodes)
+    for _ in range(20):
+        start, dest = nodes.get_node(rng.choice(ids)), nodes.get_node(rng.choice(ids))
+        expected = fastest_path(nodes, start, dest)
+        assert travel_time(fastest_path(csr, start.id, dest.id), csr) == pytest.approx(travel_time(expected, nodes))
+
+
+def test_unknown_node_raises(graph):
+    _, csr = graph
+    assert csr.get_node(-5) is None
+    with pytest.raises(KeyError):
+        csr.index(-5)
+    with pytest.raises(KeyError):
+        fastest_path(csr, 1, -5)
+
+
+def test_unsupported_method_rejected(graph):
+    _, csr = graph
+    stats = {}
+    fastest_path(csr, 1, 2, stats=stats)
+    assert stats["settled"] > 0
+    with pytest.raises(ValueError):
+        fastest_path(csr, 1, 2, method="astar")
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import simulation
+from CS_data_storage import ChargingStationManager
+from map_graph import *
+from navigation import *
+from simulation import *
+from vehicle import *
+
+
+@pytest.fixture
+def city(map_files):
+    random.seed(0)
+    nodes, roads = load_map(*map_files, 2, GEOTAB_data)
+    stations = [ChargingStationManager(node, 10, 4, node.id % 2 + 2) for node in nodes.all_cs]
+    return nodes, roads, stations
+
+
+def test_full_battery_drives_the_fastest_path(city):
+    nodes, roads, stations = city
+    start, dest = nodes.get_node(1), nodes.get_node(18)
+    ev = EVehicle(1, 18, 57.0, 100.0, 0.13)
+    path, stops, total_time = energy_aware_path(nodes, start, dest, ev, "winter", stations, 5)
+    assert stops == []
+    assert total_time == pytest.approx(travel_time(fastest_path(nodes, start, dest), nodes))
+    assert travel_time(path, nodes) == pytest.approx(total_time)
+
+
+def test_plan_keeps_the_reserve(city):
+    nodes, roads, stations = city
+    start, dest = nodes.get_node(1), nodes.get_node(18)
+    ev = EVehicle(1, 18, 57.0, 30.0, 0.13)
+    path, stops, total_time = energy_aware_path(nodes, start, dest, ev, "winter", stations, 5, queue=False)
+    assert stops
+
+    plan = dict(stops)
+    managers = {station.node.id: station for station in stations}
+    SOC, expected = 30.0, 0.0
+    for i, id in enumerate(path):
+        if id in plan:
+            expected += managers[id].charge_time(SOC, 57.0, plan[id])
+            SOC = plan[id]
+        if i + 1 < len(path):
+            road = select_road(id, path[i + 1], roads)
+            SOC -= road.energy_cost("winter") * 0.13 / 57.0
+            expected += road.travel_time
+            assert SOC >= 5
+    assert total_time == pytest.approx(expected)
+
+
+def test_trip_follows_its_plan_with_one_search(map_files, monkeypatch, capsys):
+    searches = []
+
+    def counted(*args, **kwargs):
+        searches.append(energy_aware_path(*args, **kwargs))
+        return searches[-1]
+
+    monkeypatch.setattr(simulation, "energy_aware_path", counted)
+    random.seed(0)
+    nodes, roads = load_map(*map_files, 2, GEOTAB_data)
+    ev = EVehicle(1, 18, 57.0, 60.0, 0.13)
+    r = run_trip(nodes, roads, ev, "winter", 50, 5, 2, 2)
+
+    assert len(searches) == 1
+    _, stops, _ = searches[0]
+    charges = [(event["station_id"], event["SOC_after"]) for event in r.station_history if "charge time" in event]
+    assert stops and charges == stops
+    assert not r.failed and ev.SOC >= 5
@@ -0,0 +1,24 @@
+import pytest
+
+import energy_model
+from energy_model import *
+
+
+def test_index_matches_impact_and_stays_bounded(monkeypatch):
+    monkeypatch.setattr(energy_model, "INDEX_CACHE_SIZE", 8)
+    model = EnergyModel.from_seasons(GEOTAB_data)
+    temperatures = [-10 + 0.37 * k for k in range(100)]
+    for temperature in temperatures:
+        assert model.index(temperature, 55) == pytest.approx(float(model.impact(55, temperature)))
+    assert len(model._indices) == 8
+    # The most recent lookups are kept, and a hit moves its key to the back
+    assert model.index(temperatures[-8], 55) == pytest.approx(float(model.impact(55, temperatures[-8])))
+    model.index(temperatures[0], 55)
+    assert list(model._indices)[-2:] == [(temperatures[-8], 55), (temperatures[0], 55)]
+    assert (temperatures[-7], 55) not in model._indices
+
+
+def test_index_at_table_points_is_exact():
+    for season, impact in GEOTAB_data.items():
+        for speed, index in impact.items():
+            assert ENERGY_MODEL.index(season, speed) == index
@@ -0,0 +1,71 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from CS_data_storage import ChargingStationManager
+from events import *
+
+
+def station(id, queue_time=0, rate=4):
+    return ChargingStationManager(SimpleNamespace(id=id), queue_time, rate, 2)
+
+
+def test_events_pop_in_time_then_scheduling_order():
+    events = EventQueue()
+    for time, kind in [(5, "a"), (1, "b"), (5, "c"), (1, "d")]:
+        events.schedule(time, kind)
+    assert [events.pop()[1] for _ in range(4)] == ["b", "d", "a", "c"]
+    assert events.now == 5
+
+
+def test_background_arrivals_follow_the_generator():
+    cs = station(3, queue_time=12, rate=6)
+    scheduler = Scheduler([cs], rng=random.Random(4))
+    scheduler.advance(600)
+    # Arrivals are only drawn when the station is looked at
+    assert scheduler._queues[3].arrivals == 0
+
+    rng = random.Random(4)
+    arrival, free, count = 0.0, 12.0, 0
+    while True:
+        arrival += rng.expovariate(6 / 60)
+        if arrival > 600:
+            break
+        free = max(free, arrival) + cs.average_charge_time
+        count += 1
+    assert cs.queue_time == pytest.approx(max(free - 600, 0))
+    assert scheduler._queues[3].arrivals == count
+
+
+def test_without_background_only_the_initial_queue_is_left():
+    cs = station(3, queue_time=5)
+    scheduler = Scheduler([cs], rng=random.Random(4), background=False)
+    scheduler.advance(3)
+    assert cs.queue_time == 2
+    scheduler.advance(60)
+    assert cs.queue_time == 0
+
+
+def test_advance_handles_vehicles_in_time_order():
+    scheduler = Scheduler([station(3, queue_time=5)], background=False)
+    scheduler.schedule_vehicle(10, "a", 3, 30)
+    scheduler.schedule_vehicle(10, "b", 3, 20)
+    scheduler.schedule_vehicle(0, "c", 3, 10)
+    scheduler.schedule_vehicle(20, "d", 3, 5)
+    scheduler.advance(10)
+    assert scheduler.now == 10
+    assert [(r["vehicle"], r["wait"], r["leave"]) for r in scheduler.log] == [("c", 5, 15), ("a", 5, 45), ("b", 35, 65)]
+    scheduler.advance(20)
+    assert scheduler.log[-1]["vehicle"] == "d" and scheduler.log[-1]["wait"] == 45
+
+
+def test_bookings_ahead_move_back_for_earlier_arrivals():
+    cs = station(3)
+    scheduler = Scheduler([cs], background=False)
+    booking = scheduler.book(3, 40, 30, "late")
+    assert scheduler.wait(3, booking) == 0
+    assert scheduler.charge(cs, 50, "now") == 0
+    assert scheduler.wait(3, booking) == 10 and scheduler.log[0]["leave"] == 80
+    # A vehicle arriving now only queues behind the one charging, not the booking ahead
+    assert cs.queue_time == 50
@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch import BatchSimulation
+from benchmark import grid_map
+from CS_data_storage import ChargingStationManager
+from events import StationQueue
+from fleet import FleetSimulation
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return grid_map(15, 15)
+
+
+def stations_of(nodes):
+    # Charge rates are drawn from the module-level generator, so the fleet and the batch share one list
+    rng = random.Random(1)
+    return [ChargingStationManager(node, 0, rng.randint(1, 8), node.id % 2 + 2) for node in nodes.all_cs]
+
+
+def test_single_vehicle_charges_like_batch(grid):
+    nodes, roads = grid
+    rng = random.Random(2)
+    ids = list(nodes.nodes)
+    trips = [(rng.choice(ids), rng.choice(ids)) for _ in range(40)]
+    stations = stations_of(nodes)
+    batch = BatchSimulation(nodes, roads, stations, "winter", 57.0, 0.13, 50, 5, queue=False)
+    expected = batch.run(*zip(*trips), 40.0)
+
+    for i, (start, dest) in enumerate(trips):
+        fleet = FleetSimulation(nodes, roads, stations, "winter", 57.0, 0.13, 50, 5, background=False, candidates=1)
+        result = fleet.run([start], [dest], 40.0)
+        for column, values in expected.items():
+            assert result[column][0] == pytest.approx(values[i]), (column, start, dest)
+
+
+def test_routes_without_hops(grid):
+    nodes, roads = grid
+    fleet = FleetSimulation(nodes, roads, stations_of(nodes), "winter", 57.0, 0.13, 50, 5, background=False)
+    result = fleet.run([5, 9], [5, 9], 60.0)
+    assert result["hops"].tolist() == [0, 0]
+    assert result["final_SOC"].tolist() == [60.0, 60.0]
+
+
+class Station:
+    expect_ev_rate = 1
+    average_charge_time = 60
+
+
+def test_bookings_are_served_in_arrival_order():
+    queue = StationQueue(Station())
+    late = queue.reserve(100, 30)
+    early = queue.reserve(90, 20)
+    assert early[2] == 0
+    assert late[2] == 10 and late[3] == 140
+    assert queue.queue_time(95) == 15
+    assert queue.queue_time(200) == 0
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from benchmark import grid_map
+from map_graph import *
+from navigation import *
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return grid_map(12, 12)[0]
+
+
+@pytest.fixture
+def sample(map_files):
+    return create_map(*map_files, 2)[0]
+
+
+def assert_road_path(nodes, path, first, last):
+    assert path[0] == first and path[-1] == last
+    assert all(nodes.get_road(a, b) is not None for a, b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("graph", ["grid", "sample"])
+def test_forward_tree_matches_fastest_path(graph, request):
+    nodes = request.getfixturevalue(graph)
+    rng = random.Random(7)
+    ids = list(nodes.nodes)
+    for source in rng.sample(ids, 5):
+        tree = shortest_path_tree(nodes, nodes.get_node(source))
+        assert tree.source_id == source and not tree.reverse
+        for id in rng.sample(ids, min(len(ids), 20)):
+            expected = travel_time(fastest_path(nodes, nodes.get_node(source), nodes.get_node(id)), nodes)
+            assert tree.time(id) == pytest.approx(expected)
+            assert_road_path(nodes, tree.path(id), source, id)
+            assert travel_time(tree.path(id), nodes) == pytest.approx(tree.time(id))
+
+
+@pytest.mark.parametrize("graph", ["grid", "sample"])
+def test_reverse_tree_leads_into_the_destination(graph, request):
+    nodes = request.getfixturevalue(graph)
+    rng = random.Random(8)
+    ids = list(nodes.nodes)
+    for dest in rng.sample(ids, 5):
+        tree = shortest_path_tree(nodes, nodes.get_node(dest), reverse=True)
+        assert tree.reverse
+        for id in rng.sample(ids, min(len(ids), 20)):
+            expected = travel_time(fastest_path(nodes, nodes.get_node(id), nodes.get_node(dest)), nodes)
+            assert tree.time(id) == pytest.approx(expected)
+            assert_road_path(nodes, tree.path(id), id, dest)
+            if id != dest:
+                assert tree.previous(id) == tree.path(id)[1]
+        assert tree.previous(dest) is None
+
+
+def test_unreachable_node_in_a_tree():
+    nodes, _ = grid_map(4, 4)
+    nodes.add_node(99, Node(99, 500.0, 500.0, 'intersection'))
+    tree = shortest_path_tree(nodes, nodes.get_node(1))
+    assert tree.time(99) == float('inf')
+    assert tree.path(99) == [99]
+    assert tree.previous(99) is None
+
+
+@pytest.mark.parametrize("graph", ["grid", "sample"])
+@pytest.mark.parametrize("method", ["astar", "bidirectional"])
+def test_search_modes_match_dijkstra(graph, method, request):
+    nodes = request.getfixturevalue(graph)
+    rng = random.Random(9)
+    ids = list(nodes.nodes)
+    for _ in range(40):
+        start, dest = nodes.get_node(rng.choice(ids)), nodes.get_node(rng.choice(ids))
+        expected = travel_time(fastest_path(nodes, start, dest), nodes)
+        path = fastest_path(nodes, start, dest, method=method)
+        assert_road_path(nodes, path, start.id, dest.id)
+        assert travel_time(path, nodes) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("method", ["astar", "bidirectional"])
+def test_search_modes_settle_fewer_nodes(grid, method):
+    start, dest = grid.get_node(1), grid.get_node(78)
+    dijkstra, guided = {}, {}
+    fastest_path(grid, start, dest, stats=dijkstra)
+    fastest_path(grid, start, dest, method=method, stats=guided)
+    assert 0 < guided["settled"] < dijkstra["settled"]
+
+
+def test_bidirectional_path_to_itself_and_unknown_method(grid):
+    node = grid.get_node(5)
+    assert bidirectional_path(grid, node, node) == [5]
+    with pytest.raises(ValueError):
+        fastest_path(grid, node, node, method="greedy")
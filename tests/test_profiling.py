@@ -0,0 +1,42 @@
+import os
+import pstats
+
+import profiling
+from profiling import *
+
+
+def square(x):
+    return x * x
+
+
+def test_profiled_is_a_no_op_without_profile(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE", False)
+    assert profiled()(square) is square
+
+
+def test_profiled_times_every_call(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE", True)
+    monkeypatch.setattr(profiling, "_timers", {})
+    timed = profiled("square")(square)
+    assert timed is not square and timed.__name__ == "square"
+    assert [timed(x) for x in range(5)] == [0, 1, 4, 9, 16]
+    calls, seconds = profiling._timers["square"]
+    assert calls == 5 and seconds >= 0
+    assert "square" in profile_report()
+    reset_profile()
+    assert profiling._timers["square"] == [0, 0.0]
+
+
+def test_trip_profile_writes_stats(tmp_path):
+    with trip_profile(3, str(tmp_path)):
+        sum(square(x) for x in range(100))
+    stats = pstats.Stats(str(tmp_path / "trip_3.pstats"))
+    assert any(function == "square" for _, _, function in stats.stats)
+
+
+def test_trip_profile_without_a_directory_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DUMP", "")
+    monkeypatch.chdir(tmp_path)
+    with trip_profile(3):
+        square(2)
+    assert os.listdir(tmp_path) == []
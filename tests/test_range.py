@@ -0,0 +1,75 @@
+import math
+import random
+
+import pytest
+
+from benchmark import grid_map
+from map_graph import *
+from navigation import *
+from vehicle import *
+
+
+def brute_force(nodes, longitude, latitude, radius, node_type=None):
+    ADJUST = nodes.distance_adjust or 1
+    return [node for node in nodes.nodes.values()
+            if (node_type is None or node.type == node_type)
+            and math.hypot(node.longitude - longitude, node.latitude - latitude) * ADJUST <= radius]
+
+
+@pytest.mark.parametrize("node_type", [None, 'CS'])
+def test_within_matches_a_linear_scan(map_files, node_type):
+    nodes, _ = create_map(*map_files, 2)
+    rng = random.Random(5)
+    for node in rng.sample(list(nodes.nodes.values()), 10):
+        for radius in (0, 40, 150, 1000):
+            expected = brute_force(nodes, node.longitude, node.latitude, radius, node_type)
+            assert nodes.within(node.longitude, node.latitude, radius, node_type) == expected
+
+
+def test_of_type_keeps_file_order_after_a_trip(map_files):
+    nodes, _ = create_map(*map_files, 2)
+    stations = nodes.of_type('CS')
+    assert [cs.id for cs in stations] == [node.id for node in nodes.nodes.values() if node.type == 'CS']
+    nodes.set_start_dest(stations[1].id, stations[0].id)
+    assert nodes.start is stations[1] and nodes.dest is stations[0]
+    nodes.reset_start_dest()
+    assert nodes.of_type('CS') == stations
+
+
+def test_roads_are_no_shorter_than_the_straight_line(map_files):
+    nodes, roads = create_map(*map_files, 2)
+    for edge in roads:
+        assert edge.distance >= euclidean_distance(edge.node1, edge.node2) * nodes.distance_adjust - 1e-9
+
+
+def test_max_range_bounds_every_reachable_path():
+    nodes, roads = grid_map(12, 12)
+    rng = random.Random(6)
+    ids = list(nodes.nodes)
+    reachable = 0
+    for SOC in (10.0, 20.0, 40.0):
+        for _ in range(30):
+            start = rng.choice(ids)
+            ev = EVehicle(start, start, 57.0, SOC, 0.13)
+            ev.redirect(start, 0)
+            tree = shortest_path_tree(nodes, nodes.get_node(start))
+            limit = ev.max_range("winter", 5)
+            for id in rng.sample(ids, 20):
+                path = tree.path(id)
+                if ev.check_reachable("winter", path, roads, 5):
+                    reachable += 1
+                    assert path_length(path, nodes) <= limit + 1e-9
+    assert reachable
+
+
+@pytest.mark.parametrize("MODEL", [0, 1])
+def test_pruned_stations_keep_the_trmax_field(map_files, MODEL, capsys):
+    from simulation import run_trip
+
+    random.seed(0)
+    nodes, roads = load_map(*map_files, 2, GEOTAB_data)
+    r = run_trip(nodes, roads, EVehicle(1, 18, 57.0, 60.0, 0.13), "winter", 50, 5, MODEL, 2)
+    records = [record for record in r.trmax_history if "station_id" in record]
+    assert records and all("trmax" in record for record in records)
+    pruned = [record for record in records if "trmax lower bound" in record]
+    assert pruned and all(record["trmax"] == math.inf for record in pruned)
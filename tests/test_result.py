@@ -0,0 +1,26 @@
+import json
+import math
+
+import numpy as np
+
+from result import *
+
+
+def test_sink_writes_strict_json(tmp_path):
+    file_path = tmp_path / "results.ndjson"
+    sink = ResultSink(str(file_path))
+    sink.add("trmax", 0, {"station_id": 3, "trmax": math.inf})
+    sink.add("trmax", 0, {"stops": [(4, float("nan"))], "trmax": np.float32("inf")})
+    sink.add("ev", 0, {"SOC": 41.5})
+    sink.close()
+
+    records = [json.loads(line, parse_constant=lambda name: reject_constant(name)) for line in open(file_path)]
+    assert records[0]["trmax"] is None
+    assert records[1] == {"trip": 0, "kind": "trmax", "stops": [[4, None]], "trmax": None}
+    assert records[2]["SOC"] == 41.5
+    # Non-finite values are left out of the aggregates
+    assert sink.aggregates()["trmax"]["station_id"]["sum"] == 3
+
+
+def reject_constant(name):
+    raise AssertionError(f"{name} is not strict JSON")
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pytest
+
+from energy_model import *
+from map_graph import *
+from station_matrix import *
+
+
+@pytest.fixture
+def map_copy(map_files, tmp_path):
+    """Copies of nodes.csv and edges.csv the test may change."""
+    copies = []
+    for path in map_files:
+        copies.append(str(tmp_path / os.path.basename(path)))
+        shutil.copy(path, copies[-1])
+    return copies
+
+
+def matrix_of(nodes_file, edges_file, impact=GEOTAB_data):
+    nodes, _ = create_map(nodes_file, edges_file, 2, impact)
+    return load_station_matrix(nodes, nodes_file, edges_file, "winter", [18])
+
+
+def test_saved_matrix_is_reused(map_copy):
+    first = matrix_of(*map_copy)
+    second = matrix_of(*map_copy)
+    assert second.nodes_hash == first.nodes_hash and second.energy_hash == first.energy_hash
+    assert second.energy(1, 18) == first.energy(1, 18)
+
+
+def test_changed_nodes_file_rebuilds(map_copy):
+    first = matrix_of(*map_copy)
+    with open(map_copy[0], "a") as file:
+        file.write("\n")
+    assert matrix_of(*map_copy).nodes_hash != first.nodes_hash
+
+
+def test_other_energy_model_rebuilds(map_copy):
+    geotab = matrix_of(*map_copy)
+    hungry = EnergyModel.from_seasons({season: {speed: 2 * index for speed, index in table.items()}
+                                       for season, table in GEOTAB_data.items()})
+    matrix = matrix_of(*map_copy, hungry)
+    assert matrix.energy(1, 18) == pytest.approx(2 * geotab.energy(1, 18))
+    with pytest.raises(ValueError):
+        matrix.soc_map(18, 0.13, 57.0, 5)
+    assert matrix.soc_map(18, 0.13, 57.0, 5, hungry).key[-1] is hungry
@@ -0,0 +1,65 @@
+import asyncio
+import socket
+
+import pytest
+
+from CS_data_storage import *
+from map_graph import *
+from station_service import *
+
+
+def stations(count=4):
+    return [ChargingStationManager(Node(id, 0.0, 0.0, 'CS'), id, 2, 2) for id in range(1, count + 1)]
+
+
+def run(coroutine, limit=5):
+    return asyncio.run(asyncio.wait_for(coroutine, limit))
+
+
+def test_provider_is_abstract():
+    with pytest.raises(TypeError):
+        StationStateProvider()
+
+
+def test_states_match_the_stations():
+    CS = stations()
+    service = StationService.local(CS, batch_size=1)
+    try:
+        states = service.states([station.node.id for station in CS])
+    finally:
+        service.close()
+    assert states == {station.node.id: {"queue_time": station.queue_time, "occupy": station.occupy} for station in CS}
+
+
+def test_refused_connection_degrades_to_no_states():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # Nothing listens on the port any more
+
+    async def query():
+        client = StationClient("127.0.0.1", port, pool_size=1, timeout=0.2)
+        try:
+            return await client.get_states([1, 2, 3])
+        finally:
+            await client.close()
+    assert run(query()) == {}
+
+
+def test_timed_out_connection_frees_its_slot():
+    async def query():
+        server = LocalStationServer(stations(), delay=0.3)
+        await server.start()
+        client = StationClient("127.0.0.1", server.port, pool_size=1, batch_size=1, timeout=0.1)
+        try:
+            # Two batches share the only connection, the second must not wait forever after the first times out
+            timed_out = await client.get_states([1, 2])
+            server._delay = 0
+            answered = await client.get_states([3])
+        finally:
+            await client.close()
+            await server.close()
+        return timed_out, answered
+    timed_out, answered = run(query())
+    assert timed_out == {}
+    assert list(answered) == [3]
@@ -0,0 +1,33 @@
+import math
+
+import pytest
+
+from sweep import *
+
+
+@pytest.fixture
+def configs():
+    return sweep_grid(["summer", "winter"], [30, 50], [5], [0, 1], [2], [0, 1])
+
+
+def same(a, b):
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+def assert_same_results(results, expected):
+    assert len(results) == len(expected)
+    for result, row in zip(results, expected):
+        assert result.keys() == row.keys()
+        assert all(same(result[key], row[key]) for key in row), (result, row)
+
+
+def test_grid_covers_every_combination(configs):
+    assert len(configs) == 16
+    assert len({tuple(config.values()) for config in configs}) == 16
+
+
+def test_worker_count_does_not_change_the_results(map_files, configs):
+    serial = run_sweep(configs, 1, *map_files)
+    assert_same_results(run_sweep(configs, 3, *map_files), serial)
+    # Each configuration reseeds the generator, so it does not depend on what ran before it
+    assert_same_results([run_config(config, *map_files) for config in reversed(configs)], serial[::-1])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from benchmark import grid_map, rush_hour_speeds
+from map_graph import *
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return grid_map(10, 10)
+
+
+def test_travel_time_interpolates_between_slots(grid, tmp_path):
+    _, roads = grid
+    speeds = rush_hour_speeds(roads)
+    file_path = str(tmp_path / "speeds.npy")
+    TrafficProfiles.save(file_path, speeds)
+    profiles = TrafficProfiles.load(file_path, roads)
+
+    stored = np.load(file_path).astype(float)
+    width = 1440 / speeds.shape[1]
+    for edge in list(roads)[::7]:
+        for depart in (0, 470.5, 1439.9, 1440 + 15):
+            slot = int(depart % 1440 // width)
+            before = edge.distance / stored[edge.position, slot] * 60
+            after = edge.distance / stored[edge.position, (slot + 1) % speeds.shape[1]] * 60
+            expected = before + (depart % 1440 / width - slot) * (after - before)
+            assert profiles.travel_time(edge, depart) == pytest.approx(expected)
+
+
+def test_profiles_breaking_fifo_are_rejected(grid):
+    _, roads = grid
+    speeds = np.full((len(roads), 4), 70.0)
+    speeds[3, 1] = 0.5  # Crawling for one slot, then back to the limit at once
+    with pytest.raises(ValueError):
+        TrafficProfiles(roads, speeds)
+
+
+def test_departure_rounding_onto_the_period_end(grid):
+    _, roads = grid
+    speeds = np.full((len(roads), 7), 70.0)
+    speeds[-1] = 35.0
+    profiles = TrafficProfiles(roads, speeds)
+    last = list(roads)[-1]
+    assert profiles.travel_time(last, -1e-13) == pytest.approx(last.distance / 35.0 * 60)
+    assert profiles.travel_time(list(roads)[-2], -1e-13) == pytest.approx(list(roads)[-2].distance / 70.0 * 60)
+
+
+@pytest.mark.parametrize("speed", [0.0, -5.0, np.nan])
+def test_non_positive_speeds_are_rejected(grid, speed):
+    _, roads = grid
+    speeds = np.full((len(roads), 4), 70.0)
+    speeds[2, 1] = speed
+    with pytest.raises(ValueError):
+        TrafficProfiles(roads, speeds)
@@ -0,0 +1,84 @@
+import pytest
+
+from benchmark import grid_map
+from map_graph import *
+from navigation import *
+from vehicle import *
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return grid_map(10, 10)
+
+
+def vehicle_at(node_id, dest_id, SOC=60.0):
+    ev = EVehicle(node_id, dest_id, 57.0, SOC, 0.13)
+    ev.redirect(node_id, 0)
+    return ev
+
+
+def test_optimal_SOC_follows_the_given_path(grid):
+    nodes, roads = grid
+    start, dest = nodes.get_node(1), nodes.get_node(100)
+    fastest = fastest_path(nodes, start, dest)
+    detour = fastest_path(nodes, start, nodes.get_node(10))[:-1] + fastest_path(nodes, nodes.get_node(10), dest)
+
+    ev = vehicle_at(1, 100)
+    first = ev.optimal_SOC("winter", nodes, dest, roads, 5, fastest)
+    second = ev.optimal_SOC("winter", nodes, dest, roads, 5, detour)
+    assert second > first
+    assert ev.optimal_SOC("winter", nodes, dest, roads, 5) == pytest.approx(first)
+
+
+def test_optimal_SOC_memo_is_per_route(grid):
+    nodes, roads = grid
+    dest = nodes.get_node(100)
+    around = lambda nodes, start, dest: (fastest_path(nodes, start, nodes.get_node(10))[:-1]
+                                         + fastest_path(nodes, nodes.get_node(10), dest))
+    ev = vehicle_at(1, 100)
+    fast = ev.optimal_SOC("winter", nodes, dest, roads, 5)
+    assert ev.optimal_SOC("winter", nodes, dest, roads, 5, route=around) > fast
+
+
+def test_planned_route_answers_like_the_hop_loop(grid):
+    nodes, roads = grid
+    path = fastest_path(nodes, nodes.get_node(1), nodes.get_node(100))
+    for SOC in (10.0, 20.0, 40.0, 60.0):
+        planned = vehicle_at(1, 100, SOC)
+        planned.plan_route("winter", path, roads)
+        plain = vehicle_at(1, 100, SOC)
+        assert planned.check_reachable("winter", path, roads, 5) == plain.check_reachable("winter", list(path), roads, 5)
+
+
+def test_custom_energy_model_plans_as_it_drives(grid):
+    nodes, roads = grid
+    hungry = EnergyModel.from_seasons({season: {speed: 2 * index for speed, index in table.items()}
+                                       for season, table in GEOTAB_data.items()})
+    path = fastest_path(nodes, nodes.get_node(1), nodes.get_node(100))
+    ev = EVehicle(1, 100, 57.0, 90.0, 0.13, hungry)
+    ev.redirect(1, 0)
+    ev.plan_route("winter", path, roads)
+    planned = ev.remaining_energy("winter", path, roads)
+    optimal = ev.optimal_SOC("winter", nodes, nodes.get_node(100), roads, 5)
+
+    for i in range(len(path) - 1):
+        road = select_road(path[i], path[i+1], roads)
+        ev.drive(road.distance, "winter", road.speed_limit)
+    spent = (90.0 - ev.SOC) * ev.capacity
+    assert planned == pytest.approx(spent)
+    assert optimal == pytest.approx(90.0 + 5 + spent / ev.capacity + 5)
+
+    geotab = vehicle_at(1, 100, 90.0)
+    geotab.plan_route("winter", path, roads)
+    assert planned == pytest.approx(2 * geotab.remaining_energy("winter", path, roads))
+
+
+def test_soc_map_answers_like_optimal_SOC(grid):
+    nodes, roads = grid
+    dest = nodes.get_node(55)
+    soc_map = fastest_path_SOC_map(nodes, dest, "winter", 0.13, 57.0, 5)
+    assert soc_map.key == (55, "winter", 0.13, 57.0, 5, ENERGY_MODEL)
+    for id in list(nodes.nodes)[::3]:
+        ev = vehicle_at(id, 55)
+        assert ev.optimal_SOC("winter", nodes, dest, roads, 5, soc_map=soc_map) == pytest.approx(
+            ev.optimal_SOC("winter", nodes, dest, roads, 5))
@@ -1,17 +1,9 @@
+from energy_model import *
 from map_graph import *
 from navigation import *
 
-GEOTAB_data = {
-    "spring": {40: 98.2, 70: 84.8, 100: 68.4},
-    "summer": {40: 78.5, 70: 75.5, 100: 64.0},
-    "fall": {40: 78.5, 70: 75.5, 100: 64.0},
-    "winter": {40: 60.5, 70: 64.8, 100: 52.8}
-}
-# Data retrived from GEOTAB's "Impact of temperature and speed on EV range" model
-# https://www.geotab.com/blog/ev-range-impact-of-speed-and-temperature/
-
 class EVehicle:
-    def __init__(self, start_id, dest_id, capacity, SOC, efficiency):
+    def __init__(self, start_id, dest_id, capacity, SOC, efficiency, energy_model=ENERGY_MODEL):
         """
         Initialize an Electric Vehicle (EV) object.
         
@@ -23,6 +15,7 @@ class EVehicle:
             capacity (float): Battery capacity in kWh.
             SOC (float): State of Charge of the battery in percentage (0-100).
             efficiency (float): Energy efficiency of the EV in kWh per km.
+            energy_model (EnergyModel): Impact of speed and temperature on consumption, GEOTAB's by default.
         """
         self._start_id = start_id
         self._dest_id = dest_id
@@ -31,6 +24,14 @@ class EVehicle:
         self._capacity = capacity
         self._SOC = SOC
         self._efficiency = efficiency
+        self._energy_model = energy_model
+
+        # Energy profile of the planned route, see plan_route
+        self._route = None
+        self._route_key = None
+        self._route_energy = []
+        # Energy still needed to reach a destination, keyed by (node, dest, season, t, route, roads)
+        self._optimal = {}
 
     @property
     def start_id(self):
@@ -67,6 +68,11 @@ class EVehicle:
         """Energy efficiency of the EV in kWh per km."""
         return self._efficiency
 
+    @property
+    def energy_model(self):
+        """EnergyModel the consumption of drive and max_range is evaluated with."""
+        return self._energy_model
+
     def drive(self, distance, season, speed):
         """
         Simulates the EV driving a certain distance and updates its state of charge (SOC).
@@ -74,8 +80,8 @@ class EVehicle:
         
         Parameters:
             distance (float): Distance traveled in kilometers.
-            season (str): Season affecting energy consumption.
-            speed (int): Speed of the vehicle in km/h.
+            season (str or float): Season, or temperature in degrees Celsius, affecting energy consumption.
+            speed (float): Speed of the vehicle in km/h, any speed between the model's is interpolated.
 
         Updates:
             - Decreases `to_cur` by the traveled distance.
@@ -92,7 +98,7 @@ class EVehicle:
             self._to_cur = 0
             exceed = distance - self._to_cur
 
-        impact_index = GEOTAB_data[season][speed]
+        impact_index = self._energy_model.index(season, speed)
         consumption = distance * self._efficiency * impact_index
         self._SOC = (self._SOC * self._capacity - consumption) / self.capacity
         return exceed
@@ -119,38 +125,127 @@ class EVehicle:
         self._to_cur = distance
         return self._cur_id
     
+    def _hop_energy(self, season, roads):
+        """
+        Returns a function giving the consumption in kWh of driving between two adjacent node IDs.
+
+        Consumption comes from the vehicle's energy model, the one drive spends by. On a Roads
+        index it reads the edge energy list shared by every vehicle of this efficiency and model,
+        see Roads.edge_energy, otherwise it works the edge's consumption out.
+        """
+        model = self._energy_model
+        if isinstance(roads, Roads):
+            energy = roads.edge_energy(season, self._efficiency, model)
+            return lambda node1_id, node2_id: energy[roads.get(node1_id, node2_id).position]
+        efficiency = self._efficiency
+        return lambda node1_id, node2_id: hop_cost(select_road(node1_id, node2_id, roads), season, model) * efficiency
+
+    def plan_route(self, season, path, roads):
+        """
+        Caches the consumption profile of the route the vehicle is going to drive.
+
+        check_reachable answers in O(1) for this path list while the vehicle pops the nodes it
+        reaches off its front. Call it again whenever the vehicle is rerouted.
+
+        Parameters:
+            season (str): Season affecting energy consumption.
+            path (list): Node IDs of the route, the list object the vehicle drives from.
+            roads (Roads): The Edge objects returned by create_map.
+        """
+        # Suffix sums, energy[i] is the consumption from path[i] to the end of the route
+        hop_energy = self._hop_energy(season, roads)
+        energy = [0.0] * len(path)
+        for i in range(len(path) - 2, -1, -1):
+            energy[i] = energy[i+1] + hop_energy(path[i], path[i+1])
+
+        self._route = path
+        self._route_key = (season, roads, list(path))
+        self._route_energy = energy
+
+    def remaining_energy(self, season, path, roads):
+        """
+        Consumption in kWh to drive the rest of the planned route from the head of path.
+
+        Returns:
+            float: The consumption, None if path is not what is left of the route given to plan_route.
+        """
+        if path is not self._route or not path:
+            return None
+        planned_season, planned_roads, planned_path = self._route_key
+        offset = len(planned_path) - len(path)
+        if season != planned_season or roads is not planned_roads or offset < 0 or path[0] != planned_path[offset]:
+            return None
+        return self._route_energy[offset]
+
+    @profiled()
     def check_reachable(self, season, path, roads, t):
         # Prevent battery from instant shut off
         if t < 5:
             t = 5
             
+        # Consumption only lowers the SOC, so the last hop decides when the route is cached
+        remaining = self.remaining_energy(season, path, roads)
+        if remaining is not None:
+            return 0 if len(path) > 1 and self._SOC - remaining / self._capacity < t else 1
+
         cur_SOC = self._SOC
+        hop_energy = self._hop_energy(season, roads)
 
         for i in range(len(path) - 1):
-            road = select_road(path[i], path[i+1], roads)
-            impact_index = GEOTAB_data[season][road.speed_limit]
-            consumption = road.distance * self._efficiency * impact_index
+            consumption = hop_energy(path[i], path[i+1])
             cur_SOC = (cur_SOC * self._capacity - consumption) / self.capacity
             if cur_SOC < t:
                 return 0
 
         return 1
     
+    def max_range(self, season, t):
+        """
+        Upper bound on the distance the vehicle can drive before its SOC drops below t.
+
+        Uses the least consuming speed of the season, so no route within the SOC can be longer.
+
+        Parameters:
+            season (str): Season affecting energy consumption.
+            t (float): SOC in percentage that must remain.
+
+        Returns:
+            float: Distance in kilometers, 0 if the SOC is already below t.
+        """
+        impact_index = self._energy_model.min_index(season)
+        return max(self._SOC - t, 0) * self._capacity / (self._efficiency * impact_index)
+
     def charge(self, target):
         self._SOC = target
         return
     
     
-    def optimal_SOC(self, season, nodes, dest, roads, t):
-        target = self.SOC + t
-
-        path = fastest_path(nodes, nodes.get_node(self.cur_id), dest)
-
-        for i in range(len(path) - 1):
-            road = select_road(path[i], path[i+1], roads)
-            impact_index = GEOTAB_data[season][road.speed_limit]
-            consumption = road.distance * self._efficiency * impact_index
-            target = (target * self._capacity + consumption) / self.capacity
+    @profiled()
+    def optimal_SOC(self, season, nodes, dest, roads, t, path=None, route=fastest_path, soc_map=None):
+        # A SOCMap of the destination answers for any node without following the path
+        if (soc_map is not None
+                and soc_map.key == (dest.id, season, self._efficiency, self._capacity, t, self._energy_model)
+                and self.cur_id in soc_map):
+            return self.SOC + soc_map[self.cur_id] + 5
+
+        # The energy needed from a node does not depend on the SOC, so when the route is searched
+        # here it is kept per (node, dest, season, t, route, roads) and only the current SOC is added
+        # on every call. A path given by the caller is summed as it is, it may be any route.
+        key = (self.cur_id, dest.id, season, t, route, roads) if path is None else None
+        need = self._optimal.get(key) if key is not None else None
+        if need is None:
+            need = t
+
+            # Reuse a route to the destination when the caller already has one
+            if path is None:
+                path = route(nodes, nodes.get_node(self.cur_id), dest)
+
+            hop_energy = self._hop_energy(season, roads)
+            for i in range(len(path) - 1):
+                consumption = hop_energy(path[i], path[i+1])
+                need += consumption / self._capacity
+            if key is not None:
+                self._optimal[key] = need
 
         # Prevent battery from instant shut off by giving it 5% extra
-        return target + 5
\ No newline at end of file
+        return self.SOC + need + 5